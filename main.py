@@ -1,22 +1,4808 @@
 import sys
 import os
+import re
 import json
+import time
+import threading
+import subprocess
+import sqlite3
+import struct
+import bisect
+import hashlib
+import shutil
+import select
+import signal
+import socket
+import zlib
+import multiprocessing
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from queue import Empty
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
 from datetime import datetime
 from pathlib import Path
 import qtawesome as qta
-from PySide6.QtCore import Qt, Slot, QTimer, QSize
+from PySide6.QtCore import (
+    Qt, Slot, QTimer, QSize, QObject, Signal, QThread, QAbstractListModel, QModelIndex
+)
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget,
     QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QComboBox, QTabWidget,
     QProgressBar, QFileDialog, QMessageBox,
-    QRadioButton, QButtonGroup, QTableWidget, QTextEdit,
-    QFrame, QTableWidgetItem, QHeaderView
+    QRadioButton, QButtonGroup, QTableWidget,
+    QFrame, QTableWidgetItem, QHeaderView, QCheckBox, QSpinBox,
+    QDialog, QDialogButtonBox, QListWidget, QListWidgetItem, QListView, QAbstractItemView
 )
-from PySide6.QtGui import QPainter, QColor, QPen
+from PySide6.QtGui import QPainter, QColor, QPen, QAction, QKeySequence
+
+class Metrics:
+    """Coleta tempos (spans), contadores e medidores com baixo overhead"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        # nome -> [contagem, total, máximo, último] (em segundos)
+        self.timings = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, name, seconds):
+        """Registra a duração de uma operação"""
+        with self._lock:
+            stat = self.timings.get(name)
+            if stat is None:
+                self.timings[name] = [1, seconds, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                if seconds > stat[2]:
+                    stat[2] = seconds
+                stat[3] = seconds
+
+    def observe_many(self, name, count, total, maximum, last):
+        """Registra de uma vez várias durações já somadas (vindas de um callback de tempo real)"""
+        with self._lock:
+            stat = self.timings.get(name)
+            if stat is None:
+                self.timings[name] = [count, total, maximum, last]
+            else:
+                stat[0] += count
+                stat[1] += total
+                if maximum > stat[2]:
+                    stat[2] = maximum
+                stat[3] = last
+
+    @contextmanager
+    def span(self, name):
+        """Mede o tempo de execução do bloco"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def increment(self, name, value=1):
+        """Incrementa um contador"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Define o valor atual de um medidor"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def reset(self):
+        """Zera todas as métricas coletadas"""
+        with self._lock:
+            self.timings = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Retorna uma cópia consistente das métricas"""
+        with self._lock:
+            timings = {name: list(stat) for name, stat in self.timings.items()}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            'uptime_seconds': time.time() - self.started_at,
+            'timings': {
+                name: {
+                    'count': count,
+                    'total_seconds': total,
+                    'mean_seconds': total / count,
+                    'max_seconds': maximum,
+                    'last_seconds': last
+                }
+                for name, (count, total, maximum, last) in timings.items()
+            },
+            'counters': counters,
+            'gauges': gauges
+        }
+
+    def to_json(self):
+        """Exporta as métricas em JSON"""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Exporta as métricas no formato texto do Prometheus"""
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE transcriber_uptime_seconds gauge",
+            f"transcriber_uptime_seconds {snapshot['uptime_seconds']:.3f}",
+            "# TYPE transcriber_span_seconds summary"
+        ]
+        for name, stat in sorted(snapshot['timings'].items()):
+            lines.append(f'transcriber_span_seconds_count{{span="{name}"}} {stat["count"]}')
+            lines.append(f'transcriber_span_seconds_sum{{span="{name}"}} {stat["total_seconds"]:.6f}')
+        lines.append("# TYPE transcriber_span_seconds_max gauge")
+        for name, stat in sorted(snapshot['timings'].items()):
+            lines.append(f'transcriber_span_seconds_max{{span="{name}"}} {stat["max_seconds"]:.6f}')
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = "transcriber_" + re.sub(r'[^a-zA-Z0-9_]', '_', name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(snapshot['gauges'].items()):
+            metric = "transcriber_" + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Instância global usada por toda a aplicação
+metrics = Metrics()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Atende /metrics (Prometheus) e /metrics.json"""
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = metrics.to_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = metrics.to_json().encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Evita poluir o terminal a cada coleta
+        pass
+
+
+class MetricsServer:
+    """Servidor HTTP opcional que expõe as métricas"""
+    def __init__(self, host='127.0.0.1', port=9464):
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        """Inicia o servidor em uma thread de fundo"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Encerra o servidor"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+class AudioRingBuffer:
+    """Buffer circular pré-alocado (um produtor, um consumidor)"""
+    def __init__(self, capacity_frames, channels, dtype='float32'):
+        self.capacity = int(capacity_frames)
+        self.channels = channels
+        self.buffer = np.zeros((self.capacity, channels), dtype=dtype)
+        # Posições monotônicas (total de frames escritos/lidos)
+        self.write_pos = 0
+        self.read_pos = 0
+
+    def available(self):
+        """Quantidade de frames ainda não lidos"""
+        return self.write_pos - self.read_pos
+
+    def write(self, data):
+        """Copia um bloco para o buffer; retorna quantos frames foram descartados"""
+        frames = len(data)
+        if frames > self.capacity - (self.write_pos - self.read_pos):
+            # Buffer cheio: descarta o bloco inteiro sem alocar nada
+            return frames
+        
+        start = self.write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if first < frames:
+            self.buffer[:frames - first] = data[first:]
+        
+        # Publica a nova posição apenas depois da cópia
+        self.write_pos += frames
+        return 0
+
+    def read(self, until=None):
+        """Retira os frames disponíveis até a posição informada"""
+        end = self.write_pos if until is None else min(until, self.write_pos)
+        frames = end - self.read_pos
+        if frames <= 0:
+            return self.buffer[:0].copy()
+        
+        start = self.read_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        if first == frames:
+            data = self.buffer[start:start + frames].copy()
+        else:
+            data = np.concatenate((self.buffer[start:], self.buffer[:frames - first]))
+        
+        self.read_pos = end
+        return data
+
+    def latest(self, frames):
+        """Cópia dos últimos frames escritos (usado pelo VU meter)"""
+        end = self.write_pos
+        frames = min(frames, end, self.capacity)
+        if frames <= 0:
+            return self.buffer[:0].copy()
+        
+        indices = np.arange(end - frames, end) % self.capacity
+        return self.buffer[indices]
+
+
+class SharedAudioRing(AudioRingBuffer):
+    """Buffer circular em memória compartilhada: outro processo lê o áudio ao vivo sem cópia pelo pipe.
+    O cabeçalho (int64) guarda posição de escrita, capacidade, canais e taxa; o produtor copia o bloco
+    e só depois publica a nova posição, então leitores externos nunca travam a captura"""
+    HEADER_FIELDS = 4
+
+    def __init__(self, capacity_frames, channels, samplerate, dtype='float32'):
+        from multiprocessing import shared_memory
+        self.capacity = int(capacity_frames)
+        self.channels = channels
+        itemsize = np.dtype(dtype).itemsize
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=self.HEADER_FIELDS * 8 + self.capacity * channels * itemsize)
+        self.header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.header[:] = (0, self.capacity, channels, samplerate)
+        self.buffer = np.ndarray((self.capacity, channels), dtype=dtype, buffer=self.shm.buf,
+                                 offset=self.HEADER_FIELDS * 8)
+        # A leitura do gravador continua local; só a posição de escrita é publicada
+        self.read_pos = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_pos(self):
+        return int(self.header[0])
+
+    @write_pos.setter
+    def write_pos(self, value):
+        self.header[0] = value
+
+    def close(self):
+        """Libera e remove o segmento (depois que a captura e o gravador pararam)"""
+        if self.shm is None:
+            return
+        # As views do numpy precisam sair antes de fechar o mapeamento
+        self.header = None
+        self.buffer = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+
+class SharedRingReader:
+    """Leitor em outro processo: segue a posição de escrita sem travas e detecta quando foi ultrapassado"""
+    def __init__(self, name, position=None):
+        from multiprocessing import shared_memory
+        try:
+            # O segmento pertence ao processo da captura, que o remove no fim da gravação
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: o processo filho usa o mesmo rastreador de recursos do pai
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((SharedAudioRing.HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        _, capacity, channels, samplerate = (int(value) for value in self.header)
+        self.capacity = capacity
+        self.channels = channels
+        self.samplerate = samplerate
+        self.buffer = np.ndarray((capacity, channels), dtype='float32', buffer=self.shm.buf,
+                                 offset=SharedAudioRing.HEADER_FIELDS * 8)
+        # Começa do ponto atual da gravação (ou de uma posição dada, como o início de um buffer novo)
+        self.position = int(self.header[0]) if position is None else position
+
+    def read(self):
+        """(frames novos, frames perdidos por atraso do leitor)"""
+        end = int(self.header[0])
+        lost = max(0, end - self.position - self.capacity)
+        start = self.position + lost
+        frames = end - start
+        first_index = start % self.capacity
+        first = min(frames, self.capacity - first_index)
+        data = np.concatenate((self.buffer[first_index:first_index + first], self.buffer[:frames - first]))
+        # Se o produtor avançou durante a cópia, o começo pode ter sido sobrescrito
+        overwritten = int(self.header[0]) - self.capacity - start
+        if overwritten > 0:
+            data = data[overwritten:]
+            lost += overwritten
+        self.position = end
+        return data, lost
+
+    def close(self):
+        self.header = None
+        self.buffer = None
+        self.shm.close()
+
+
+# Versões do sounddevice em que a reinicialização pela API privada foi conferida
+PORTAUDIO_REINIT_VERSIONS = ((0, 4), (0, 5))
+
+
+def reinitialize_portaudio():
+    """Reinicializa o PortAudio para que ele enxergue dispositivos conectados depois da abertura.
+    Único ponto que usa a API privada do sounddevice (sd._terminate/sd._initialize); o Pa_Terminate fecha
+    todos os streams abertos, então só é chamada por PortAudioStreams quando não há nenhum.
+    Em versões não conferidas não faz nada e retorna False (a lista fica sem os dispositivos novos)"""
+    try:
+        version = tuple(int(part) for part in sd.__version__.split('.')[:2])
+    except (AttributeError, ValueError):
+        return False
+    if version not in PORTAUDIO_REINIT_VERSIONS or not hasattr(sd, '_terminate') or not hasattr(sd, '_initialize'):
+        return False
+    sd._terminate()
+    sd._initialize()
+    return True
+
+
+class PortAudioStreams:
+    """Contagem dos streams do PortAudio abertos no processo: a reinicialização só acontece sem nenhum"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def opened(self):
+        """Chamado antes de consultar dispositivos e abrir um stream (espera uma reinicialização em curso)"""
+        with self._lock:
+            self.count += 1
+
+    def closed(self):
+        """Chamado depois de fechar o stream"""
+        with self._lock:
+            self.count = max(0, self.count - 1)
+
+    def reinitialize(self):
+        """Reinicializa o PortAudio se nenhum stream estiver aberto; False se há streams abertos"""
+        with self._lock:
+            if self.count:
+                return False
+            reinitialize_portaudio()
+            return True
+
+
+# Instância global: todo stream do PortAudio passa por ela
+portaudio_streams = PortAudioStreams()
+
+
+class CaptureStream:
+    """Captura de um dispositivo com callback mínimo, detecção de xruns e buffer adaptativo"""
+    # Degraus de adaptação: (blocksize, latência)
+    BUFFER_LEVELS = [(1024, 'low'), (2048, 'high'), (4096, 0.25), (8192, 0.5)]
+    # Overflows dentro da janela que disparam a adaptação
+    OVERFLOW_THRESHOLD = 2
+    OVERFLOW_WINDOW = 5.0
+
+    def __init__(self, device_index, samplerate, channels=1, ring_seconds=10, shared=False):
+        self.device_index = device_index
+        self.samplerate = samplerate
+        self.channels = channels
+        # Buffer compartilhado quando um processo de inferência acompanha a gravação
+        if shared:
+            self.ring = SharedAudioRing(samplerate * ring_seconds, channels, samplerate)
+        else:
+            self.ring = AudioRingBuffer(samplerate * ring_seconds, channels)
+        # Marcadores de lacuna: (posição no buffer, frames perdidos); 0 = duração desconhecida
+        self.gaps = deque(maxlen=4096)
+        self.level = 0
+        self.overflows = 0
+        self.dropped_frames = 0
+        self.adaptations = 0
+        # Contadores do callback (atributos simples: nada de travas no tempo real)
+        self.underflows = 0
+        self.gap_count = 0
+        self.callback_count = 0
+        self.callback_seconds = 0.0
+        self.callback_max = 0.0
+        self.callback_last = 0.0
+        self._published = {}
+        self.stream = None
+        # Instante (monotônico) do primeiro frame capturado
+        self.started_at = None
+        self.frames_captured = 0
+        self._overflow_times = deque(maxlen=16)
+        self._next_adc_time = None
+        self._restart_time = None
+        # (relógio, frames capturados) no primeiro e no último bloco, para medir a taxa real
+        self._clock_first = None
+        self._clock_last = None
+
+    def start(self):
+        """Abre e inicia o stream no nível de buffer atual"""
+        blocksize, latency = self.BUFFER_LEVELS[self.level]
+        self._next_adc_time = None
+        self._clock_first = None
+        self._clock_last = None
+        portaudio_streams.opened()
+        try:
+            self.stream = sd.InputStream(
+                device=self.device_index,
+                channels=self.channels,
+                samplerate=self.samplerate,
+                dtype='float32',
+                callback=self._callback,
+                blocksize=blocksize,
+                latency=latency
+            )
+            self.stream.start()
+        except Exception:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            portaudio_streams.closed()
+            raise
+        metrics.set_gauge('capture_blocksize', blocksize)
+
+    def stop(self):
+        """Para e fecha o stream"""
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+            portaudio_streams.closed()
+
+    def release(self):
+        """Libera o buffer compartilhado (depois que o gravador terminou de drenar)"""
+        if isinstance(self.ring, SharedAudioRing):
+            self.ring.close()
+
+    def _callback(self, indata, frames, time_info, status):
+        """Callback de tempo real: apenas detecção de xrun e cópia para o buffer"""
+        callback_start = time.perf_counter()
+        
+        measured_gap = False
+        adc_time = time_info.inputBufferAdcTime
+        if self._restart_time is not None:
+            # Primeiro bloco depois de uma reabertura do stream
+            lost = int((time.monotonic() - self._restart_time) * self.samplerate) - frames
+            self._restart_time = None
+            if lost > 0:
+                self._mark_gap(lost)
+                measured_gap = True
+        elif self._next_adc_time is not None and adc_time > 0:
+            lost = int(round((adc_time - self._next_adc_time) * self.samplerate))
+            # Ignora o jitter normal do relógio do driver
+            if lost > frames // 2:
+                self._mark_gap(lost)
+                measured_gap = True
+        if adc_time > 0:
+            self._next_adc_time = adc_time + frames / self.samplerate
+        
+        clock = adc_time if adc_time > 0 else time.monotonic()
+        if self._clock_first is None:
+            self._clock_first = (clock, self.frames_captured)
+            if self.started_at is None:
+                self.started_at = time.monotonic() - frames / self.samplerate
+        self._clock_last = (clock, self.frames_captured)
+        self.frames_captured += frames
+        
+        if status:
+            if status.input_overflow:
+                self.overflows += 1
+                self._overflow_times.append(time.monotonic())
+                if not measured_gap:
+                    self._mark_gap(0)
+            if status.input_underflow:
+                self.underflows += 1
+        
+        dropped = self.ring.write(indata)
+        if dropped:
+            self.dropped_frames += dropped
+            self._mark_gap(dropped)
+        
+        elapsed = time.perf_counter() - callback_start
+        self.callback_count += 1
+        self.callback_seconds += elapsed
+        if elapsed > self.callback_max:
+            self.callback_max = elapsed
+        self.callback_last = elapsed
+
+    def _mark_gap(self, lost_frames):
+        """Registra uma lacuna na posição atual do buffer"""
+        self.gaps.append((self.ring.write_pos, lost_frames))
+        self.gap_count += 1
+
+    def publish_metrics(self):
+        """Repassa às métricas globais o que o callback contou (chamado fora do tempo real)"""
+        counters = {
+            'audio_input_overflow': self.overflows,
+            'audio_input_underflow': self.underflows,
+            'capture_dropped_frames': self.dropped_frames,
+            'capture_gaps': self.gap_count
+        }
+        for name, value in counters.items():
+            delta = value - self._published.get(name, 0)
+            if delta:
+                metrics.increment(name, delta)
+            self._published[name] = value
+        count, total = self.callback_count, self.callback_seconds
+        published_count, published_total = self._published.get('audio_callback', (0, 0.0))
+        if count > published_count:
+            metrics.observe_many('audio_callback', count - published_count, total - published_total,
+                                 self.callback_max, self.callback_last)
+        self._published['audio_callback'] = (count, total)
+
+    def measured_rate(self):
+        """Taxa de amostragem real medida pelo relógio do stream (None se ainda incerta)"""
+        first, last = self._clock_first, self._clock_last
+        if first is None or last is None or last[0] - first[0] < 2.0:
+            return None
+        return (last[1] - first[1]) / (last[0] - first[0])
+
+    def maybe_adapt(self):
+        """Aumenta blocksize/latência se houver overflows frequentes (fora do callback)"""
+        if self.level >= len(self.BUFFER_LEVELS) - 1:
+            return False
+        
+        now = time.monotonic()
+        recent = [t for t in list(self._overflow_times) if now - t < self.OVERFLOW_WINDOW]
+        if len(recent) < self.OVERFLOW_THRESHOLD:
+            return False
+        
+        self._overflow_times.clear()
+        self.stop()
+        self.level += 1
+        self.adaptations += 1
+        self._restart_time = time.monotonic()
+        self.start()
+        metrics.increment('capture_adaptations')
+        print(f"Buffer de captura aumentado para {self.BUFFER_LEVELS[self.level]}")  # Debug
+        return True
+
+
+def k_weighting_power(freqs, samplerate):
+    """Resposta em potência do filtro K (ITU-R BS.1770) nas frequências informadas"""
+    def biquad_power(b, a):
+        z = np.exp(-1j * 2 * np.pi * freqs / samplerate)
+        numerator = b[0] + b[1] * z + b[2] * z ** 2
+        denominator = a[0] + a[1] * z + a[2] * z ** 2
+        return np.abs(numerator / denominator) ** 2
+    
+    # Estágio 1: shelving agudo (+4 dB a partir de ~1,5 kHz)
+    A = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / samplerate
+    alpha = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    cos_w0 = np.cos(w0)
+    shelf = biquad_power(
+        [A * ((A + 1) + (A - 1) * cos_w0 + 2 * np.sqrt(A) * alpha),
+         -2 * A * ((A - 1) + (A + 1) * cos_w0),
+         A * ((A + 1) + (A - 1) * cos_w0 - 2 * np.sqrt(A) * alpha)],
+        [(A + 1) - (A - 1) * cos_w0 + 2 * np.sqrt(A) * alpha,
+         2 * ((A - 1) - (A + 1) * cos_w0),
+         (A + 1) - (A - 1) * cos_w0 - 2 * np.sqrt(A) * alpha]
+    )
+    
+    # Estágio 2: passa-altas em 38 Hz
+    w0 = 2 * np.pi * 38.0 / samplerate
+    alpha = np.sin(w0) / (2 * 0.5)
+    cos_w0 = np.cos(w0)
+    highpass = biquad_power(
+        [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2],
+        [1 + alpha, -2 * cos_w0, 1 - alpha]
+    )
+    return shelf * highpass
+
+
+class LoudnessMeter:
+    """Medição incremental de pico e loudness integrado (EBU R128) durante a gravação"""
+    BLOCK_SECONDS = 0.1
+
+    def __init__(self, samplerate, channels):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.block = int(samplerate * self.BLOCK_SECONDS)
+        self.peak = 0.0
+        # Energia ponderada K de cada bloco de 100 ms (poucos KB por hora de áudio)
+        self._energies = []
+        self._pending = np.zeros((0, channels), dtype='float32')
+        
+        # Pesos espectrais: filtro K e fator 2 do Parseval para os bins internos do rfft
+        weights = k_weighting_power(np.fft.rfftfreq(self.block, 1 / samplerate), samplerate)
+        weights[1:] *= 2
+        if self.block % 2 == 0:
+            weights[-1] /= 2
+        self._weights = (weights / self.block ** 2).reshape(1, -1, 1)
+
+    def add(self, data):
+        """Acumula um bloco de áudio"""
+        if not len(data):
+            return
+        self.peak = max(self.peak, float(np.max(np.abs(data))))
+        
+        if len(self._pending):
+            data = np.concatenate((self._pending, data))
+        count = len(data) // self.block
+        if count:
+            blocks = data[:count * self.block].reshape(count, self.block, self.channels)
+            power = np.abs(np.fft.rfft(blocks, axis=1)) ** 2
+            # Soma dos canais com peso 1 (mono/estéreo na BS.1770)
+            self._energies.extend((power * self._weights).sum(axis=(1, 2)).tolist())
+        self._pending = data[count * self.block:].copy()
+
+    def integrated_loudness(self):
+        """Loudness integrado em LUFS com os gates absoluto (-70) e relativo (-10 LU)"""
+        energies = np.array(self._energies)
+        if not len(energies):
+            return None
+        
+        # Blocos de 400 ms com 75% de sobreposição
+        if len(energies) >= 4:
+            gating = np.convolve(energies, np.ones(4) / 4, mode='valid')
+        else:
+            gating = np.array([energies.mean()])
+        loudness = -0.691 + 10 * np.log10(gating + 1e-20)
+        
+        gating = gating[loudness > -70]
+        if not len(gating):
+            return None
+        relative_gate = -0.691 + 10 * np.log10(gating.mean()) - 10
+        gating = gating[-0.691 + 10 * np.log10(gating) > relative_gate]
+        return float(-0.691 + 10 * np.log10(gating.mean()))
+
+    def gain(self, mode='peak', target_lufs=-23.0, ceiling_db=-1.0):
+        """Ganho linear de normalização: pico em 0 dBFS ou loudness alvo limitado pelo pico"""
+        if self.peak <= 0:
+            return 1.0
+        if mode == 'r128':
+            loudness = self.integrated_loudness()
+            if loudness is not None:
+                gain = 10 ** ((target_lufs - loudness) / 20)
+                return min(gain, 10 ** (ceiling_db / 20) / self.peak)
+        return 1.0 / self.peak
+
+
+def apply_gain_to_file(source, destination, gains, subtype='PCM_16', blocksize=65536):
+    """Aplica o ganho em blocos, sem carregar o arquivo inteiro na memória"""
+    gains = np.asarray(gains, dtype='float32').reshape(1, -1)
+    with sf.SoundFile(source, 'r') as src:
+        with sf.SoundFile(destination, 'w', src.samplerate, src.channels, format='WAV', subtype=subtype) as dst:
+            for block in src.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+                block *= gains
+                np.clip(block, -1.0, 1.0, out=block)
+                dst.write(block)
+
+
+class LibraryIndex:
+    """Índice da biblioteca de áudio: metadados de cada arquivo em SQLite"""
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+
+    def get(self, name):
+        """Metadados de um arquivo (dicionário vazio se não indexado)"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM files WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update(self, name, **fields):
+        """Mescla campos nos metadados de um arquivo"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT data FROM files WHERE name = ?", (name,)).fetchone()
+            data = json.loads(row[0]) if row else {}
+            data.update(fields)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (name, data) VALUES (?, ?)", (name, json.dumps(data))
+            )
+
+    def remove(self, name):
+        """Remove um arquivo do índice"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a")
+
+
+def file_content_hash(path, library=None, chunk_size=1 << 20):
+    """Hash do conteúdo (BLAKE2b) lido em blocos; fica guardado no índice enquanto o arquivo não muda"""
+    stat = os.stat(path)
+    name = os.path.basename(path)
+    if library is not None:
+        entry = library.get(name)
+        if entry.get('hash') and entry.get('hash_size') == stat.st_size and entry.get('hash_mtime') == stat.st_mtime_ns:
+            return entry['hash']
+    
+    with metrics.span('library.hash'):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    content_hash = digest.hexdigest()
+    if library is not None:
+        library.update(name, hash=content_hash, hash_size=stat.st_size, hash_mtime=stat.st_mtime_ns)
+    return content_hash
+
+
+class UsageLedger:
+    """Registro de uso só de inserção (uma linha por transcrição) com totais mantidos pelo banco"""
+    FLUSH_INTERVAL = 1.0
+    FIELDS = ('finished_at', 'file_hash', 'file_name', 'backend', 'model',
+              'audio_seconds', 'wall_seconds', 'cost', 'realtime_factor')
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: uma queda no meio da escrita nunca corrompe o que já foi confirmado
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    finished_at REAL NOT NULL,
+                    file_hash TEXT,
+                    file_name TEXT,
+                    backend TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    audio_seconds REAL NOT NULL,
+                    wall_seconds REAL NOT NULL,
+                    cost REAL NOT NULL,
+                    realtime_factor REAL
+                );
+                CREATE TABLE IF NOT EXISTS totals (
+                    backend TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    jobs INTEGER NOT NULL,
+                    audio_seconds REAL NOT NULL,
+                    wall_seconds REAL NOT NULL,
+                    cost REAL NOT NULL,
+                    PRIMARY KEY (backend, model)
+                );
+                CREATE TRIGGER IF NOT EXISTS jobs_totals AFTER INSERT ON jobs BEGIN
+                    INSERT INTO totals VALUES (NEW.backend, NEW.model, 1, NEW.audio_seconds, NEW.wall_seconds, NEW.cost)
+                    ON CONFLICT (backend, model) DO UPDATE SET
+                        jobs = jobs + 1,
+                        audio_seconds = audio_seconds + NEW.audio_seconds,
+                        wall_seconds = wall_seconds + NEW.wall_seconds,
+                        cost = cost + NEW.cost;
+                END;
+                CREATE TRIGGER IF NOT EXISTS jobs_no_update BEFORE UPDATE ON jobs BEGIN
+                    SELECT RAISE(ABORT, 'registro de uso é só de inserção');
+                END;
+                CREATE TRIGGER IF NOT EXISTS jobs_no_delete BEFORE DELETE ON jobs BEGIN
+                    SELECT RAISE(ABORT, 'registro de uso é só de inserção');
+                END;
+            """)
+        # Totais em memória: a interface nunca espera o banco
+        self._totals = {
+            (backend, model): {'jobs': jobs, 'audio_seconds': audio, 'wall_seconds': wall, 'cost': cost}
+            for backend, model, jobs, audio, wall, cost in self._conn.execute("SELECT * FROM totals")
+        }
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def is_empty(self):
+        return not self._totals and not self._pending
+
+    def record(self, backend, model, audio_seconds, wall_seconds, cost, file_hash=None, file_name=None):
+        """Registra um trabalho; a gravação no banco é feita em lote pela thread do registro"""
+        job = {
+            'finished_at': time.time(),
+            'file_hash': file_hash,
+            'file_name': file_name,
+            'backend': backend,
+            'model': model,
+            'audio_seconds': audio_seconds,
+            'wall_seconds': wall_seconds,
+            'cost': cost,
+            'realtime_factor': audio_seconds / wall_seconds if wall_seconds > 0 else None
+        }
+        with self._lock:
+            self._pending.append(job)
+            total = self._totals.setdefault(
+                (backend, model), {'jobs': 0, 'audio_seconds': 0.0, 'wall_seconds': 0.0, 'cost': 0.0})
+            total['jobs'] += 1
+            total['audio_seconds'] += audio_seconds
+            total['wall_seconds'] += wall_seconds
+            total['cost'] += cost
+        self._wake.set()
+
+    def totals(self):
+        """Totais por (backend, modelo)"""
+        with self._lock:
+            return {key: dict(value) for key, value in self._totals.items()}
+
+    def total_cost(self):
+        with self._lock:
+            return sum(total['cost'] for total in self._totals.values())
+
+    def flush(self):
+        """Grava os trabalhos pendentes em uma única transação"""
+        with self._lock:
+            jobs, self._pending = self._pending, []
+        if not jobs:
+            return
+        try:
+            with metrics.span('ledger.flush'), self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO jobs ({', '.join(self.FIELDS)}) VALUES ({', '.join('?' * len(self.FIELDS))})",
+                    [tuple(job[field] for field in self.FIELDS) for job in jobs]
+                )
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar registro de uso: {e}")  # Debug
+            with self._lock:
+                self._pending[:0] = jobs
+
+    def close(self):
+        """Grava o que falta e encerra"""
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._conn.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait()
+            # Junta os registros que chegarem no intervalo em uma só transação
+            self._stop_event.wait(self.FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+
+def mic_siblings(path):
+    """Arquivos (número, caminho) da mesma gravação de vários microfones (gravacao_..._micN.wav)"""
+    match = re.match(r'^(.*)_mic\d+(\.\w+)$', path)
+    if not match:
+        return []
+    prefix, ext = match.groups()
+    pattern = re.compile(re.escape(os.path.basename(prefix)) + r'_mic(\d+)' + re.escape(ext) + '$')
+    siblings = []
+    for name in os.listdir(os.path.dirname(path) or '.'):
+        sibling = pattern.match(name)
+        if sibling:
+            siblings.append((int(sibling.group(1)), os.path.join(os.path.dirname(path), name)))
+    return sorted(siblings)
+
+
+def clone_file(source, destination):
+    """Cópia sem duplicar dados por reflink (cópia sob escrita); None se o sistema não permitir.
+    Hardlink não serve: o arquivo da biblioteca pode ser editado e mudaria junto o original do usuário"""
+    try:
+        import fcntl
+        FICLONE = 0x40049409
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return 'reflink'
+    except (ImportError, OSError):
+        if os.path.exists(destination):
+            os.remove(destination)
+        return None
+
+
+def copy_with_hash(source, destination, chunk_size=1 << 20):
+    """Copia calculando o hash do conteúdo na mesma leitura"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            digest.update(chunk)
+            dst.write(chunk)
+    shutil.copystat(source, destination)
+    return digest.hexdigest()
+
+
+class AudioImporter(QObject):
+    """Importa arquivos para a biblioteca em segundo plano, sem duplicar conteúdo"""
+    # (caminho na biblioteca, 'importado' ou 'duplicado', arquivo de origem)
+    file_imported = Signal(str, str, str)
+    import_failed = Signal(str, str)
+    # Resumo do lote: importados, duplicados, erros
+    batch_finished = Signal(dict)
+    MAX_WORKERS = 4
+
+    def __init__(self, audio_dir, library):
+        super().__init__()
+        self.audio_dir = audio_dir
+        self.library = library
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        # Verificação de duplicata e escolha do nome são feitas uma de cada vez
+        self._commit_lock = threading.Lock()
+        self._batch_lock = threading.Lock()
+        self._batch = None
+
+    @staticmethod
+    def collect(paths):
+        """Expande pastas (recursivamente) em arquivos de áudio"""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.extend(os.path.join(root, name) for name in sorted(names)
+                                 if name.lower().endswith(AUDIO_EXTENSIONS))
+            elif path.lower().endswith(AUDIO_EXTENSIONS):
+                files.append(path)
+        return files
+
+    def import_paths(self, paths):
+        """Enfileira arquivos e pastas; retorna quantos arquivos entraram no lote"""
+        files = self.collect(paths)
+        if not files:
+            return 0
+        with self._batch_lock:
+            if self._batch is None:
+                self._batch = {'pending': 0, 'imported': [], 'duplicates': [], 'errors': []}
+            self._batch['pending'] += len(files)
+        for path in files:
+            self._executor.submit(self._run, path)
+        return len(files)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, source):
+        try:
+            with metrics.span('library.import'):
+                path, status = self.import_file(source)
+            self.file_imported.emit(path, status, source)
+            key = 'imported' if status == 'importado' else 'duplicates'
+            result = (key, (source, path))
+        except Exception as e:
+            print(f"Erro ao importar {source}: {e}")  # Debug
+            self.import_failed.emit(source, str(e))
+            result = ('errors', (source, str(e)))
+        
+        with self._batch_lock:
+            self._batch[result[0]].append(result[1])
+            self._batch['pending'] -= 1
+            batch = self._batch if not self._batch['pending'] else None
+            if batch:
+                self._batch = None
+        if batch:
+            del batch['pending']
+            self.batch_finished.emit(batch)
+
+    def import_file(self, source):
+        """Importa um arquivo: retorna (caminho na biblioteca, 'importado' ou 'duplicado')"""
+        size = os.path.getsize(source)
+        temp = os.path.join(self.audio_dir, f".{os.path.basename(source)}.{threading.get_ident()}.part")
+        method = clone_file(source, temp)
+        if method:
+            # Sem cópia: basta ler a origem uma vez para o hash
+            content_hash = file_content_hash(source)
+            metrics.increment('import_bytes_linked', size)
+        else:
+            method = 'copy'
+            content_hash = copy_with_hash(source, temp)
+            metrics.increment('import_bytes_copied', size)
+        
+        try:
+            with self._commit_lock:
+                duplicate = self.find_duplicate(content_hash, size)
+                if duplicate:
+                    metrics.increment('import_duplicates')
+                    return duplicate, 'duplicado'
+                destination = self.unique_destination(os.path.basename(source))
+                os.replace(temp, destination)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        
+        self.library.update(
+            os.path.basename(destination),
+            hash=content_hash,
+            hash_size=size,
+            hash_mtime=os.stat(destination).st_mtime_ns,
+            imported_from=source,
+            import_method=method
+        )
+        metrics.increment('import_files')
+        return destination, 'importado'
+
+    def find_duplicate(self, content_hash, size):
+        """Arquivo da biblioteca com o mesmo conteúdo (só os de mesmo tamanho são comparados)"""
+        for entry in os.scandir(self.audio_dir):
+            if (entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS)
+                    and entry.stat().st_size == size
+                    and file_content_hash(entry.path, self.library) == content_hash):
+                return entry.path
+        return None
+
+    def unique_destination(self, name):
+        """Nome livre na biblioteca: nunca sobrescreve um arquivo diferente"""
+        base, ext = os.path.splitext(name)
+        destination = os.path.join(self.audio_dir, name)
+        number = 2
+        while os.path.exists(destination):
+            destination = os.path.join(self.audio_dir, f"{base} ({number}){ext}")
+            number += 1
+        return destination
+
+
+def waveform_path(path):
+    """Arquivo auxiliar com a forma de onda resumida de um áudio"""
+    return f"{path}.peaks"
+
+
+class WaveformBuilder:
+    """Acumula mínimo, máximo e RMS por bloco de 10 ms, canal a canal"""
+    BLOCKS_PER_SECOND = 100
+
+    def __init__(self, samplerate, channels):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.block = max(1, samplerate // self.BLOCKS_PER_SECOND)
+        self.frames = 0
+        self._points = []
+        self._pending = np.zeros((0, channels), dtype='float32')
+
+    def add(self, data):
+        """Acumula um bloco de áudio (frames x canais)"""
+        if not len(data):
+            return
+        self.frames += len(data)
+        if len(self._pending):
+            data = np.concatenate((self._pending, data))
+        count = len(data) // self.block
+        if count:
+            self._points.append(self._summarize(data[:count * self.block].reshape(count, self.block, self.channels)))
+        self._pending = data[count * self.block:].copy()
+
+    def _summarize(self, blocks):
+        return np.stack((blocks.min(axis=1), blocks.max(axis=1),
+                         np.sqrt(np.mean(np.square(blocks, dtype='float64'), axis=1))), axis=-1)
+
+    def save(self, path, gains=None):
+        """Grava o arquivo auxiliar, já com o ganho de normalização aplicado"""
+        points = list(self._points)
+        if len(self._pending):
+            points.append(self._summarize(self._pending.reshape(1, -1, self.channels)))
+        base = np.concatenate(points) if points else np.zeros((0, self.channels, 3))
+        if gains is not None:
+            base = base * np.asarray(gains, dtype='float64').reshape(1, -1, 1)
+        write_waveform(path, base, self.samplerate, self.block, self.frames)
+
+
+def write_waveform(path, base, samplerate, block, frames):
+    """Grava a pirâmide de resoluções: cada nível junta pares de pontos do anterior"""
+    levels = [np.clip(base, -1.0, 1.0)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = np.concatenate((level, level[-1:]))
+        pairs = level.reshape(-1, 2, *level.shape[1:])
+        levels.append(np.stack((pairs[:, :, :, 0].min(axis=1), pairs[:, :, :, 1].max(axis=1),
+                                np.sqrt(np.mean(np.square(pairs[:, :, :, 2]), axis=1))), axis=-1))
+    
+    # Escreve em arquivo temporário para nunca deixar um auxiliar pela metade
+    channels = base.shape[1] if base.ndim == 3 else 1
+    with open(path + ".tmp", 'wb') as f:
+        f.write(WaveformPyramid.HEADER.pack(WaveformPyramid.MAGIC, channels, samplerate, block, frames, len(base)))
+        for level in levels:
+            f.write(np.round(level * 32767).astype('<i2').tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def build_waveform_file(path, gains=None, blocksize=262144):
+    """Gera a forma de onda de um arquivo existente lendo-o uma única vez em blocos"""
+    with metrics.span('waveform.index'):
+        with sf.SoundFile(path, 'r') as f:
+            builder = WaveformBuilder(f.samplerate, f.channels)
+            for block in f.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+                builder.add(block)
+        builder.save(waveform_path(path), gains)
+
+
+class WaveformPyramid:
+    """Leitura da forma de onda resumida mapeada em memória (nada é decodificado)"""
+    MAGIC = b'WPK1'
+    HEADER = struct.Struct('<4sHIIQQ')
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, self.channels, self.samplerate, self.block, self.frames, points = \
+                self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            raise ValueError(f"Forma de onda inválida: {path}")
+        self.duration = self.frames / self.samplerate if self.samplerate else 0.0
+        self.levels = []
+        if points:
+            data = np.memmap(path, dtype='<i2', mode='r', offset=self.HEADER.size)
+            offset = 0
+            while True:
+                size = points * self.channels * 3
+                self.levels.append(data[offset:offset + size].reshape(points, self.channels, 3))
+                offset += size
+                if points == 1:
+                    break
+                points = (points + 1) // 2
+
+    def envelope(self, start, end, columns):
+        """Mínimo, máximo e RMS (todos os canais juntos) de cada coluna entre start e end segundos"""
+        if not self.levels or columns <= 0 or end <= start:
+            empty = np.zeros(max(columns, 0), dtype='float32')
+            return empty, empty, empty
+        
+        # Nível mais grosseiro que ainda tem ao menos um ponto por coluna
+        level_index = 0
+        for index in range(len(self.levels)):
+            seconds_per_point = self.block * 2 ** index / self.samplerate
+            if (end - start) / seconds_per_point < columns:
+                break
+            level_index = index
+        level = self.levels[level_index]
+        seconds_per_point = self.block * 2 ** level_index / self.samplerate
+        
+        first = max(0, int(start / seconds_per_point))
+        last = min(len(level), int(np.ceil(end / seconds_per_point)))
+        if last <= first:
+            empty = np.zeros(columns, dtype='float32')
+            return empty, empty, empty
+        points = level[first:last].astype('float32') / 32767
+        minimum = points[:, :, 0].min(axis=1)
+        maximum = points[:, :, 1].max(axis=1)
+        power = np.mean(np.square(points[:, :, 2]), axis=1)
+        
+        if len(points) >= columns:
+            edges = np.linspace(0, len(points), columns + 1).astype(int)
+            counts = np.diff(edges)
+            minimum = np.minimum.reduceat(minimum, edges[:-1])
+            maximum = np.maximum.reduceat(maximum, edges[:-1])
+            power = np.add.reduceat(power, edges[:-1]) / counts
+        else:
+            # Mais colunas que pontos: repete cada ponto
+            index = (np.arange(columns) * len(points) // columns)
+            minimum, maximum, power = minimum[index], maximum[index], power[index]
+        return minimum, maximum, np.sqrt(power)
+
+
+class StreamResampler:
+    """Reamostragem linear contínua entre blocos (taxa e deriva de relógio)"""
+    def __init__(self, channels):
+        # Último frame do bloco anterior fica no índice 0 do próximo bloco
+        self.last = np.zeros((1, channels), dtype='float32')
+        self.position = 1.0
+
+    def process(self, block, ratio):
+        """Converte um bloco; ratio = frames de saída por frame de entrada"""
+        data = np.concatenate((self.last, block))
+        step = 1.0 / ratio
+        limit = len(data) - 1
+        if self.position > limit:
+            count = 0
+        else:
+            count = int((limit - self.position) / step) + 1
+        positions = self.position + step * np.arange(count)
+        
+        output = np.empty((count, data.shape[1]), dtype='float32')
+        indices = np.arange(len(data))
+        for channel in range(data.shape[1]):
+            output[:, channel] = np.interp(positions, indices, data[:, channel])
+        
+        self.position += step * count - limit
+        self.last = block[-1:].copy()
+        return output
+
+
+class RecordingWriter(threading.Thread):
+    """Thread única que drena os buffers de captura (um ou mais dispositivos) para o disco"""
+    # Limite de silêncio inserido por lacuna (evita arquivos gigantes por relógio inválido)
+    MAX_GAP_SECONDS = 60
+    # Correção máxima de deriva entre relógios de dispositivos (1%)
+    MAX_DRIFT = 0.01
+    # Atraso máximo tolerado entre dispositivos antes de completar com silêncio
+    MAX_SKEW_SECONDS = 5
+    # Duração do crossfade na troca de dispositivo durante a gravação
+    CROSSFADE_SECONDS = 0.05
+
+    def __init__(self, captures, filename, separate_files=False, subtype='FLOAT'):
+        super().__init__(daemon=True)
+        self.captures = list(captures)
+        self.subtype = subtype
+        # O primeiro dispositivo define a taxa e o relógio da gravação
+        self.samplerate = self.captures[0].samplerate
+        self.separate_files = separate_files and len(self.captures) > 1
+        if self.separate_files:
+            base, ext = os.path.splitext(filename)
+            self.filenames = [f"{base}_mic{i + 1}{ext}" for i in range(len(self.captures))]
+        else:
+            self.filenames = [filename]
+        self.paths = [name + ".part" for name in self.filenames]
+        self.frames_written = 0
+        # Lacunas no tempo do arquivo: {'channel': i, 'time': s, 'lost_seconds': s}
+        self.gap_markers = []
+        self.error = None
+        self._stop_event = threading.Event()
+        
+        count = len(self.captures)
+        # Pico e loudness de cada microfone medidos enquanto grava
+        self.meters = [LoudnessMeter(self.samplerate, capture.channels) for capture in self.captures]
+        # Forma de onda de cada arquivo gerada durante a gravação
+        if separate_files:
+            self.waveforms = [WaveformBuilder(self.samplerate, capture.channels) for capture in self.captures]
+        else:
+            self.waveforms = [WaveformBuilder(self.samplerate, sum(c.channels for c in self.captures))]
+        self._resamplers = [StreamResampler(capture.channels) for capture in self.captures]
+        self._drift = [1.0] * count
+        self._aligned = [False] * count
+        self._trim = [0] * count
+        self._pending = [[] for _ in range(count)]
+        self._pending_frames = [0] * count
+        self._output_frames = [0] * count
+        # Trocas de dispositivo pendentes: (índice, nova captura já iniciada)
+        self._swap_requests = deque()
+
+    def swap_capture(self, index, capture):
+        """Troca o dispositivo de um canal sem interromper o arquivo (a captura já deve estar rodando)"""
+        self._swap_requests.append((index, capture))
+
+    def run(self):
+        files = []
+        try:
+            if self.separate_files:
+                for capture, path in zip(self.captures, self.paths):
+                    files.append(sf.SoundFile(path, 'w', self.samplerate, capture.channels,
+                                             format='WAV', subtype=self.subtype))
+            else:
+                channels = sum(capture.channels for capture in self.captures)
+                files.append(sf.SoundFile(self.paths[0], 'w', self.samplerate, channels,
+                                         format='WAV', subtype=self.subtype))
+            
+            while not self._stop_event.wait(0.05):
+                self._process_swaps()
+                with metrics.span('recording.writer.drain'):
+                    for index in range(len(self.captures)):
+                        self._drain(index)
+                    self._flush(files)
+                for capture in self.captures:
+                    capture.maybe_adapt()
+                    capture.publish_metrics()
+            
+            self._process_swaps(force=True)
+            for index in range(len(self.captures)):
+                self._drain(index)
+            self._flush(files, final=True)
+            for capture in self.captures:
+                capture.publish_metrics()
+        except Exception as e:
+            print(f"Erro na gravação em disco: {e}")
+            self.error = e
+        finally:
+            for f in files:
+                f.close()
+            # Nenhum stream substituído pode ficar aberto
+            for _, capture in list(self._swap_requests):
+                capture.stop()
+                capture.release()
+
+    def stop(self):
+        """Sinaliza o fim da gravação e aguarda o esvaziamento dos buffers"""
+        self._stop_event.set()
+        self.join()
+
+    def _process_swaps(self, force=False):
+        """Conclui as trocas cujo novo stream já produziu áudio"""
+        while self._swap_requests:
+            index, capture = self._swap_requests[0]
+            if not force and (capture.started_at is None or not capture.ring.available()):
+                # O novo dispositivo ainda não entregou áudio: o antigo continua gravando
+                return
+            self._swap_requests.popleft()
+            with metrics.span('recording.writer.swap'):
+                self._swap(index, capture)
+
+    def _swap(self, index, capture):
+        """Fecha o stream antigo e emenda o novo com crossfade no mesmo arquivo"""
+        old = self.captures[index]
+        old.stop()
+        old.publish_metrics()
+        self._drain(index)
+        # O buffer antigo já foi todo lido: o segmento compartilhado pode sair
+        old.release()
+        
+        self.captures[index] = capture
+        self._resamplers[index] = StreamResampler(capture.channels)
+        self._drift[index] = 1.0
+        self._trim[index] = 0
+        self._aligned[index] = True
+        
+        if capture.started_at is None or old.started_at is None:
+            return
+        
+        # Quanto o novo stream se sobrepõe ao fim do antigo (no relógio da gravação)
+        old_end = old.started_at + old.frames_captured / old.samplerate
+        overlap = int((old_end - capture.started_at) * self.samplerate)
+        
+        # Lê o início do novo stream diretamente (lacunas anteriores a ele não se aplicam)
+        head = capture.ring.read()
+        while capture.gaps and capture.gaps[0][0] <= capture.ring.read_pos:
+            capture.gaps.popleft()
+        if capture.samplerate != self.samplerate:
+            head = self._resamplers[index].process(head, self._ratio(index))
+        
+        if overlap <= 0:
+            # Não houve sobreposição: registra a lacuna entre os streams
+            lost = -overlap
+            self.gap_markers.append({
+                'channel': index,
+                'time': self._output_frames[index] / self.samplerate,
+                'lost_seconds': lost / self.samplerate
+            })
+            self._append(index, np.zeros((min(lost, self.MAX_GAP_SECONDS * self.samplerate),
+                                          capture.channels), dtype='float32'))
+            self._append(index, head)
+            return
+        
+        fade = min(int(self.CROSSFADE_SECONDS * self.samplerate), overlap, self._pending_frames[index])
+        skip = min(overlap - fade, len(head))
+        head = head[skip:]
+        fade = min(fade, len(head))
+        if fade > 0:
+            # Crossfade de potência constante entre o fim do antigo e o começo do novo
+            tail = np.concatenate(self._pending[index])
+            ramp = np.linspace(0, np.pi / 2, fade, dtype='float32').reshape(-1, 1)
+            channels = min(tail.shape[1], head.shape[1])
+            tail[-fade:, :channels] = tail[-fade:, :channels] * np.cos(ramp) + head[:fade, :channels] * np.sin(ramp)
+            self._pending[index] = [tail]
+            head = head[fade:]
+        self._append(index, head)
+        metrics.increment('recording_hot_swaps')
+
+    def _drain(self, index):
+        """Lê os dados pendentes de um dispositivo, inserindo silêncio nas lacunas"""
+        capture = self.captures[index]
+        master = self.captures[0]
+        
+        if not self._aligned[index]:
+            # Alinha o início de cada dispositivo ao do principal
+            if capture.started_at is None or master.started_at is None:
+                return
+            offset = int((capture.started_at - master.started_at) * self.samplerate)
+            if offset > 0:
+                self._append(index, np.zeros((offset, capture.channels), dtype='float32'))
+            else:
+                self._trim[index] = -offset
+            self._aligned[index] = True
+        
+        ring = capture.ring
+        gaps = capture.gaps
+        end = ring.write_pos
+        
+        while gaps and gaps[0][0] <= end:
+            position, lost = gaps.popleft()
+            self._append_input(index, ring.read(position))
+            self.gap_markers.append({
+                'channel': index,
+                'time': self._output_frames[index] / self.samplerate,
+                'lost_seconds': lost / capture.samplerate
+            })
+            lost = min(lost, self.MAX_GAP_SECONDS * capture.samplerate)
+            if lost > 0:
+                self._append_input(index, np.zeros((lost, capture.channels), dtype='float32'))
+        
+        self._append_input(index, ring.read(end))
+
+    def _ratio(self, index):
+        """Frames de saída por frame de entrada (taxa nominal e deriva medida)"""
+        capture = self.captures[index]
+        nominal = self.samplerate / capture.samplerate
+        if index == 0:
+            # O dispositivo principal é o relógio da gravação
+            return nominal
+        master_rate = self.captures[0].measured_rate()
+        rate = capture.measured_rate()
+        if master_rate and rate:
+            drift = (master_rate / self.samplerate) / (rate / capture.samplerate)
+            drift = min(max(drift, 1 - self.MAX_DRIFT), 1 + self.MAX_DRIFT)
+            # Suaviza a estimativa para não modular o áudio
+            self._drift[index] = 0.95 * self._drift[index] + 0.05 * drift
+            metrics.set_gauge(f'capture_drift_ppm_mic{index + 1}', round((self._drift[index] - 1) * 1e6, 1))
+        return nominal * self._drift[index]
+
+    def _append_input(self, index, data):
+        """Converte para o relógio do dispositivo principal e enfileira"""
+        if not len(data):
+            return
+        if index > 0 or self.captures[index].samplerate != self.samplerate:
+            data = self._resamplers[index].process(data, self._ratio(index))
+        if self._trim[index]:
+            trim = min(self._trim[index], len(data))
+            data = data[trim:]
+            self._trim[index] -= trim
+        self._append(index, data)
+
+    def _append(self, index, data):
+        if len(data):
+            self.meters[index].add(data)
+            self._pending[index].append(data)
+            self._pending_frames[index] += len(data)
+            self._output_frames[index] += len(data)
+
+    def _take(self, index, frames, final=False):
+        """Retira exatamente `frames` frames da fila, completando com silêncio"""
+        channels = self.captures[index].channels
+        pending = self._pending[index]
+        data = np.concatenate(pending) if pending else np.zeros((0, channels), dtype='float32')
+        if len(data) < frames:
+            padding = frames - len(data)
+            if not final and self._output_frames[index] < max(self._output_frames):
+                # Dispositivo atrasado ou parado: o silêncio vira lacuna registrada
+                self.gap_markers.append({
+                    'channel': index,
+                    'time': self._output_frames[index] / self.samplerate,
+                    'lost_seconds': padding / self.samplerate
+                })
+                self._output_frames[index] += padding
+            data = np.concatenate((data, np.zeros((padding, channels), dtype='float32')))
+        self._pending[index] = [data[frames:]] if len(data) > frames else []
+        self._pending_frames[index] = max(0, len(data) - frames)
+        return data[:frames]
+
+    def _flush(self, files, final=False):
+        """Escreve nos arquivos os frames já alinhados"""
+        if self.separate_files:
+            for index, f in enumerate(files):
+                frames = self._pending_frames[index]
+                if frames:
+                    self._write(f, index, self._take(index, frames))
+            self.frames_written = max(self.frames_written, max(self._output_frames))
+            return
+        
+        if final:
+            frames = max(self._pending_frames)
+        else:
+            frames = min(self._pending_frames)
+            # Um dispositivo parado não pode segurar os demais indefinidamente
+            if max(self._pending_frames) - frames > self.MAX_SKEW_SECONDS * self.samplerate:
+                frames = max(self._pending_frames)
+        if frames <= 0:
+            return
+        
+        blocks = [self._take(index, frames, final) for index in range(len(self.captures))]
+        self._write(files[0], 0, blocks[0] if len(blocks) == 1 else np.concatenate(blocks, axis=1))
+        self.frames_written += frames
+
+    def _write(self, f, index, data):
+        """Grava um bloco no arquivo e alimenta a forma de onda resumida"""
+        # Formatos inteiros não podem receber amostras fora de [-1, 1]
+        if self.subtype != 'FLOAT':
+            data = np.clip(data, -1.0, 1.0)
+        f.write(data)
+        self.waveforms[index].add(data)
+
+
+def find_wav_data_chunk(path):
+    """Posição e tamanho do bloco 'data' de um WAV (RIFF)"""
+    with open(path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError("Não é um arquivo WAV RIFF")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("Bloco de dados não encontrado")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'data':
+                return f.tell(), size
+            # Blocos têm tamanho par (byte de preenchimento)
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+class MemmapAudioSource:
+    """WAV lido direto do mapa de memória: buscar é só calcular um índice"""
+    DTYPES = {'PCM_16': ('<i2', 32768.0), 'PCM_32': ('<i4', 2147483648.0),
+              'FLOAT': ('<f4', 1.0), 'DOUBLE': ('<f8', 1.0)}
+
+    def __init__(self, path):
+        info = sf.info(path)
+        if info.format != 'WAV' or info.subtype not in self.DTYPES:
+            raise ValueError(f"Formato sem mapeamento direto: {info.format}/{info.subtype}")
+        dtype, self.scale = self.DTYPES[info.subtype]
+        offset, size = find_wav_data_chunk(path)
+        self.samplerate = info.samplerate
+        self.channels = info.channels
+        self.frames = min(info.frames, size // (np.dtype(dtype).itemsize * info.channels))
+        self.data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(self.frames, self.channels))
+
+    def read(self, start, frames):
+        block = self.data[start:start + frames]
+        if self.scale != 1.0:
+            return block.astype('float32') / self.scale
+        return block.astype('float32')
+
+    def close(self):
+        self.data = None
+
+
+class DecodedAudioSource:
+    """Demais formatos decodificados em blocos pelo soundfile"""
+    def __init__(self, path):
+        self.file = sf.SoundFile(path, 'r')
+        self.samplerate = self.file.samplerate
+        self.channels = self.file.channels
+        self.frames = self.file.frames
+
+    def read(self, start, frames):
+        if self.file.tell() != start:
+            self.file.seek(start)
+        return self.file.read(frames, dtype='float32', always_2d=True)
+
+    def close(self):
+        self.file.close()
+
+
+def open_audio_source(path):
+    """Mapa de memória quando possível, decodificação em blocos caso contrário"""
+    try:
+        return MemmapAudioSource(path)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"Reprodução sem mapa de memória para {os.path.basename(path)}: {e}")  # Debug
+        return DecodedAudioSource(path)
+
+
+class AudioPlayer:
+    """Prévia do áudio: uma thread lê à frente do ponto de reprodução e o callback só copia"""
+    BLOCK_FRAMES = 4096
+    PREBUFFER_SECONDS = 0.5
+
+    def __init__(self):
+        self.path = None
+        self.source = None
+        self.stream = None
+        self.gains = None
+        self.playing = False
+        self.finished = False
+        self.samplerate = 0
+        self._ratio = 1.0
+        self._channels = 1
+        self._blocks = deque()
+        self._head = 0
+        self._queued = 0
+        self._generation = 0
+        self._read_pos = 0
+        self._play_pos = 0
+        # Contado no callback e repassado às métricas pela thread de leitura
+        self.underruns = 0
+        self._published_underruns = 0
+        self._resampler = None
+        self._lock = threading.Lock()
+        self._source_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def duration(self):
+        return self.source.frames / self.source.samplerate if self.source else 0.0
+
+    def open(self, path, gains=None):
+        """Abre um arquivo para reprodução (fecha o anterior)"""
+        self.close()
+        self.source = open_audio_source(path)
+        self.path = path
+        self.gains = np.asarray(gains, dtype='float32').reshape(1, -1) if gains else None
+        # Mono e estéreo tocam como estão; mais canais são mixados em mono
+        self._channels = self.source.channels if self.source.channels <= 2 else 1
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.seek(0.0)
+
+    def close(self):
+        """Para a reprodução e libera o arquivo"""
+        if self.stream is not None:
+            self.stream.abort()
+            self.stream.close()
+            self.stream = None
+            portaudio_streams.closed()
+        self.playing = False
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+        self.path = None
+
+    def play(self):
+        if self.source is None:
+            return
+        if self.stream is None:
+            self._open_stream()
+        if self.finished:
+            self.seek(0.0)
+        self.stream.start()
+        self.playing = True
+
+    def pause(self):
+        if self.stream is not None:
+            self.stream.stop()
+        self.playing = False
+
+    def position(self):
+        """Instante em reprodução (segundos)"""
+        return self._play_pos / self.source.samplerate if self.source else 0.0
+
+    def seek(self, seconds):
+        """Descarta o que estava na fila e lê o primeiro bloco do novo ponto na hora"""
+        if self.source is None:
+            return
+        with metrics.span('player.seek'):
+            frame = int(min(max(0.0, seconds), self.duration) * self.source.samplerate)
+            with self._lock:
+                self._generation += 1
+                generation = self._generation
+                self._blocks.clear()
+                self._head = 0
+                self._queued = 0
+                self._read_pos = frame
+                self._play_pos = frame
+                self.finished = False
+                self._resampler = StreamResampler(self._channels) if self._ratio != 1.0 else None
+            self._fill(generation)
+        self._wake.set()
+
+    def _open_stream(self):
+        # Registrado antes das consultas: a varredura de dispositivos não reinicializa o PortAudio
+        # enquanto o stream da prévia existir
+        portaudio_streams.opened()
+        try:
+            # Usa a taxa do arquivo; se a saída não aceitar, reamostra para a taxa padrão dela
+            samplerate = self.source.samplerate
+            try:
+                sd.check_output_settings(samplerate=samplerate, channels=self._channels, dtype='float32')
+            except Exception:
+                samplerate = int(sd.query_devices(kind='output')['default_samplerate'])
+            self.samplerate = samplerate
+            self._ratio = samplerate / self.source.samplerate
+            self.stream = sd.OutputStream(samplerate=samplerate, channels=self._channels,
+                                          dtype='float32', callback=self._callback)
+        except Exception:
+            portaudio_streams.closed()
+            raise
+        self.seek(self.position())
+
+    def _fill(self, generation):
+        """Lê um bloco na posição de leitura atual e o coloca na fila"""
+        with self._source_lock:
+            with self._lock:
+                if generation != self._generation:
+                    return False
+                start = self._read_pos
+                resampler = self._resampler
+            data = self.source.read(start, self.BLOCK_FRAMES)
+            frames = len(data)
+            if frames:
+                if self.gains is not None and self.gains.shape[1] == data.shape[1]:
+                    data = data * self.gains
+                if data.shape[1] != self._channels:
+                    data = data.mean(axis=1, keepdims=True)
+                if resampler is not None:
+                    data = resampler.process(data, self._ratio)
+                np.clip(data, -1.0, 1.0, out=data)
+        with self._lock:
+            if generation != self._generation:
+                return False
+            if frames:
+                self._blocks.append((start, frames, data))
+                self._queued += len(data)
+                self._read_pos = start + frames
+            return bool(frames)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            underruns = self.underruns
+            if underruns != self._published_underruns:
+                metrics.increment('player_underruns', underruns - self._published_underruns)
+                self._published_underruns = underruns
+            with self._lock:
+                generation = self._generation
+                needed = self._queued < self.PREBUFFER_SECONDS * self.source.samplerate * self._ratio
+                more = self._read_pos < self.source.frames
+            if not (needed and more and self._fill(generation)):
+                self._wake.wait(0.02)
+                self._wake.clear()
+
+    def _callback(self, outdata, frames, time_info, status):
+        written = 0
+        with self._lock:
+            while written < frames and self._blocks:
+                start, source_frames, data = self._blocks[0]
+                count = min(frames - written, len(data) - self._head)
+                outdata[written:written + count] = data[self._head:self._head + count]
+                written += count
+                self._head += count
+                self._queued -= count
+                self._play_pos = start + int(source_frames * self._head / max(1, len(data)))
+                if self._head >= len(data):
+                    self._blocks.popleft()
+                    self._head = 0
+            if written < frames:
+                outdata[written:] = 0
+                if self._read_pos >= self.source.frames and not self._blocks:
+                    self.finished = True
+                elif self.playing:
+                    self.underruns += 1
+        self._wake.set()
+
+
+def load_audio_channel(path, channel, sr=16000):
+    """Decodifica um único canal do arquivo em mono 16 kHz (mesmo formato do whisper.load_audio)"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-af", f"pan=mono|c0=c{channel}",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Falha ao decodificar áudio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def format_timestamp(seconds):
+    """Formata segundos como mm:ss ou hh:mm:ss"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def apply_library_gain(sources, path, library):
+    """Aplica na leitura o ganho de normalização guardado no índice da biblioteca"""
+    if library is None:
+        return sources
+    gained = []
+    for channel, (label, source) in enumerate(sources):
+        if isinstance(source, str):
+            gains = library.get(os.path.basename(source)).get('gain') or [1.0]
+            gain = gains[0]
+            if gain != 1.0:
+                source = np.clip(load_audio_channel(source, 0) * gain, -1.0, 1.0)
+        else:
+            gains = library.get(os.path.basename(path)).get('gain') or []
+            gain = gains[channel] if channel < len(gains) else 1.0
+            if gain != 1.0:
+                source = np.clip(source * gain, -1.0, 1.0)
+        gained.append((label, source))
+    return gained
+
+
+API_COST_PER_MINUTE = 0.006
+
+
+def transcription_cost(duration_seconds):
+    """Custo que a transcrição teria em uma API paga (base da economia exibida)"""
+    return (duration_seconds / 60) * API_COST_PER_MINUTE
+
+
+# Idiomas oferecidos: código do Whisper -> (nome exibido, prompt inicial)
+LANGUAGES = {
+    'pt': ("Português (Brasil)", "Transcrição em português brasileiro:"),
+    'en': ("Inglês", "Transcription in English:"),
+    'es': ("Espanhol", "Transcripción en español:"),
+    'fr': ("Francês", "Transcription en français :"),
+    'it': ("Italiano", "Trascrizione in italiano:"),
+    'de': ("Alemão", "Transkription auf Deutsch:")
+}
+
+
+def language_name(code):
+    """Nome exibido de um idioma (o código quando não está na lista)"""
+    return LANGUAGES[code][0] if code in LANGUAGES else code
+
+
+def segment_line(segment):
+    """Linha exibida para um segmento: [mm:ss] (Mic N:) texto"""
+    speaker = f"{segment['speaker']}: " if segment.get('speaker') else ""
+    return f"[{format_timestamp(segment['start'])}] {speaker}{segment['text']}"
+
+
+def transcript_text(segments):
+    """Texto corrido (um canal) ou linhas com horário e microfone (vários canais)"""
+    if any(segment.get('speaker') for segment in segments):
+        return "\n".join(segment_line(segment) for segment in segments if segment['text'])
+    return " ".join(segment['text'] for segment in segments if segment['text'])
+
+
+def subtitle_cues(segments, max_chars=42, max_seconds=5.0):
+    """Legendas (início, fim, texto): cortadas por palavra quando há tempos por palavra, senão por segmento"""
+    cues = []
+    for segment in segments:
+        speaker = f"{segment['speaker']}: " if segment.get('speaker') else ""
+        if not segment.get('words'):
+            if segment['text']:
+                cues.append((segment['start'], segment['end'], speaker + segment['text']))
+            continue
+        current = []
+        for start, end, word in segment['words']:
+            text = "".join(item[2] for item in current) + word
+            if current and (len(text.strip()) > max_chars or end - current[0][0] > max_seconds):
+                cues.append((current[0][0], current[-1][1], speaker + "".join(item[2] for item in current).strip()))
+                current = []
+            current.append((start, end, word))
+        if current:
+            cues.append((current[0][0], current[-1][1], speaker + "".join(item[2] for item in current).strip()))
+    return cues
+
+
+def srt_timestamp(seconds):
+    """Horário no formato do SRT (hh:mm:ss,mmm)"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+
+def srt_text(segments):
+    """Arquivo de legendas SRT dos segmentos"""
+    return "\n".join(f"{number}\n{srt_timestamp(start)} --> {srt_timestamp(end)}\n{text}\n"
+                     for number, (start, end, text) in enumerate(subtitle_cues(segments), 1))
+
+
+def available_memory():
+    """Memória livre para novos trabalhos em bytes (None se não for possível medir)"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def process_memory():
+    """Memória residente do processo em bytes (None se não for possível medir)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_resource_settings(path):
+    """Limites de memória e tamanhos medidos dos modelos (com valores padrão)"""
+    settings = {
+        'memory_limit_mb': 0,
+        'reserve_fraction': 0.1,
+        'allow_downgrade': True,
+        'model_bytes': {},
+        'decode_bytes': {}
+    }
+    try:
+        with open(path, 'r') as f:
+            settings.update(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+    return settings
+
+
+# Classes de prioridade dos trabalhos, da mais para a menos prioritária
+PRIORITIES = ('interactive', 'live', 'batch')
+
+
+class ResourceGovernor:
+    """Admissão de trabalhos pela memória medida de modelos e decodificações: espera ou usa um modelo menor"""
+    MODEL_ORDER = ('tiny', 'base', 'small', 'medium', 'large')
+    # Parâmetros em fp32 até o tamanho real ser medido no primeiro carregamento
+    DEFAULT_MODEL_BYTES = {'tiny': 39e6 * 4, 'base': 74e6 * 4, 'small': 244e6 * 4,
+                           'medium': 769e6 * 4, 'large': 1550e6 * 4}
+    # Memória de trabalho de uma decodificação em relação ao modelo, até ser medida
+    DEFAULT_DECODE_FRACTION = 0.25
+
+    def __init__(self, path=None):
+        self.path = path
+        self.settings = load_resource_settings(path) if path else load_resource_settings(os.devnull)
+        self._condition = threading.Condition()
+        # Instâncias carregadas por modelo (informadas pelo núcleo)
+        self.instances = {}
+        # Carregamentos previstos por trabalhos admitidos que ainda não aconteceram
+        self._pending = {}
+        # Trabalho admitido -> (bytes da decodificação, bytes do áudio, classe de prioridade)
+        self._jobs = {}
+        # Modelos cuja primeira decodificação já foi observada nesta sessão
+        self._observed = set()
+        self.waiting = 0
+        # Funções do núcleo: instâncias ociosas de um modelo e liberação das ociosas
+        self.idle_count = lambda model_key: 0
+        self.release_idle = lambda keep: False
+
+    def model_bytes(self, model_key):
+        return self.settings['model_bytes'].get(model_key) or self.DEFAULT_MODEL_BYTES.get(model_key, 0)
+
+    def decode_bytes(self, model_key):
+        measured = self.settings['decode_bytes'].get(model_key)
+        return measured or self.model_bytes(model_key) * self.DEFAULT_DECODE_FRACTION
+
+    def record_model(self, model_key, nbytes):
+        """Tamanho medido de uma instância carregada"""
+        if self.settings['model_bytes'].get(model_key) != nbytes:
+            self.settings['model_bytes'][model_key] = nbytes
+            self._save()
+
+    def record_decode(self, model_key, nbytes):
+        """Crescimento de memória observado numa decodificação (guarda o maior)"""
+        if nbytes > self.settings['decode_bytes'].get(model_key, 0):
+            self.settings['decode_bytes'][model_key] = nbytes
+            self._save()
+
+    def running(self):
+        """Trabalhos admitidos em andamento"""
+        with self._condition:
+            return len(self._jobs)
+
+    def measuring(self, model_key):
+        """Primeira decodificação do modelo com um só trabalho em andamento: o crescimento
+        da memória do processo é todo dela (nas seguintes o alocador já reaproveita memória)"""
+        with self._condition:
+            if model_key in self._observed:
+                return False
+            self._observed.add(model_key)
+            return len(self._jobs) == 1
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path + ".tmp", 'w') as f:
+                json.dump(self.settings, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"Erro ao salvar {self.path}: {e}")  # Debug
+
+    def model_loaded(self, model_key):
+        with self._condition:
+            self.instances[model_key] = self.instances.get(model_key, 0) + 1
+            if self._pending.get(model_key):
+                self._pending[model_key] -= 1
+        self._publish()
+
+    def model_unloaded(self, model_key):
+        with self._condition:
+            self.instances[model_key] = max(0, self.instances.get(model_key, 0) - 1)
+            self._condition.notify_all()
+        self._publish()
+
+    def used(self, priority=None):
+        """Bytes em uso pelos modelos carregados ou previstos e pelos trabalhos admitidos; para uma
+        classe de prioridade, trabalhos menos prioritários (pausados por ela) contam só o áudio"""
+        models = sum(count * self.model_bytes(key) for key, count in self.instances.items())
+        pending = sum(count * self.model_bytes(key) for key, count in self._pending.items())
+        rank = PRIORITIES.index(priority) if priority else len(PRIORITIES)
+        jobs = sum(audio + (decode if job_rank <= rank else 0)
+                   for decode, audio, job_rank in self._jobs.values())
+        return models + pending + jobs
+
+    def limit(self):
+        """Memória que os trabalhos podem usar: o que já é nosso mais o que está livre, menos a reserva"""
+        available = available_memory()
+        if available is None:
+            return None
+        total = available + self.used()
+        if self.settings['memory_limit_mb']:
+            total = min(total, self.settings['memory_limit_mb'] * 1024 * 1024)
+        return total * (1 - self.settings['reserve_fraction'])
+
+    def _new_instances(self, model_keys):
+        """Modelos para os quais o trabalho vai precisar carregar uma instância nova"""
+        return [key for key in model_keys
+                if self.idle_count(key) - self._pending.get(key, 0) <= 0]
+
+    def _need(self, model_keys, audio_bytes):
+        new = self._new_instances(model_keys)
+        return (sum(self.model_bytes(key) for key in new)
+                + max(self.decode_bytes(key) for key in model_keys) + audio_bytes)
+
+    def _idle_bytes(self, keep):
+        return sum(self.idle_count(key) * self.model_bytes(key) for key in self.instances if key not in keep)
+
+    def _downgrade(self, model_key, extra_keys, audio_bytes, limit, priority=None):
+        """Maior modelo menor que o pedido que cabe na memória agora"""
+        if model_key not in self.MODEL_ORDER:
+            return None
+        for smaller in reversed(self.MODEL_ORDER[:self.MODEL_ORDER.index(model_key)]):
+            keys = [smaller] + [key for key in extra_keys if key != smaller]
+            if self.used(priority) + self._need(keys, audio_bytes) <= limit:
+                return smaller
+        return None
+
+    @contextmanager
+    def admit(self, model_key, extra_keys=(), audio_bytes=0, on_status=None, priority='interactive'):
+        """Admite um trabalho; devolve o modelo concedido (o pedido ou um menor)"""
+        job = object()
+        waited = False
+        rank = PRIORITIES.index(priority)
+        with self._condition:
+            while True:
+                keys = [model_key] + [key for key in extra_keys if key != model_key]
+                limit = self.limit()
+                if limit is None or self.used(priority) + self._need(keys, audio_bytes) <= limit:
+                    break
+                # Cabe liberando instâncias ociosas de outros modelos
+                need = self._need(keys, audio_bytes)
+                if self.used(priority) - self._idle_bytes(keys) + need <= limit and self.release_idle(keys):
+                    continue
+                # Trabalhos de prioridade igual ou maior vão devolver memória: espera na fila
+                # (os menos prioritários ficam pausados por este e não liberariam nada)
+                if any(job_rank <= rank for _, _, job_rank in self._jobs.values()):
+                    if not waited:
+                        waited = True
+                        self.waiting += 1
+                        metrics.increment('memory_waits')
+                        if on_status:
+                            on_status("Aguardando memória livre...")
+                    self._condition.wait(1.0)
+                    continue
+                # Sozinho e ainda sem espaço: modelo menor ou segue avisando
+                smaller = self._downgrade(model_key, extra_keys, audio_bytes, limit, priority) \
+                    if self.settings['allow_downgrade'] else None
+                # Nenhum modelo menor cabe como está: libera as instâncias ociosas e tenta de novo
+                if not smaller and self.release_idle(keys):
+                    continue
+                if smaller:
+                    print(f"Memória insuficiente para {model_key}: usando {smaller}")  # Debug
+                    metrics.increment('memory_downgrades')
+                    model_key = smaller
+                    keys = [model_key] + [key for key in extra_keys if key != model_key]
+                else:
+                    print(f"Memória possivelmente insuficiente para {model_key}")  # Debug
+                break
+            if waited:
+                self.waiting -= 1
+            new = self._new_instances(keys)
+            for key in new:
+                self._pending[key] = self._pending.get(key, 0) + 1
+            self._jobs[job] = (max(self.decode_bytes(key) for key in keys), audio_bytes, rank)
+        self._publish()
+        
+        try:
+            yield model_key
+        finally:
+            with self._condition:
+                del self._jobs[job]
+                # Carregamentos previstos que não aconteceram (ex.: modelo da cascata sem uso)
+                for key in new:
+                    if self._pending.get(key):
+                        self._pending[key] -= 1
+                self._condition.notify_all()
+            self._publish()
+
+    def utilization(self):
+        """Situação atual: limite, uso, instâncias por modelo, trabalhos e espera"""
+        with self._condition:
+            return {
+                'limit_bytes': self.limit(),
+                'used_bytes': self.used(),
+                'models': dict(self.instances),
+                'jobs': len(self._jobs),
+                'waiting': self.waiting
+            }
+
+    def _publish(self):
+        state = self.utilization()
+        metrics.set_gauge('memory_used_bytes', int(state['used_bytes']))
+        if state['limit_bytes'] is not None:
+            metrics.set_gauge('memory_limit_bytes', int(state['limit_bytes']))
+        metrics.set_gauge('jobs_running', state['jobs'])
+        metrics.set_gauge('jobs_waiting_memory', state['waiting'])
+
+
+class SchedulerTicket:
+    """Trabalho registrado no escalonador; wait() é chamado antes de cada janela"""
+    def __init__(self, scheduler, priority, submitted_at):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.submitted_at = submitted_at
+        self.started = False
+        self.paused_seconds = 0.0
+
+    def wait(self):
+        self.scheduler.wait_turn(self)
+
+
+class PriorityScheduler:
+    """Preempção entre janelas: com um trabalho mais prioritário registrado, os demais param antes
+    da próxima janela e continuam do mesmo ponto quando ele termina"""
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._jobs = {priority: 0 for priority in PRIORITIES}
+
+    @contextmanager
+    def job(self, priority, submitted_at=None):
+        """Registra um trabalho enquanto ele durar (inclusive a espera por memória e o carregamento)"""
+        ticket = SchedulerTicket(self, priority, submitted_at or time.perf_counter())
+        self.register(priority)
+        try:
+            yield ticket
+        finally:
+            self.unregister(priority)
+
+    def register(self, priority):
+        """Marca um trabalho ativo da classe (a gravação ao vivo usa isto diretamente)"""
+        with self._condition:
+            self._jobs[priority] += 1
+        self._publish()
+
+    def unregister(self, priority):
+        with self._condition:
+            self._jobs[priority] -= 1
+            self._condition.notify_all()
+        self._publish()
+
+    def preempted(self, priority):
+        """Há trabalho registrado de uma classe mais prioritária"""
+        with self._condition:
+            return any(self._jobs[other] for other in PRIORITIES[:PRIORITIES.index(priority)])
+
+    def wait_turn(self, ticket):
+        """Ponto de preempção: espera enquanto houver trabalho mais prioritário"""
+        with self._condition:
+            if self.preempted(ticket.priority):
+                print(f"Trabalho {ticket.priority} pausado para um mais prioritário")  # Debug
+                metrics.increment(f'scheduler.preempted.{ticket.priority}')
+                pause_start = time.perf_counter()
+                while self.preempted(ticket.priority):
+                    self._condition.wait()
+                paused = time.perf_counter() - pause_start
+                ticket.paused_seconds += paused
+                metrics.observe(f'scheduler.paused.{ticket.priority}', paused)
+            if not ticket.started:
+                # Espera na fila da classe: do envio até a primeira janela
+                ticket.started = True
+                metrics.observe(f'scheduler.wait.{ticket.priority}', time.perf_counter() - ticket.submitted_at)
+
+    def _publish(self):
+        with self._condition:
+            counts = dict(self._jobs)
+        for priority, count in counts.items():
+            metrics.set_gauge(f'jobs_{priority}', count)
+
+
+def cpu_quota():
+    """CPUs concedidas pela cota do cgroup (None quando não há cota)"""
+    try:
+        # cgroup v2: "max 100000" ou "150000 100000"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def allowed_cpus():
+    """CPUs lógicas da máscara de afinidade do processo"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def usable_cpus():
+    """Quantas CPUs o processo pode ocupar: afinidade limitada pela cota do cgroup"""
+    cpus = len(allowed_cpus())
+    quota = cpu_quota()
+    if quota:
+        cpus = min(cpus, max(1, int(quota)))
+    return cpus
+
+
+def physical_cores():
+    """Núcleos físicos entre as CPUs permitidas (os hyperthreads de um núcleo contam uma vez)"""
+    cores = set()
+    for cpu in allowed_cpus():
+        try:
+            with open(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list') as f:
+                cores.add(f.read().strip())
+        except OSError:
+            cores.add(str(cpu))
+    return min(len(cores), usable_cpus())
+
+
+class CpuTuning:
+    """Threads de inferência calibradas por máquina e modelo, guardadas em config/cpu_tuning.json"""
+    def __init__(self, path=None):
+        self.path = path
+        self.host = socket.gethostname()
+        self.hosts = {}
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    self.hosts = json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+
+    def models(self):
+        """Calibração desta máquina (vale só enquanto CPUs e cota forem as mesmas)"""
+        entry = self.hosts.get(self.host, {})
+        if entry.get('cpus') != usable_cpus():
+            return {}
+        return entry.get('models', {})
+
+    def threads_for(self, model_key, jobs=1, reserved=0):
+        """Threads por trabalho com `jobs` decodificações simultâneas e `reserved` CPUs reservadas (captura)"""
+        calibrated = self.models().get(model_key, {}).get('threads_by_jobs', {})
+        if calibrated:
+            # Usa a medição com o número de trabalhos mais próximo (sem passar do atual)
+            counts = sorted(int(count) for count in calibrated)
+            best = max([count for count in counts if count <= jobs] or counts[:1])
+            threads = calibrated[str(best)] * best // max(1, jobs)
+        else:
+            # Sem calibração: um thread por núcleo físico dividido entre os trabalhos
+            threads = physical_cores() // max(1, jobs)
+        return max(1, min(threads, usable_cpus() - reserved))
+
+    def store(self, model_key, threads_by_jobs, throughput):
+        """Registra o resultado de uma calibração e salva"""
+        entry = self.hosts.setdefault(self.host, {})
+        if entry.get('cpus') != usable_cpus():
+            entry['models'] = {}
+        entry['cpus'] = usable_cpus()
+        entry['physical_cores'] = physical_cores()
+        entry['cpu_quota'] = cpu_quota()
+        entry.setdefault('models', {})[model_key] = {
+            'threads_by_jobs': {str(jobs): threads for jobs, threads in threads_by_jobs.items()},
+            'throughput': {str(jobs): round(value, 3) for jobs, value in throughput.items()},
+            'calibrated_at': datetime.now().isoformat(timespec='seconds')
+        }
+        if self.path:
+            with open(self.path + ".tmp", 'w') as f:
+                json.dump(self.hosts, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+
+
+class DecodeGuard:
+    """Supervisiona as janelas de um arquivo: detecta decodificação descontrolada e limita as novas tentativas"""
+    MAX_COMPRESSION = 2.4
+    # Fala rápida em português passa de 6 tokens/s: a taxa só conta junto com texto já repetitivo
+    MAX_TOKENS_PER_SECOND = 10
+    SUSPECT_COMPRESSION = 1.8
+    # Mesma palavra ou sequência de até 4 palavras repetida em seguida
+    MAX_NGRAM = 4
+    MAX_REPEATS = 5
+    # Temperaturas das novas tentativas (sem o contexto da janela anterior)
+    RESEED_TEMPERATURES = (0.6, 1.0)
+
+    def __init__(self, max_retries=8):
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.skipped = []
+        self.wasted_seconds = 0.0
+
+    def runaway(self, segments, duration):
+        """Motivo pelo qual a janela parece descontrolada (None se estiver normal)"""
+        text = " ".join(segment['text'].strip() for segment in segments)
+        if not text:
+            return None
+        data = text.encode('utf-8')
+        compression = len(data) / len(zlib.compress(data)) if len(data) > 64 else 0.0
+        if compression > self.MAX_COMPRESSION:
+            return "texto repetitivo"
+        
+        tokens = sum(len(segment.get('tokens') or segment['text'].split()) for segment in segments)
+        if (duration >= 1 and tokens / duration > self.MAX_TOKENS_PER_SECOND
+                and compression > self.SUSPECT_COMPRESSION):
+            return f"{tokens / duration:.1f} tokens/s com texto repetitivo"
+        
+        words = text.lower().split()
+        for n in range(1, self.MAX_NGRAM + 1):
+            run = 0
+            for i in range(n, len(words)):
+                run = run + 1 if words[i] == words[i - n] else 0
+                if run >= n * (self.MAX_REPEATS - 1):
+                    return f"repetição de {n} palavra(s)"
+        return None
+
+    def discard(self, seconds):
+        """Contabiliza o tempo de uma decodificação descartada"""
+        with self._lock:
+            self.wasted_seconds += seconds
+
+    def take_retry(self):
+        """Reserva uma nova tentativa do orçamento do arquivo"""
+        with self._lock:
+            if self.retries >= self.max_retries:
+                return False
+            self.retries += 1
+            return True
+
+    def skip(self, offset, seconds):
+        with self._lock:
+            self.skipped.append((offset, seconds))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'skipped_windows': len(self.skipped),
+                'skipped_seconds': sum(seconds for _, seconds in self.skipped),
+                'skipped_at': sorted(offset for offset, _ in self.skipped),
+                'wasted_seconds': self.wasted_seconds
+            }
+
+
+class TranscriptionCheckpoint:
+    """Progresso de uma transcrição em JSON Lines: cabeçalho e uma linha por janela concluída"""
+    def __init__(self, path, identity):
+        self.path = path
+        self.identity = identity
+        self._file = None
+        # Bytes até a última linha íntegra
+        self._valid_length = 0
+
+    def load(self):
+        """Estado salvo (fim da última janela, segmentos, contexto, segundos reprocessados) ou None"""
+        try:
+            with open(self.path, 'rb') as f:
+                lines = f.read().split(b"\n")
+        except FileNotFoundError:
+            return None
+        try:
+            if len(lines) < 2 or json.loads(lines[0]) != self.identity:
+                return None
+        except ValueError:
+            return None
+        
+        end_sample, segments, prompt, escalated = 0, [], "", 0.0
+        self._valid_length = len(lines[0]) + 1
+        # A última parte não termina em quebra de linha: está vazia ou incompleta
+        for line in lines[1:-1]:
+            try:
+                window = json.loads(line)
+            except ValueError:
+                break
+            end_sample = window['end_sample']
+            segments.extend(window['segments'])
+            prompt = window['prompt']
+            escalated += window.get('escalated', 0.0)
+            self._valid_length += len(line) + 1
+        return end_sample, segments, prompt, escalated
+
+    def open(self, resume):
+        """Abre para acrescentar janelas (recomeça o arquivo quando não há o que retomar)"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if resume:
+            # Descarta a linha incompleta de uma queda no meio da escrita
+            self._file = open(self.path, 'r+', encoding='utf-8')
+            self._file.truncate(self._valid_length)
+            self._file.seek(self._valid_length)
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write(self.identity)
+
+    def commit(self, end_sample, segments, prompt, escalated=0.0):
+        """Registra uma janela concluída (gravada em disco antes de seguir)"""
+        self._write({'end_sample': end_sample, 'segments': segments, 'prompt': prompt,
+                     'escalated': escalated})
+
+    def _write(self, data):
+        self._file.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, remove=False):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def incremental(self, old_hashes):
+        """Checkpoint de uma retranscrição incremental: só vale sobre a mesma transcrição anterior"""
+        basis = hashlib.blake2b("".join(old_hashes).encode('ascii'), digest_size=8).hexdigest()
+        return TranscriptionCheckpoint(os.path.splitext(self.path)[0] + ".incremental.jsonl",
+                                       dict(self.identity, incremental=basis))
+
+
+class ModelStore:
+    """Modelos do Whisper na pasta do programa: importados explicitamente, conferidos pelo SHA-256
+    oficial e convertidos para pesos mapeáveis em memória (carga rápida, páginas compartilhadas)"""
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        # Tempo da última carga de cada modelo nesta sessão (o manifesto só é escrito na importação)
+        self.load_seconds = {}
+
+    def path(self, model_key, name=''):
+        return os.path.join(self.directory, model_key, name)
+
+    def manifest(self, model_key):
+        try:
+            with open(self.path(model_key, self.MANIFEST), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, model_key, manifest):
+        path = self.path(model_key, self.MANIFEST)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def has(self, model_key):
+        manifest = self.manifest(model_key)
+        return manifest is not None and os.path.exists(self.path(model_key, manifest['weights']))
+
+    @staticmethod
+    def expected_sha256(model_key):
+        """SHA-256 oficial do checkpoint (faz parte da URL de download do whisper)"""
+        import whisper
+        # _MODELS e _ALIGNMENT_HEADS são internos do whisper: a versão fica fixa no requirements.txt
+        url = whisper._MODELS.get(model_key)
+        return url.split('/')[-2] if url else None
+
+    @staticmethod
+    def sha256(path, chunk_size=1 << 20):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def import_model(self, model_key, source, on_status=None):
+        """Confere um checkpoint .pt do whisper e guarda os pesos convertidos"""
+        if on_status:
+            on_status("Conferindo checksum...")
+        expected = self.expected_sha256(model_key)
+        digest = self.sha256(source)
+        if expected and digest != expected:
+            raise ValueError(f"O arquivo não é o checkpoint oficial do modelo {model_key} (checksum diferente)")
+        
+        if on_status:
+            on_status("Convertendo pesos...")
+        import torch
+        checkpoint = torch.load(source, map_location='cpu', weights_only=True)
+        # float32 contíguo: é o formato usado na inferência, então a carga não converte nada
+        state = {name: tensor.float().contiguous() for name, tensor in checkpoint['model_state_dict'].items()}
+        os.makedirs(self.path(model_key), exist_ok=True)
+        try:
+            from safetensors.torch import save_file
+            weights, weights_format = 'model.safetensors', 'safetensors'
+            save_file(state, self.path(model_key, weights + ".tmp"))
+        except ImportError:
+            # Sem safetensors: checkpoint do torch, carregado com mmap=True
+            weights, weights_format = 'model.pt', 'torch'
+            torch.save(state, self.path(model_key, weights + ".tmp"))
+        os.replace(self.path(model_key, weights + ".tmp"), self.path(model_key, weights))
+        
+        manifest = {
+            'model': model_key,
+            'format': weights_format,
+            'weights': weights,
+            'dims': checkpoint['dims'],
+            'source_name': os.path.basename(source),
+            'source_sha256': digest,
+            'official': expected is not None,
+            'weights_sha256': self.sha256(self.path(model_key, weights)),
+            'size': os.path.getsize(self.path(model_key, weights)),
+            'imported_at': datetime.now().isoformat(timespec='seconds')
+        }
+        self._write_manifest(model_key, manifest)
+        metrics.increment('models_imported')
+        print(f"Modelo {model_key} importado: {manifest['size'] / 1e6:.0f} MB ({weights_format})")  # Debug
+        return manifest
+
+    def verify(self, model_key):
+        """Verificação completa dos pesos (a carga confere só o tamanho, para não ler o arquivo inteiro)"""
+        manifest = self.manifest(model_key)
+        return (manifest is not None
+                and self.sha256(self.path(model_key, manifest['weights'])) == manifest['weights_sha256'])
+
+    def load(self, model_key):
+        """Instância do Whisper usando os tensores mapeados do arquivo, sem desserializar o checkpoint"""
+        import torch
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+        manifest = self.manifest(model_key)
+        path = self.path(model_key, manifest['weights'])
+        if os.path.getsize(path) != manifest['size']:
+            raise ValueError(f"Arquivo do modelo {model_key} corrompido (tamanho diferente do importado)")
+        
+        load_start = time.perf_counter()
+        if manifest['format'] == 'safetensors':
+            from safetensors.torch import load_file
+            state = load_file(path)
+        else:
+            state = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+        dims = ModelDimensions(**manifest['dims'])
+        try:
+            # Sem inicializar pesos que seriam sobrescritos: encoder e decoder nascem sem memória e os
+            # parâmetros passam a ser os próprios tensores do arquivo
+            from whisper.model import AudioEncoder, TextDecoder
+            model = Whisper.__new__(Whisper)
+            torch.nn.Module.__init__(model)
+            model.dims = dims
+            with torch.device('meta'):
+                model.encoder = AudioEncoder(dims.n_mels, dims.n_audio_ctx, dims.n_audio_state,
+                                             dims.n_audio_head, dims.n_audio_layer)
+                model.decoder = TextDecoder(dims.n_vocab, dims.n_text_ctx, dims.n_text_state,
+                                            dims.n_text_head, dims.n_text_layer)
+            model.load_state_dict(state, assign=True)
+            # Buffers fora do state_dict, recriados como no construtor do whisper
+            model.decoder.mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-np.inf).triu_(1)
+            heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+            heads[dims.n_text_layer // 2:] = True
+            model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+            if any(tensor.is_meta for tensor in list(model.parameters()) + list(model.buffers())):
+                raise RuntimeError("tensor não inicializado")
+        except (TypeError, AttributeError, RuntimeError):
+            # torch antigo ou versão diferente do whisper: construção normal e cópia dos pesos
+            model = Whisper(dims)
+            model.load_state_dict(state)
+        if model_key in whisper._ALIGNMENT_HEADS:
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_key])
+        model = model.to("cuda" if torch.cuda.is_available() else "cpu")
+        
+        self.load_seconds[model_key] = round(time.perf_counter() - load_start, 3)
+        return model
+
+
+def default_model_store():
+    """Loja de modelos na pasta models/ ao lado do programa"""
+    return ModelStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+
+
+class TranscriptCache:
+    """Última transcrição de um arquivo/canal com os hashes de cada trecho do áudio decodificado;
+    quando a gravação cresce ou é editada, só os trechos diferentes são refeitos"""
+    CHUNK_SECONDS = 10
+
+    def __init__(self, path, identity):
+        self.path = path
+        self.identity = identity
+
+    @classmethod
+    def chunk_hashes(cls, audio, samplerate):
+        """Hash de cada trecho em PCM 16 bits (o mesmo áudio entregue ao modelo)"""
+        size = cls.CHUNK_SECONDS * samplerate
+        hashes = []
+        for start in range(0, len(audio), size):
+            pcm = (np.clip(audio[start:start + size], -1.0, 1.0) * 32767).astype('<i2')
+            hashes.append(hashlib.blake2b(pcm.tobytes(), digest_size=16).hexdigest())
+        return hashes
+
+    def load(self):
+        """(hashes, segmentos) da última transcrição com a mesma identidade, ou None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get('identity') != self.identity:
+            return None
+        return entry['hashes'], entry['segments']
+
+    def save(self, hashes, segments):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({'identity': self.identity, 'chunk_seconds': self.CHUNK_SECONDS,
+                       'hashes': hashes, 'segments': segments}, f, ensure_ascii=False)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class WordTimingCache:
+    """Tempos por palavra já alinhados, por segmento (canal, início, fim e texto), em triplas
+    [início, fim, palavra]; religar a opção ou retranscrever parte do arquivo não refaz o alinhamento"""
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+
+    @staticmethod
+    def key(segment):
+        return f"{segment.get('speaker') or ''}|{segment['start']:.2f}|{segment['end']:.2f}|{segment['text']}"
+
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, segment):
+        return self.entries().get(self.key(segment))
+
+    def update(self, segments):
+        """Guarda as palavras dos segmentos alinhados (só os segmentos atuais do arquivo ficam)"""
+        entries = self.entries()
+        for segment in segments:
+            entries[self.key(segment)] = segment['words']
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(self.path + ".tmp", self.path)
+
+    def prune(self, segments):
+        """Descarta entradas de segmentos que não existem mais (arquivo editado ou crescido)"""
+        keys = {self.key(segment) for segment in segments}
+        entries = self.entries()
+        if set(entries) - keys:
+            self._entries = {key: words for key, words in entries.items() if key in keys}
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(self.path + ".tmp", self.path)
+
+
+class TranscriptionCore:
+    """Núcleo de transcrição sem interface gráfica (modelos residentes em memória)"""
+    SAMPLE_RATE = 16000
+    # Janelas do mesmo tamanho das do Whisper, cortadas no trecho mais silencioso do final
+    WINDOW_SECONDS = 30
+    CUT_SEARCH_SECONDS = 5
+    PROMPT_CHARS = 200
+    # Cascata: segmentos do modelo rápido abaixo destes limites são refeitos pelo modelo escolhido
+    ESCALATE_LOGPROB = -1.0
+    ESCALATE_NO_SPEECH = 0.6
+    ESCALATE_COMPRESSION = 2.4
+    ESCALATE_PADDING = 0.2
+    # Decodificação em lote: limite de janelas por passada e fração da memória livre usada
+    MAX_BATCH = 16
+    BATCH_MEMORY_FRACTION = 0.5
+    # Duração de um token de tempo do Whisper
+    TIMESTAMP_SECONDS = 0.02
+    # Trecho analisado na detecção de idioma e tamanho dos quadros do detector de voz
+    DETECT_SECONDS = 30
+    VAD_FRAME_SECONDS = 0.1
+    # Trecho usado na calibração de threads
+    CALIBRATION_SECONDS = 15
+    # Contexto refeito antes e depois de cada trecho alterado na retranscrição incremental
+    INCREMENTAL_MARGIN_SECONDS = 5
+
+    def __init__(self, checkpoint_dir=None, governor=None, tuning=None, cache_dir=None):
+        self._lock = threading.Lock()
+        # Controle de memória compartilhado por todos os trabalhos deste núcleo
+        self.governor = governor or ResourceGovernor()
+        self.governor.idle_count = self.idle_count
+        self.governor.release_idle = self.release_idle
+        # Threads de inferência calibradas; CPUs reservadas enquanto há captura de áudio
+        self.tuning = tuning or CpuTuning()
+        # Prioridade entre trabalhos interativos, ao vivo e em lote
+        self.scheduler = PriorityScheduler()
+        self.reserved_cpus = 0
+        # Checkpoints das transcrições em andamento (None desativa a retomada)
+        self.checkpoint_dir = checkpoint_dir
+        # Últimas transcrições por arquivo (None desativa a retranscrição incremental)
+        self.cache_dir = cache_dir
+        # Modelos importados na pasta do programa (os demais são baixados pelo whisper no primeiro uso)
+        self.model_store = None
+        # Etapa opcional de tempos por palavra (alinhamento depois da decodificação)
+        self.word_timestamps = False
+        # Modelo rápido da cascata (None transcreve tudo com o modelo escolhido)
+        self.cascade_model = None
+        # Várias janelas por passada do encoder/decoder (o contexto passa só entre lotes)
+        self.batch_decoding = False
+        # Idioma fixo ou 'auto' (detectado uma vez por arquivo e guardado no índice)
+        self.language = 'pt'
+        # Idiomas já detectados nesta sessão: hash do conteúdo -> (idioma, probabilidade)
+        self._detected = {}
+        # Detecções em andamento: hash -> trava (outros trabalhos do mesmo arquivo esperam o resultado)
+        self._detecting = {}
+        # Instâncias livres de cada modelo; cada decodificação usa uma instância exclusiva
+        self._idle_models = {}
+        # Configurações otimizadas para PT-BR
+        self.decode_options = {
+            'language': "pt",
+            'task': "transcribe",
+            'initial_prompt': "Transcrição em português brasileiro:",
+            'temperature': 0.2,  # Menor temperatura para maior precisão
+            'best_of': 2,        # Tenta 2 vezes e pega o melhor resultado
+        }
+
+    def load_model(self, model_key):
+        """Garante que há ao menos uma instância do modelo carregada"""
+        with self._lock:
+            if self._idle_models.get(model_key):
+                return
+        with self.model(model_key):
+            pass
+
+    @contextmanager
+    def model(self, model_key):
+        """Empresta uma instância exclusiva do modelo (carrega se necessário)"""
+        with self._lock:
+            idle = self._idle_models.setdefault(model_key, [])
+            model = idle.pop() if idle else None
+        
+        if model is None:
+            with metrics.span(f'model.load.{model_key}'):
+                if self.model_store is not None and self.model_store.has(model_key):
+                    model = self.model_store.load(model_key)
+                else:
+                    import whisper
+                    model = whisper.load_model(model_key)
+            self.governor.record_model(model_key, sum(tensor.numel() * tensor.element_size()
+                                                      for tensor in list(model.parameters()) + list(model.buffers())))
+            self.governor.model_loaded(model_key)
+        
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._idle_models[model_key].append(model)
+
+    def idle_count(self, model_key):
+        with self._lock:
+            return len(self._idle_models.get(model_key, []))
+
+    def release_idle(self, keep=()):
+        """Descarrega as instâncias ociosas dos modelos fora de keep; indica se liberou alguma"""
+        with self._lock:
+            released = []
+            for model_key, idle in self._idle_models.items():
+                if model_key not in keep:
+                    released.extend((model_key, model) for model in idle)
+                    idle.clear()
+        for model_key, _ in released:
+            print(f"Descarregando modelo ocioso: {model_key}")  # Debug
+            self.governor.model_unloaded(model_key)
+        if not released:
+            return False
+        del released
+        import gc
+        gc.collect()
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return True
+
+    def apply_threads(self, model_key):
+        """Ajusta os threads do PyTorch à calibração, aos trabalhos em andamento e à captura"""
+        torch = sys.modules.get('torch')
+        if torch is None:
+            return
+        threads = self.tuning.threads_for(model_key, self.governor.running(), self.reserved_cpus)
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+            metrics.set_gauge('inference_threads', threads)
+
+    def calibrate_threads(self, clip, model_key, on_progress=None):
+        """Mede a vazão (segundos de áudio por segundo) de cada combinação de trabalhos simultâneos
+        e threads por trabalho, e guarda a melhor quantidade de threads para cada número de trabalhos"""
+        import torch
+        clip = clip[:self.CALIBRATION_SECONDS * self.SAMPLE_RATE]
+        options = dict(self.options_for('pt' if self.language == 'auto' else self.language),
+                       temperature=0.0, best_of=None)
+        cpus = usable_cpus()
+        
+        # Trabalhos simultâneos limitados pela memória (cada um usa uma instância do modelo)
+        max_jobs = min(4, cpus)
+        limit = self.governor.limit()
+        if limit:
+            per_job = self.governor.model_bytes(model_key) + self.governor.decode_bytes(model_key)
+            max_jobs = max(1, min(max_jobs, int(limit // per_job)))
+        layouts = [(jobs, threads) for jobs in (1, 2, 4) if jobs <= max_jobs
+                   for threads in sorted({1, 2, 4, physical_cores(), cpus}) if jobs * threads <= cpus]
+        
+        def decode(_):
+            with self.model(model_key) as model:
+                model.transcribe(clip, **options)
+        
+        # Aquecimento: carrega as instâncias fora da medição
+        with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+            list(executor.map(decode, range(max_jobs)))
+        
+        best, throughput = {}, {}
+        for index, (jobs, threads) in enumerate(layouts):
+            if on_progress:
+                on_progress(f"{model_key}: {jobs} trabalho(s) x {threads} thread(s) ({index + 1}/{len(layouts)})")
+            torch.set_num_threads(threads)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(decode, range(jobs)))
+            value = jobs * len(clip) / self.SAMPLE_RATE / (time.perf_counter() - start)
+            print(f"Calibração {model_key}: {jobs}x{threads} -> {value:.2f} s de áudio/s")  # Debug
+            # Mais threads só valem com ganho claro (deixam menos CPU para o resto do programa)
+            if jobs not in throughput or value > throughput[jobs] * 1.03:
+                throughput[jobs] = value
+                best[jobs] = threads
+        
+        self.tuning.store(model_key, best, throughput)
+        return best, throughput
+
+    def cascade_for(self, model_key):
+        """Modelo rápido usado antes do modelo escolhido, ou None sem cascata"""
+        if self.cascade_model and self.cascade_model != model_key:
+            return self.cascade_model
+        return None
+
+    def model_label(self, model_key):
+        """Nome do modelo nos registros (tiny+large em cascata)"""
+        fast = self.cascade_for(model_key)
+        return f"{fast}+{model_key}" if fast else model_key
+
+    def transcribe(self, audio, model_key):
+        """Transcreve um arquivo ou um array de áudio mono 16 kHz"""
+        with self.model(model_key) as model:
+            with metrics.span(f'transcription.decode.{model_key}'):
+                return model.transcribe(audio, **self.decode_options)
+
+    def channel_sources(self, path, library=None):
+        """Lista as fontes de uma gravação: (rótulo, arquivo ou array por canal)"""
+        # Gravação de vários microfones em arquivos separados (gravacao_..._micN.wav)
+        siblings = mic_siblings(path)
+        if len(siblings) > 1:
+            return [(f"Mic {number}", file) for number, file in siblings]
+        
+        # Gravação de vários microfones num só arquivo (marcada no índice): cada canal é um microfone.
+        # Outros arquivos estéreo (importados, microfone USB estéreo) são mixados em mono como antes
+        microphones = library.get(os.path.basename(path)).get('microphones') if library is not None else None
+        if microphones:
+            try:
+                channels = sf.info(path).channels
+            except Exception:
+                channels = 1
+            if channels > 1:
+                return [(f"Mic {channel + 1}", load_audio_channel(path, channel)) for channel in range(channels)]
+        
+        return [(None, path)]
+
+    def load_audio(self, source):
+        """Arquivo decodificado em mono 16 kHz (arrays passam direto)"""
+        if isinstance(source, str):
+            import whisper
+            with metrics.span('transcription.load_audio'):
+                return whisper.load_audio(source)
+        return source
+
+    def window_end(self, audio, start):
+        """Fim da janela: o trecho de 100 ms mais silencioso dos últimos segundos"""
+        limit = start + self.WINDOW_SECONDS * self.SAMPLE_RATE
+        if limit >= len(audio):
+            return len(audio)
+        frame = self.SAMPLE_RATE // 10
+        search = audio[limit - self.CUT_SEARCH_SECONDS * self.SAMPLE_RATE:limit]
+        energy = np.square(search[:len(search) // frame * frame].reshape(-1, frame)).mean(axis=1)
+        return limit - len(search) + int(np.argmin(energy)) * frame + frame // 2
+
+    def decode_identity(self, model_key, label=None, options=None):
+        """Tudo o que muda o resultado de uma decodificação além do áudio"""
+        identity = {
+            'model': model_key,
+            'channel': label,
+            'window_seconds': self.WINDOW_SECONDS,
+            'decode_options': options or self.decode_options
+        }
+        if self.batch_decoding:
+            identity['batched'] = True
+        if self.cascade_for(model_key):
+            identity['cascade'] = [self.cascade_model, self.ESCALATE_LOGPROB, self.ESCALATE_NO_SPEECH,
+                                   self.ESCALATE_COMPRESSION, self.ESCALATE_PADDING]
+        return identity
+
+    def checkpoint(self, file_hash, model_key, label=None, options=None):
+        """Checkpoint de um arquivo/modelo/canal; a identidade inclui as opções de decodificação"""
+        if not self.checkpoint_dir or not file_hash:
+            return None
+        identity = dict(self.decode_identity(model_key, label, options), version=1, file_hash=file_hash)
+        suffix = "_" + re.sub(r'\W+', '_', label) if label else ""
+        return TranscriptionCheckpoint(
+            os.path.join(self.checkpoint_dir, f"{file_hash}_{model_key}{suffix}.jsonl"), identity)
+
+    def transcript_cache(self, name, model_key, label=None, options=None):
+        """Última transcrição de um arquivo (pelo nome na biblioteca) com o mesmo modelo e opções"""
+        if not self.cache_dir or not name:
+            return None
+        suffix = "_" + re.sub(r'\W+', '_', label) if label else ""
+        identity = dict(self.decode_identity(model_key, label, options), chunk_seconds=TranscriptCache.CHUNK_SECONDS)
+        safe_name = re.sub(r'[^\w.-]+', '_', name)
+        return TranscriptCache(os.path.join(self.cache_dir, f"{safe_name}_{model_key}{suffix}.json"), identity)
+
+    def drop_caches(self, name):
+        """Remove as últimas transcrições e os tempos por palavra guardados de um arquivo da biblioteca"""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        prefix = re.sub(r'[^\w.-]+', '_', name) + "_"
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(prefix) and entry.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, entry))
+
+    def transcribe_stream(self, source, model_key, on_segments=None, on_progress=None, label=None,
+                          checkpoint=None, guard=None, options=None, ticket=None, cache=None):
+        """Transcreve janela a janela, entregando os segmentos assim que cada janela termina"""
+        audio = self.load_audio(source)
+        options = options or self.decode_options
+        segments = []
+        start = 0
+        previous = ""
+        escalated = 0.0
+        
+        saved = checkpoint.load() if checkpoint else None
+        hashes = TranscriptCache.chunk_hashes(audio, self.SAMPLE_RATE) if cache else None
+        # Já transcrito antes (e sem retomada pendente): refaz só os trechos alterados
+        entry = cache.load() if cache and not saved else None
+        if entry:
+            result = self._transcribe_changed(audio, model_key, label, hashes, entry, on_segments, on_progress,
+                                              guard, options, ticket,
+                                              checkpoint.incremental(entry[0]) if checkpoint else None)
+            cache.save(hashes, result['segments'])
+            return result
+        
+        # Retoma do último ponto confirmado no checkpoint
+        if saved:
+            start, segments, previous, escalated = saved
+            metrics.increment('transcription_resumed')
+            print(f"Retomando transcrição em {format_timestamp(start / self.SAMPLE_RATE)}")  # Debug
+            if on_segments and segments:
+                on_segments(list(segments))
+            if on_progress and len(audio):
+                on_progress(min(1.0, start / len(audio)))
+        if checkpoint:
+            checkpoint.open(resume=bool(saved))
+        
+        try:
+            while start < len(audio):
+                # Entre janelas o trabalho pode ceder a vez a outro mais prioritário
+                if ticket:
+                    ticket.wait()
+                drafts = ([None] if not self.batch_decoding
+                          else self._decode_ahead(audio, start, model_key, previous, options))
+                for index, draft in enumerate(drafts):
+                    if ticket and index:
+                        ticket.wait()
+                    start, window_segments, previous, window_escalated = self._transcribe_window(
+                        audio, start, model_key, label, previous, draft, guard, options)
+                    segments.extend(window_segments)
+                    escalated += window_escalated
+                    if checkpoint:
+                        checkpoint.commit(start, window_segments, previous, window_escalated)
+                    
+                    if on_segments and window_segments:
+                        on_segments(window_segments)
+                    if on_progress:
+                        on_progress(start / len(audio))
+        finally:
+            if checkpoint:
+                checkpoint.close(remove=start >= len(audio))
+        if cache:
+            cache.save(hashes, segments)
+        return {'text': transcript_text(segments), 'segments': segments,
+                'duration': len(audio) / self.SAMPLE_RATE, 'escalated_seconds': escalated,
+                'reused_seconds': 0.0}
+
+    def changed_spans(self, audio, hashes, old_hashes, old_segments):
+        """Trechos [início, fim) em amostras a refazer e os segmentos antigos que continuam valendo"""
+        rate = self.SAMPLE_RATE
+        size = TranscriptCache.CHUNK_SECONDS * rate
+        margin = self.INCREMENTAL_MARGIN_SECONDS * rate
+        spans = []
+        for index, chunk_hash in enumerate(hashes):
+            if index < len(old_hashes) and old_hashes[index] == chunk_hash:
+                continue
+            start, end = max(0, index * size - margin), min(len(audio), (index + 1) * size + margin)
+            if spans and start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([start, end])
+        
+        # Segmentos que cruzam a borda de um trecho são refeitos inteiros (o trecho cresce até eles)
+        kept = [segment for segment in old_segments if segment['end'] * rate <= len(audio)]
+        while True:
+            remaining = []
+            for segment in kept:
+                first, last = int(segment['start'] * rate), int(np.ceil(segment['end'] * rate))
+                hit = [span for span in spans if first < span[1] and last > span[0]]
+                for span in hit:
+                    span[0], span[1] = min(span[0], first), min(len(audio), max(span[1], last))
+                if not hit:
+                    remaining.append(segment)
+            if len(remaining) == len(kept):
+                break
+            kept = remaining
+            merged = []
+            for span in sorted(spans):
+                if merged and span[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], span[1])
+                else:
+                    merged.append(span)
+            spans = merged
+        return spans, kept
+
+    def word_cache(self, name, model_key):
+        """Palavras já alinhadas de um arquivo (mesma pasta das últimas transcrições)"""
+        if not self.cache_dir or not name:
+            return None
+        safe_name = re.sub(r'[^\w.-]+', '_', name)
+        return WordTimingCache(os.path.join(self.cache_dir, f"{safe_name}_{model_key}.words.json"))
+
+    def align_words(self, audio, segments, model_key, language=None):
+        """Tempos por palavra de segmentos já transcritos: DTW sobre a atenção cruzada do Whisper,
+        uma passada por grupo de segmentos que cabe em uma janela de 30 s"""
+        import whisper
+        from whisper.audio import HOP_LENGTH, N_SAMPLES
+        from whisper.timing import add_word_timestamps
+        from whisper.tokenizer import get_tokenizer
+        aligned = []
+        with self.model(model_key) as model:
+            self.apply_threads(model_key)
+            try:
+                tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                          language=language, task='transcribe')
+            except TypeError:
+                tokenizer = get_tokenizer(model.is_multilingual, language=language, task='transcribe')
+            index = 0
+            last_speech = 0.0
+            while index < len(segments):
+                group_start = segments[index]['start']
+                group = []
+                while index < len(segments) and (not group or
+                                                 segments[index]['end'] - group_start <= self.WINDOW_SECONDS):
+                    group.append(segments[index])
+                    index += 1
+                first = int(group_start * self.SAMPLE_RATE) // HOP_LENGTH * HOP_LENGTH
+                clip = audio[first:first + N_SAMPLES]
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), model.dims.n_mels).to(model.device)
+                items = [{'tokens': tokenizer.encode(" " + segment['text']), 'start': segment['start'],
+                          'end': segment['end'], 'seek': first // HOP_LENGTH} for segment in group]
+                with metrics.span('transcription.align_words'):
+                    add_word_timestamps(segments=items, model=model, tokenizer=tokenizer, mel=mel,
+                                        num_frames=len(clip) // HOP_LENGTH, last_speech_timestamp=last_speech)
+                # O DTW corre sobre a janela toda: cada palavra fica dentro do seu segmento
+                for segment, item in zip(group, items):
+                    words = []
+                    for word in item.get('words', []):
+                        start = min(max(float(word['start']), segment['start']), segment['end'])
+                        end = min(max(float(word['end']), start), segment['end'])
+                        words.append([round(start, 2), round(end, 2), word['word']])
+                    aligned.append(words)
+                last_speech = items[-1]['end']
+        return aligned
+
+    def add_words(self, segments, sources, name, model_key, language):
+        """Preenche segment['words'] (do cache ou alinhando); retorna (alinhados agora, vindos do cache)"""
+        cache = self.word_cache(name, model_key)
+        cached = 0
+        pending = {}
+        for segment in segments:
+            words = cache.get(segment) if cache else None
+            if words is not None:
+                segment['words'] = words
+                cached += 1
+            else:
+                pending.setdefault(segment.get('speaker'), []).append(segment)
+        
+        # O alinhamento usa o modelo que decodificou a maior parte (o rápido, em cascata)
+        align_model = self.cascade_for(model_key) or model_key
+        aligned = 0
+        for label, source in sources:
+            todo = [segment for segment in pending.get(label, []) if segment['text'] and not segment.get('skipped')]
+            if not todo:
+                continue
+            for segment, words in zip(todo, self.align_words(self.load_audio(source), todo, align_model, language)):
+                segment['words'] = words
+            aligned += len(todo)
+            if cache:
+                cache.update(todo)
+        if cache:
+            cache.prune(segments)
+        metrics.increment('words_aligned_segments', aligned)
+        return aligned, cached
+
+    def _transcribe_changed(self, audio, model_key, label, hashes, entry, on_segments, on_progress,
+                            guard, options, ticket, checkpoint=None):
+        """Retranscrição incremental: reaproveita os segmentos dos trechos iguais e decodifica o resto"""
+        old_hashes, old_segments = entry
+        spans, kept = self.changed_spans(audio, hashes, old_hashes, old_segments)
+        total = sum(end - start for start, end in spans)
+        reused = (len(audio) - total) / self.SAMPLE_RATE
+        print(f"Retranscrição incremental: {len(spans)} trecho(s) alterado(s), "
+              f"{reused:.0f} s reaproveitados")  # Debug
+        metrics.increment('incremental_reused_seconds', reused)
+        
+        segments = list(kept)
+        escalated = 0.0
+        # As janelas dos trechos são sempre as mesmas: a retomada pula as que o checkpoint já tem
+        saved = checkpoint.load() if checkpoint else None
+        resume_at, saved_previous = 0, ""
+        if saved:
+            resume_at, saved_segments, saved_previous, escalated = saved
+            segments.extend(saved_segments)
+            metrics.increment('transcription_resumed')
+            print(f"Retomando retranscrição em {format_timestamp(resume_at / self.SAMPLE_RATE)}")  # Debug
+        if on_segments and segments:
+            on_segments(list(segments))
+        if checkpoint:
+            checkpoint.open(resume=bool(saved))
+        
+        done = sum(max(0, min(end, resume_at) - start) for start, end in spans)
+        finished = False
+        try:
+            for span_start, span_end in spans:
+                if span_end <= resume_at:
+                    continue
+                if span_start < resume_at:
+                    start, previous = resume_at, saved_previous
+                else:
+                    # Contexto: o texto reaproveitado logo antes do trecho
+                    start = span_start
+                    previous = " ".join(segment['text'] for segment in kept
+                                        if segment['end'] * self.SAMPLE_RATE <= span_start)[-self.PROMPT_CHARS:]
+                span_audio = audio[:span_end]
+                while start < span_end:
+                    if ticket:
+                        ticket.wait()
+                    drafts = ([None] if not self.batch_decoding
+                              else self._decode_ahead(span_audio, start, model_key, previous, options))
+                    for index, draft in enumerate(drafts):
+                        if ticket and index:
+                            ticket.wait()
+                        window_start = start
+                        start, window_segments, previous, window_escalated = self._transcribe_window(
+                            span_audio, start, model_key, label, previous, draft, guard, options)
+                        segments.extend(window_segments)
+                        escalated += window_escalated
+                        done += start - window_start
+                        if checkpoint:
+                            checkpoint.commit(start, window_segments, previous, window_escalated)
+                        if on_segments and window_segments:
+                            on_segments(window_segments)
+                        if on_progress and total:
+                            on_progress(done / total)
+            finished = True
+        finally:
+            if checkpoint:
+                checkpoint.close(remove=finished)
+        
+        segments.sort(key=lambda segment: (segment['start'], segment['end']))
+        return {'text': transcript_text(segments), 'segments': segments,
+                'duration': len(audio) / self.SAMPLE_RATE, 'escalated_seconds': escalated,
+                'reused_seconds': reused}
+
+    def _decode(self, audio, model_key, options):
+        """Segmentos do Whisper para um trecho (com avg_logprob, no_speech_prob e compression_ratio)"""
+        import whisper
+        with self.model(model_key) as model:
+            tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual,
+                                                        num_languages=model.num_languages)
+            self.apply_threads(model_key)
+            # Sozinho no processo, o crescimento da memória durante a decodificação é a medida do trabalho
+            before = process_memory() if self.governor.measuring(model_key) else None
+            with metrics.span(f'transcription.decode.{model_key}'):
+                segments = model.transcribe(audio, **options)['segments']
+            after = process_memory() if before is not None else None
+            if after is not None:
+                self.governor.record_decode(model_key, max(0, after - before))
+        # Só os tokens de texto contam na taxa do DecodeGuard (como em token_segments)
+        for segment in segments:
+            segment['tokens'] = [token for token in segment.get('tokens') or []
+                                 if token < tokenizer.timestamp_begin]
+        return [segment for segment in segments if segment['text'].strip()]
+
+    def batch_size(self, model):
+        """Janelas por lote que cabem na memória livre (cache de atenção e ativações do encoder)"""
+        dims = model.dims
+        beams = max(self.decode_options.get('best_of') or 1, self.decode_options.get('beam_size') or 1)
+        per_window = 4 * (2 * dims.n_text_layer * (dims.n_audio_ctx + dims.n_text_ctx) * dims.n_text_state * beams
+                          + 8 * dims.n_audio_ctx * dims.n_audio_state)
+        if model.device.type == 'cuda':
+            import torch
+            free = torch.cuda.mem_get_info(model.device)[0]
+        else:
+            free = available_memory()
+        if free is None:
+            return 4
+        return max(1, min(self.MAX_BATCH, int(free * self.BATCH_MEMORY_FRACTION) // per_window))
+
+    def _decode_batch(self, pieces, model_key, options):
+        """Decodifica vários trechos numa só passada; retorna a lista de segmentos de cada um"""
+        import torch
+        import whisper
+        with self.model(model_key) as model:
+            tokenizer = whisper.tokenizer.get_tokenizer(
+                model.is_multilingual, num_languages=model.num_languages,
+                language=options['language'], task=options['task'])
+            temperature = options.get('temperature', 0.0)
+            decoding = whisper.DecodingOptions(
+                language=options['language'], task=options['task'], temperature=temperature,
+                best_of=options.get('best_of') if temperature > 0 else None,
+                beam_size=options.get('beam_size'), prompt=options.get('initial_prompt'),
+                fp16=model.device.type == 'cuda')
+            
+            results = []
+            size = self.batch_size(model)
+            self.apply_threads(model_key)
+            for first in range(0, len(pieces), size):
+                group = pieces[first:first + size]
+                mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(piece), model.dims.n_mels)
+                                   for piece in group]).to(model.device)
+                batch_start = time.perf_counter()
+                with metrics.span(f'transcription.decode_batch.{model_key}'):
+                    decoded = whisper.decode(model, mel, decoding)
+                # Tempo por janela, comparável ao span transcription.decode do caminho sequencial
+                per_window = (time.perf_counter() - batch_start) / len(group)
+                for _ in group:
+                    metrics.observe(f'transcription.decode_window_batched.{model_key}', per_window)
+                results.extend(self.token_segments(result, tokenizer, len(piece) / self.SAMPLE_RATE)
+                               for result, piece in zip(decoded, group))
+        return results
+
+    def token_segments(self, result, tokenizer, duration):
+        """Segmentos de um DecodingResult a partir dos tokens de tempo (como no transcribe do Whisper)"""
+        segments = []
+        begin = 0.0
+        text_tokens = []
+        
+        def flush(end):
+            text = tokenizer.decode(text_tokens)
+            if text.strip():
+                segments.append({
+                    'start': begin, 'end': min(end, duration), 'text': text, 'tokens': list(text_tokens),
+                    'avg_logprob': result.avg_logprob, 'no_speech_prob': result.no_speech_prob,
+                    'compression_ratio': result.compression_ratio
+                })
+        
+        for token in result.tokens:
+            if token >= tokenizer.timestamp_begin:
+                seconds = (token - tokenizer.timestamp_begin) * self.TIMESTAMP_SECONDS
+                if text_tokens:
+                    flush(seconds)
+                    text_tokens = []
+                begin = seconds
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+        if text_tokens:
+            flush(duration)
+        return segments
+
+    def _decode_ahead(self, audio, start, model_key, previous, base=None):
+        """Rascunhos das próximas janelas decodificadas em lote ([None] quando só resta uma)"""
+        draft_model = self.cascade_for(model_key) or model_key
+        with self.model(draft_model) as model:
+            count = self.batch_size(model)
+        
+        pieces = []
+        while start < len(audio) and len(pieces) < count:
+            end = self.window_end(audio, start)
+            pieces.append(audio[start:end])
+            start = end
+        if len(pieces) < 2:
+            return [None]
+        metrics.increment('batch_windows', len(pieces))
+        return self._decode_batch(pieces, draft_model, self.window_options(previous, base))
+
+    def window_options(self, previous, base=None):
+        """Opções da janela: o final do texto anterior entra como contexto"""
+        options = dict(base or self.decode_options)
+        if previous:
+            options['initial_prompt'] = f"{options['initial_prompt'] or ''} {previous}".strip()
+        return options
+
+    def options_for(self, language):
+        """Opções de decodificação com o idioma e o prompt inicial correspondente"""
+        prompt = LANGUAGES[language][1] if language in LANGUAGES else None
+        return dict(self.decode_options, language=language, initial_prompt=prompt)
+
+    def speech_excerpt(self, audio):
+        """Trecho de até DETECT_SECONDS com mais voz (quadros bem acima do ruído de fundo)"""
+        frame = int(self.SAMPLE_RATE * self.VAD_FRAME_SECONDS)
+        length = self.DETECT_SECONDS * self.SAMPLE_RATE
+        if len(audio) <= length:
+            return audio
+        energy = np.square(audio[:len(audio) // frame * frame].reshape(-1, frame)).mean(axis=1)
+        level = 10 * np.log10(energy + 1e-10)
+        voiced = (level > np.percentile(level, 10) + 15).astype(np.int32)
+        # Janela deslizante com o maior número de quadros de voz
+        span = length // frame
+        counts = np.convolve(voiced, np.ones(span, dtype=np.int32), mode='valid')
+        first = int(np.argmax(counts)) * frame
+        return audio[first:first + length]
+
+    def detect_language(self, source, model_key, file_hash=None, library=None, name=None):
+        """Idioma e probabilidade de um arquivo; o resultado fica no índice junto com o hash"""
+        if not file_hash:
+            return self._detect_language(source, model_key)
+        with self._lock:
+            if file_hash in self._detected:
+                return self._detected[file_hash]
+            detecting = self._detecting.setdefault(file_hash, threading.Lock())
+        # Só um trabalho por hash roda o modelo; os outros recebem o mesmo resultado
+        with detecting:
+            try:
+                return self._detect_language(source, model_key, file_hash, library, name)
+            finally:
+                with self._lock:
+                    self._detecting.pop(file_hash, None)
+
+    def _detect_language(self, source, model_key, file_hash=None, library=None, name=None):
+        """Detecção de fato (confere antes o cache da sessão e o índice da biblioteca)"""
+        if file_hash:
+            with self._lock:
+                if file_hash in self._detected:
+                    return self._detected[file_hash]
+            entry = library.get(name) if library is not None and name else {}
+            if entry.get('language') and entry.get('language_hash') == file_hash:
+                detected = (entry['language'], entry.get('language_probability'))
+                with self._lock:
+                    self._detected[file_hash] = detected
+                return detected
+        
+        import whisper
+        excerpt = self.speech_excerpt(self.load_audio(source))
+        with self.model(model_key) as model:
+            with metrics.span('transcription.detect_language'):
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(excerpt), model.dims.n_mels).to(model.device)
+                _, probabilities = model.detect_language(mel)
+        language = max(probabilities, key=probabilities.get)
+        detected = (language, float(probabilities[language]))
+        metrics.increment('language_detections')
+        print(f"Idioma detectado: {language} ({detected[1]:.0%})")  # Debug
+        
+        if file_hash:
+            with self._lock:
+                self._detected[file_hash] = detected
+            if library is not None and name:
+                library.update(name, language=language, language_probability=detected[1],
+                               language_hash=file_hash)
+        return detected
+
+    def needs_escalation(self, segment):
+        """O modelo rápido teve pouca confiança, achou que era silêncio ou repetiu texto"""
+        return (segment.get('avg_logprob', 0.0) < self.ESCALATE_LOGPROB
+                or segment.get('no_speech_prob', 0.0) > self.ESCALATE_NO_SPEECH
+                or segment.get('compression_ratio', 0.0) > self.ESCALATE_COMPRESSION)
+
+    def escalation_spans(self, segments, duration):
+        """Trechos (início, fim, segmentos substituídos) a refazer; vizinhos duvidosos viram um só trecho"""
+        spans = []
+        for index, segment in enumerate(segments):
+            if not self.needs_escalation(segment):
+                continue
+            # A folga não invade os segmentos aceitos ao redor
+            floor = segments[index - 1]['end'] if index > 0 else 0.0
+            ceiling = segments[index + 1]['start'] if index + 1 < len(segments) else duration
+            begin = max(floor, segment['start'] - self.ESCALATE_PADDING, 0.0)
+            finish = min(ceiling, segment['end'] + self.ESCALATE_PADDING, duration)
+            if spans and spans[-1][2][-1] == index - 1:
+                spans[-1][1] = max(spans[-1][1], finish)
+                spans[-1][2].append(index)
+            else:
+                spans.append([begin, max(begin, finish), [index]])
+        return spans
+
+    def _cascade_window(self, window, model_key, fast_model, options, draft=None):
+        """Modelo rápido na janela inteira; só os trechos duvidosos passam pelo modelo escolhido"""
+        if draft is None:
+            draft = self._decode(window, fast_model, options)
+        spans = self.escalation_spans(draft, len(window) / self.SAMPLE_RATE)
+        if not spans:
+            return draft, 0.0
+        
+        replaced = {index for _, _, indexes in spans for index in indexes}
+        segments = [segment for index, segment in enumerate(draft) if index not in replaced]
+        escalated = 0.0
+        for begin, finish, _ in spans:
+            piece = window[int(begin * self.SAMPLE_RATE):int(finish * self.SAMPLE_RATE)]
+            escalated += len(piece) / self.SAMPLE_RATE
+            for segment in self._decode(piece, model_key, options):
+                segments.append(dict(segment, start=begin + segment['start'],
+                                     end=min(begin + segment['end'], finish)))
+        segments.sort(key=lambda segment: segment['start'])
+        return segments, escalated
+
+    def _transcribe_window(self, audio, start, model_key, label, previous, draft=None, guard=None, base=None):
+        """Decodifica uma janela (ou aproveita o rascunho do lote); retorna (fim, segmentos,
+        contexto para a próxima, segundos reprocessados)"""
+        end = self.window_end(audio, start)
+        offset = start / self.SAMPLE_RATE
+        duration = (end - start) / self.SAMPLE_RATE
+        options = self.window_options(previous, base)
+        attempt_start = time.perf_counter()
+        
+        fast_model = self.cascade_for(model_key)
+        if fast_model:
+            decoded, escalated = self._cascade_window(audio[start:end], model_key, fast_model, options, draft)
+            metrics.increment('cascade_audio_seconds', (end - start) / self.SAMPLE_RATE)
+            metrics.increment('cascade_escalated_seconds', escalated)
+        else:
+            # O lote não tem o recuo de temperatura do transcribe: janelas duvidosas são refeitas
+            if draft is not None and any(self.needs_escalation(segment) for segment in draft):
+                metrics.increment('batch_fallback_windows')
+                draft = None
+            decoded = draft if draft is not None else self._decode(audio[start:end], model_key, options)
+            escalated = 0.0
+        
+        # Janela descontrolada: nova semente (sem o contexto anterior) dentro do orçamento, senão é descartada
+        attempt = 0
+        reason = guard.runaway(decoded, duration) if guard else None
+        while reason:
+            guard.discard(time.perf_counter() - attempt_start)
+            print(f"Janela em {format_timestamp(offset)} descontrolada: {reason}")  # Debug
+            if attempt >= len(guard.RESEED_TEMPERATURES) or not guard.take_retry():
+                guard.skip(offset, duration)
+                metrics.increment('guard_skipped_windows')
+                # A perda fica visível na transcrição, no lugar do trecho
+                decoded = [{'start': 0.0, 'end': duration, 'text': "[trecho não transcrito]", 'skipped': True}]
+                break
+            metrics.increment('guard_retries')
+            attempt_start = time.perf_counter()
+            reseed = dict(base or self.decode_options, temperature=guard.RESEED_TEMPERATURES[attempt])
+            attempt += 1
+            decoded = self._decode(audio[start:end], model_key, reseed)
+            if fast_model:
+                escalated = duration
+            reason = guard.runaway(decoded, duration)
+        
+        window_segments = [{
+            'start': offset + segment['start'],
+            'end': min(offset + segment['end'], end / self.SAMPLE_RATE),
+            'text': segment['text'].strip(),
+            'speaker': label
+        } for segment in decoded]
+        for segment, window_segment in zip(decoded, window_segments):
+            if segment.get('skipped'):
+                window_segment['skipped'] = True
+        
+        context = " ".join([previous] + [segment['text'] for segment in window_segments
+                                         if not segment.get('skipped')]).strip()
+        return end, window_segments, context[-self.PROMPT_CHARS:], escalated
+
+    def transcribe_channels(self, sources, model_key, on_segments=None, on_progress=None, checkpoints=None,
+                            guard=None, options=None, ticket=None, caches=None):
+        """Transcreve os canais em paralelo e junta os segmentos em ordem temporal"""
+        progress = [0.0] * len(sources)
+        
+        def channel_progress(index):
+            def update(value):
+                progress[index] = value
+                if on_progress:
+                    on_progress(sum(progress) / len(progress))
+            return update
+        
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [
+                executor.submit(self.transcribe_stream, source, model_key,
+                                on_segments, channel_progress(index), label,
+                                checkpoints[index] if checkpoints else None, guard, options, ticket,
+                                caches[index] if caches else None)
+                for index, (label, source) in enumerate(sources)
+            ]
+            results = [future.result() for future in futures]
+        
+        segments = [segment for result in results for segment in result['segments']]
+        segments.sort(key=lambda segment: (segment['start'], segment['end']))
+        return {'text': transcript_text(segments), 'segments': segments,
+                'duration': max(result['duration'] for result in results),
+                'escalated_seconds': sum(result['escalated_seconds'] for result in results),
+                'reused_seconds': sum(result['reused_seconds'] for result in results)}
+
+    def audio_bytes(self, path):
+        """Memória do áudio decodificado (float32 a 16 kHz por canal); estimada pelo tamanho se não der para ler"""
+        try:
+            info = sf.info(path)
+            return info.duration * self.SAMPLE_RATE * 4 * info.channels
+        except Exception:
+            return os.path.getsize(path) * 4
+
+    def transcribe_file(self, path, model_key, library=None, on_segments=None, on_progress=None, on_status=None,
+                        priority='interactive', submitted_at=None):
+        """Trabalho completo de um arquivo: prioridade, admissão por memória, modelo, canais, ganho,
+        decodificação e hash"""
+        job_start = time.perf_counter()
+        extra_keys = [self.cascade_model] if self.cascade_for(model_key) else []
+        with self.scheduler.job(priority, submitted_at) as ticket:
+            with self.governor.admit(model_key, extra_keys, self.audio_bytes(path), on_status, priority) as granted:
+                result = self._transcribe_file(path, granted, library, on_segments, on_progress, on_status,
+                                               job_start, ticket)
+        # O tempo pausado por trabalhos mais prioritários não é processamento deste arquivo
+        result['paused_seconds'] = ticket.paused_seconds
+        result['wall_seconds'] -= ticket.paused_seconds
+        result['model_key'] = granted
+        if granted != model_key:
+            result['requested_model'] = model_key
+        return result
+
+    def _transcribe_file(self, path, model_key, library, on_segments, on_progress, on_status, job_start, ticket):
+        if on_status:
+            on_status("Carregando modelo Whisper...")
+        # Em cascata o modelo escolhido só é carregado se algum trecho precisar dele
+        self.load_model(self.cascade_for(model_key) or model_key)
+        
+        # Gravações com vários microfones são transcritas canal a canal
+        if on_status:
+            on_status("Transcrevendo áudio...")
+        sources = apply_library_gain(self.channel_sources(path, library), path, library)
+        
+        # O hash identifica o checkpoint: um arquivo alterado nunca retoma um estado antigo
+        file_hash = file_content_hash(path, library)
+        
+        # Modo automático: detecção uma única vez por conteúdo (no primeiro canal, com o modelo mais leve)
+        language, probability = self.language, None
+        if language == 'auto':
+            if on_status:
+                on_status("Detectando idioma...")
+            # O áudio decodificado aqui é o mesmo usado na transcrição
+            label, source = sources[0]
+            sources[0] = (label, self.load_audio(source))
+            language, probability = self.detect_language(sources[0][1], self.cascade_for(model_key) or model_key,
+                                                         file_hash, library, os.path.basename(path))
+            if on_status:
+                on_status(f"Transcrevendo áudio ({language_name(language)})...")
+        options = self.options_for(language)
+        
+        checkpoints = [self.checkpoint(file_hash, model_key, label, options) for label, _ in sources]
+        caches = [self.transcript_cache(os.path.basename(path), model_key, label, options) for label, _ in sources]
+        # O orçamento de novas tentativas vale para o arquivo todo (todos os canais)
+        guard = DecodeGuard()
+        
+        decode_start = time.perf_counter()
+        if len(sources) > 1:
+            result = self.transcribe_channels(sources, model_key, on_segments, on_progress, checkpoints,
+                                              guard, options, ticket, caches)
+        else:
+            result = self.transcribe_stream(sources[0][1], model_key, on_segments, on_progress,
+                                            checkpoint=checkpoints[0], guard=guard, options=options, ticket=ticket,
+                                            cache=caches[0])
+        result['decode_seconds'] = time.perf_counter() - decode_start
+        # Tempos por palavra só quando pedidos (o cache evita alinhar de novo o que não mudou)
+        result['words_aligned'] = result['words_cached'] = None
+        if self.word_timestamps:
+            if on_status:
+                on_status("Alinhando palavras...")
+            result['words_aligned'], result['words_cached'] = self.add_words(
+                result['segments'], sources, os.path.basename(path), model_key, language)
+        result['wall_seconds'] = time.perf_counter() - job_start
+        result['channels'] = len(sources)
+        result['file_hash'] = file_hash
+        result['model'] = self.model_label(model_key)
+        result['language'] = language
+        result['language_probability'] = probability
+        result['guard'] = guard.stats()
+        metrics.increment('guard_wasted_seconds', result['guard']['wasted_seconds'])
+        if result['guard']['retries'] or result['guard']['skipped_windows']:
+            print(f"Janelas refeitas: {result['guard']['retries']}, descartadas: "
+                  f"{result['guard']['skipped_windows']}, tempo desperdiçado: "
+                  f"{result['guard']['wasted_seconds']:.1f} s")  # Debug
+        # Fração do áudio que precisou do modelo escolhido (None sem cascata)
+        result['escalated_fraction'] = None
+        if self.cascade_for(model_key):
+            audio_seconds = result['duration'] * len(sources)
+            result['escalated_fraction'] = result['escalated_seconds'] / audio_seconds if audio_seconds else 0.0
+            metrics.set_gauge('last_escalated_fraction', round(result['escalated_fraction'], 4))
+            print(f"Cascata {result['model']}: {result['escalated_fraction']:.1%} do áudio reprocessado")  # Debug
+        return result
+
+
+class WorkerRequestHandler(BaseHTTPRequestHandler):
+    """Protocolo do nó de trabalho: GET /status e POST /transcribe (PCM 16 bits mono a 16 kHz)"""
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_error(404)
+            return
+        self._send_json(200, self.server.node.status())
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/transcribe':
+            self.send_error(404)
+            return
+        params = dict(urllib.parse.parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length', 0))
+        audio = np.frombuffer(self.rfile.read(length), dtype='<i2').astype(np.float32) / 32768.0
+        node = self.server.node
+        # Nó cheio: o coordenador devolve o trecho à fila e tenta de novo
+        if not node.slots.acquire(blocking=False):
+            self._send_json(503, {'error': 'ocupado'})
+            return
+        try:
+            result = node.transcribe(audio, params.get('model', 'base'), params.get('language', 'pt'),
+                                     float(params.get('offset', 0.0)), params.get('label') or None)
+        except Exception as e:
+            print(f"Erro no trecho recebido: {e}")  # Debug
+            self._send_json(500, {'error': str(e)})
+            return
+        finally:
+            node.slots.release()
+        self._send_json(200, result)
+
+    def _send_json(self, code, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WorkerNode:
+    """Nó de trabalho: núcleo sem interface com modelos residentes, atendendo trechos por HTTP"""
+    def __init__(self, core, host='127.0.0.1', port=8765, model_keys=('base',), max_jobs=1):
+        self.core = core
+        self.host = host
+        self.port = port
+        self.model_keys = list(model_keys)
+        self.max_jobs = max_jobs
+        self.slots = threading.Semaphore(max_jobs)
+        self._running = 0
+        self._lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        """Carrega os modelos anunciados e inicia o servidor em uma thread de fundo"""
+        for model_key in self.model_keys:
+            self.core.load_model(model_key)
+        self.httpd = ThreadingHTTPServer((self.host, self.port), WorkerRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.node = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def status(self):
+        """Capacidade anunciada ao coordenador"""
+        with self._lock:
+            running = self._running
+        return {'name': f"{socket.gethostname()}:{self.port}", 'models': self.model_keys,
+                'slots': self.max_jobs, 'running': running, 'cpus': usable_cpus()}
+
+    def transcribe(self, audio, model_key, language, offset=0.0, label=None):
+        """Transcreve um trecho; os horários voltam relativos ao arquivo inteiro"""
+        with self._lock:
+            self._running += 1
+        try:
+            start = time.perf_counter()
+            # Trabalho remoto é lote: cede a vez ao uso interativo desta máquina
+            with self.core.scheduler.job('batch') as ticket:
+                with self.core.governor.admit(model_key, (), len(audio) * 4, None, 'batch') as granted:
+                    if language == 'auto':
+                        language, _ = self.core.detect_language(audio, granted)
+                    result = self.core.transcribe_stream(audio, granted, label=label, guard=DecodeGuard(),
+                                                         options=self.core.options_for(language), ticket=ticket)
+            for segment in result['segments']:
+                segment['start'] += offset
+                segment['end'] += offset
+            metrics.increment('worker.chunks')
+            return {'segments': result['segments'], 'model': granted, 'language': language,
+                    'decode_seconds': time.perf_counter() - start - ticket.paused_seconds}
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+class NodeBusy(Exception):
+    """O nó recusou o trecho por estar sem vagas"""
+
+
+class WorkerPool:
+    """Coordenador: divide os arquivos em trechos e distribui entre os nós de trabalho"""
+    # Arquivos longos viram trechos deste tamanho, cortados no ponto mais silencioso
+    CHUNK_SECONDS = 300
+    MAX_ATTEMPTS = 3
+    REQUEST_TIMEOUT = 900
+    STATUS_TIMEOUT = 5
+    BUSY_SECONDS = 1.0
+    # Espera entre recusas cresce até este teto; depois do prazo o trecho falha
+    MAX_BUSY_BACKOFF = 30.0
+    BUSY_TIMEOUT = 600
+
+    def __init__(self, addresses, core=None, chunk_seconds=None):
+        self.addresses = [address.rstrip('/') for address in addresses]
+        # Núcleo local para ler áudio, achar os cortes e detectar o idioma (só o modelo da detecção)
+        self.core = core or TranscriptionCore()
+        self.chunk_seconds = chunk_seconds or self.CHUNK_SECONDS
+
+    def status(self, address):
+        with urllib.request.urlopen(address + '/status', timeout=self.STATUS_TIMEOUT) as response:
+            return json.loads(response.read())
+
+    def nodes(self):
+        """Nós que responderam, com a capacidade anunciada"""
+        nodes = []
+        for address in self.addresses:
+            try:
+                nodes.append((address, self.status(address)))
+            except Exception as e:
+                print(f"Nó {address} indisponível: {e}")  # Debug
+        return nodes
+
+    def chunks(self, audio):
+        """Limites (início, fim) em amostras dos trechos de um canal"""
+        rate = self.core.SAMPLE_RATE
+        chunk = self.chunk_seconds * rate
+        bounds = []
+        start = 0
+        while start < len(audio):
+            if len(audio) - start <= chunk:
+                end = len(audio)
+            else:
+                # Mesmo corte das janelas: o trecho mais silencioso dos últimos segundos
+                end = self.core.window_end(audio, start + chunk - self.core.WINDOW_SECONDS * rate)
+            bounds.append((start, end))
+            start = end
+        return bounds
+
+    def _post(self, address, task, model_key, language):
+        audio = (np.clip(task['audio'], -1.0, 1.0) * 32767).astype('<i2').tobytes()
+        query = urllib.parse.urlencode({'model': model_key, 'language': language,
+                                        'offset': task['offset'], 'label': task['label'] or ''})
+        request = urllib.request.Request(f"{address}/transcribe?{query}", data=audio, method='POST',
+                                         headers={'Content-Type': 'application/octet-stream'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.REQUEST_TIMEOUT) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                raise NodeBusy(address)
+            raise
+
+    def transcribe_file(self, path, model_key, library=None, on_segments=None, on_progress=None, on_status=None,
+                        priority='batch', submitted_at=None, language=None):
+        """Mesmo resultado de TranscriptionCore.transcribe_file, processado nos nós"""
+        job_start = time.perf_counter()
+        if submitted_at:
+            metrics.observe(f'scheduler.wait.{priority}', job_start - submitted_at)
+        language = language or self.core.language
+        nodes = self.nodes()
+        if not nodes:
+            raise RuntimeError("Nenhum nó de trabalho disponível")
+        
+        sources = apply_library_gain(self.core.channel_sources(path, library), path, library)
+        sources = [(label, self.core.load_audio(source)) for label, source in sources]
+        file_hash = file_content_hash(path, library)
+        # Modo automático: o coordenador detecta uma vez (com o cache por hash do índice) e todos os
+        # trechos vão com o mesmo idioma
+        probability = None
+        if language == 'auto':
+            if on_status:
+                on_status("Detectando idioma...")
+            language, probability = self.core.detect_language(
+                sources[0][1], self.core.cascade_for(model_key) or model_key, file_hash, library,
+                os.path.basename(path))
+        tasks = [{'label': label, 'audio': audio[start:end], 'offset': start / self.core.SAMPLE_RATE}
+                 for label, audio in sources for start, end in self.chunks(audio)]
+        total = sum(len(task['audio']) for task in tasks)
+        if on_status:
+            on_status(f"Distribuindo {len(tasks)} trecho(s) entre {len(nodes)} nó(s)...")
+        
+        condition = threading.Condition()
+        pending = deque(range(len(tasks)))
+        attempts = [0] * len(tasks)
+        in_flight = {}
+        dispatched = {}
+        # Nós em que cada trecho já falhou (a nova tentativa vai preferencialmente para outro)
+        failed_on = [set() for _ in tasks]
+        # Recusas por nó ocupado: quantas e desde quando (prazo e espera crescente por trecho)
+        busy = [0] * len(tasks)
+        busy_since = {}
+        results = {}
+        errors = []
+        
+        def next_task(address):
+            # Chamado com a condição adquirida; None encerra o slot
+            while True:
+                if len(results) == len(tasks) or len(errors):
+                    return None
+                for index in pending:
+                    # Só repete no mesmo nó quando não há nenhum outro trabalhando
+                    if address not in failed_on[index] or not any(in_flight.values()):
+                        pending.remove(index)
+                        return index
+                # Roubo de trabalho: sem fila, um slot livre duplica o trecho mais antigo ainda
+                # em andamento em outro nó; vale o primeiro resultado que chegar
+                stragglers = [index for index, count in in_flight.items()
+                              if count == 1 and index not in results]
+                if stragglers:
+                    metrics.increment('cluster.stolen')
+                    return min(stragglers, key=dispatched.get)
+                condition.wait(self.BUSY_SECONDS)
+        
+        def slot(address):
+            while True:
+                with condition:
+                    index = next_task(address)
+                    if index is None:
+                        return
+                    in_flight[index] = in_flight.get(index, 0) + 1
+                    dispatched.setdefault(index, time.perf_counter())
+                try:
+                    response = self._post(address, tasks[index], model_key, language)
+                except NodeBusy:
+                    metrics.increment('cluster.busy')
+                    with condition:
+                        in_flight[index] -= 1
+                        busy[index] += 1
+                        waited = time.perf_counter() - busy_since.setdefault(index, time.perf_counter())
+                        if index not in results and not in_flight[index] and index not in pending:
+                            if waited >= self.BUSY_TIMEOUT:
+                                errors.append(f"trecho {index}: nós ocupados há {waited:.0f} s")
+                            else:
+                                pending.appendleft(index)
+                        condition.notify_all()
+                        delay = min(self.BUSY_SECONDS * 2 ** (busy[index] - 1), self.MAX_BUSY_BACKOFF)
+                    time.sleep(delay)
+                    continue
+                except Exception as e:
+                    print(f"Falha no nó {address} (trecho {index}): {e}")  # Debug
+                    metrics.increment('cluster.retries')
+                    with condition:
+                        in_flight[index] -= 1
+                        failed_on[index].add(address)
+                        if index not in results and not in_flight[index] and index not in pending:
+                            attempts[index] += 1
+                            if attempts[index] >= self.MAX_ATTEMPTS:
+                                errors.append(f"trecho {index}: {e}")
+                            else:
+                                pending.appendleft(index)
+                        condition.notify_all()
+                    # Nó que não responde mais sai da distribuição; os outros continuam
+                    try:
+                        self.status(address)
+                    except Exception:
+                        return
+                    continue
+                with condition:
+                    in_flight[index] -= 1
+                    if index in results:
+                        continue
+                    results[index] = response
+                    done = sum(len(tasks[finished]['audio']) for finished in results)
+                    condition.notify_all()
+                if on_segments and response['segments']:
+                    on_segments(response['segments'])
+                if on_progress and total:
+                    on_progress(done / total)
+        
+        threads = [threading.Thread(target=slot, args=(address,), daemon=True)
+                   for address, status in nodes for _ in range(max(1, int(status.get('slots', 1))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if len(results) < len(tasks):
+            raise RuntimeError("Transcrição distribuída incompleta: "
+                               + ("; ".join(errors) or "nenhum nó restante"))
+        
+        # Remontagem: trechos e canais em ordem temporal
+        segments = [segment for index in sorted(results) for segment in results[index]['segments']]
+        segments.sort(key=lambda segment: (segment['start'], segment['end']))
+        models = sorted({response['model'] for response in results.values()})
+        languages = [response['language'] for response in results.values()]
+        return {'text': transcript_text(segments), 'segments': segments,
+                'duration': max(len(audio) for _, audio in sources) / self.core.SAMPLE_RATE,
+                'escalated_seconds': 0.0, 'channels': len(sources), 'file_hash': file_hash,
+                'decode_seconds': sum(response['decode_seconds'] for response in results.values()),
+                'wall_seconds': time.perf_counter() - job_start,
+                'model': "/".join(models), 'model_key': models[0],
+                'language': max(set(languages), key=languages.count), 'language_probability': probability,
+                'nodes': len({address for address, _ in nodes}), 'chunks': len(tasks)}
+
+
+def load_cluster_settings(config_dir):
+    """Nós de trabalho usados pela fila (config/cluster.json; lista vazia transcreve localmente)"""
+    settings = {'workers': [], 'chunk_seconds': WorkerPool.CHUNK_SECONDS}
+    try:
+        with open(os.path.join(config_dir, 'cluster.json'), 'r') as f:
+            settings.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return settings
+
+
+def live_inference_process(ring_name, model_key, language, control, results, live_seconds=10):
+    """Processo de inferência ao vivo: lê o buffer compartilhado da captura e devolve só os segmentos.
+    Mensagens de controle: 'stop' ou ('attach', nome do buffer) (entrada);
+    ('ready'|'segments'|'lost'|'error'|'stopped', dados) (saída)"""
+    reader = None
+    try:
+        reader = SharedRingReader(ring_name)
+        core = TranscriptionCore()
+        # Janelas do tamanho da atualização ao vivo, cortadas no trecho mais silencioso como nos arquivos
+        core.WINDOW_SECONDS = live_seconds
+        core.model_store = default_model_store()
+        core.load_model(model_key)
+        options = core.options_for(language)
+        guard = DecodeGuard()
+        resampler = StreamResampler(1)
+        ratio = core.SAMPLE_RATE / reader.samplerate
+        window = core.WINDOW_SECONDS * core.SAMPLE_RATE
+        # Áudio ainda não transcrito e o instante (na gravação) em que ele começa
+        audio = np.zeros(0, dtype='float32')
+        offset = 0.0
+        previous = ""
+        
+        def decode(audio, offset, final):
+            """Transcreve as janelas completas (no fim, também o resto); devolve as amostras consumidas"""
+            nonlocal previous
+            start = 0
+            segments = []
+            # Inferência mais lenta que o tempo real acumula mais de uma janela
+            while len(audio) - start > window or (final and len(audio) - start >= core.SAMPLE_RATE):
+                start, window_segments, previous, _ = core._transcribe_window(
+                    audio, start, model_key, None, previous, guard=guard, base=options)
+                segments.extend(window_segments)
+            for segment in segments:
+                segment['start'] += offset
+                segment['end'] += offset
+            if segments:
+                results.put(('segments', segments))
+            return start
+        
+        results.put(('ready', reader.samplerate))
+        
+        stopping = False
+        while True:
+            next_reader = None
+            try:
+                message = control.get_nowait()
+                if message == 'stop':
+                    stopping = True
+                elif message[0] == 'attach':
+                    # Microfone trocado: o buffer novo é lido desde o início, depois do que resta no antigo
+                    next_reader = SharedRingReader(message[1], position=0)
+            except Empty:
+                pass
+            data, lost = reader.read()
+            if lost:
+                # Leitor atrasado: o que veio antes da lacuna é transcrito e o relógio pula a lacuna inteira
+                results.put(('lost', lost / reader.samplerate))
+                decode(audio, offset, True)
+                offset += len(audio) / core.SAMPLE_RATE + lost / reader.samplerate
+                audio = audio[:0]
+            if len(data):
+                block = resampler.process(data.mean(axis=1, keepdims=True), ratio)[:, 0]
+                audio = np.concatenate((audio, block))
+            if next_reader is not None:
+                reader.close()
+                reader = next_reader
+                resampler = StreamResampler(1)
+                ratio = core.SAMPLE_RATE / reader.samplerate
+                continue
+            
+            if len(audio) > window or (stopping and len(audio) >= core.SAMPLE_RATE):
+                # O corte fica no ponto mais silencioso; o resto espera a próxima atualização
+                consumed = decode(audio, offset, stopping)
+                offset += consumed / core.SAMPLE_RATE
+                audio = audio[consumed:]
+            elif stopping:
+                break
+            else:
+                time.sleep(0.1)
+    except Exception as e:
+        results.put(('error', str(e)))
+    finally:
+        if reader is not None:
+            reader.close()
+        results.put(('stopped', None))
+
+
+def device_key(device):
+    """Identidade estável de um dispositivo (o índice do PortAudio muda entre enumerações)"""
+    return (device['name'], device['hostapi'])
+
+
+def enumerate_input_devices():
+    """Obtém lista de dispositivos de entrada com uma única consulta ao PortAudio"""
+    devices = []
+    seen_names = set()  # Para evitar duplicatas
+    with metrics.span('devices.enumerate'):
+        device_list = sd.query_devices()
+        try:
+            default_device = sd.query_devices(kind='input')
+        except Exception:
+            default_device = None
+        
+        for i, device in enumerate(device_list):
+            # Evita duplicatas pelo nome
+            if device['name'] in seen_names:
+                continue
+                
+            if device['max_input_channels'] > 0:
+                seen_names.add(device['name'])
+                
+                devices.append({
+                    'index': i,
+                    'name': device['name'],
+                    'hostapi': device.get('hostapi', 0),
+                    'channels': device['max_input_channels'],
+                    # Usa taxa de amostragem padrão do dispositivo ou 44100 como fallback
+                    'samplerate': device.get('default_samplerate', 44100),
+                    'is_default': (i == default_device['index'] if default_device else False)
+                })
+    
+    metrics.set_gauge('input_devices', len(devices))
+    return devices
+
+
+class DeviceService(QObject):
+    """Enumera os dispositivos fora da thread da interface e detecta conexões e desconexões"""
+    # (lista completa, adicionados, removidos)
+    devices_changed = Signal(list, list, list)
+    enumeration_failed = Signal(str)
+
+    def __init__(self, interval=5.0):
+        super().__init__()
+        self.interval = interval
+        self.devices = []
+        self._lock = threading.Lock()
+        self._paused = 0
+        self._initialized = False
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Inicia a enumeração em segundo plano"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Encerra o monitoramento"""
+        self._stop_event.set()
+        self._wake.set()
+
+    def refresh(self):
+        """Pede uma nova varredura imediata"""
+        self._wake.set()
+
+    def pause(self):
+        """Suspende a varredura enquanto há streams abertos (aguarda a varredura em curso)"""
+        with self._lock:
+            self._paused += 1
+
+    def resume(self):
+        """Libera a varredura quando os streams são fechados"""
+        with self._lock:
+            self._paused = max(0, self._paused - 1)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._scan()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _scan(self):
+        with self._lock:
+            if self._paused:
+                return
+            try:
+                # O PortAudio só enxerga dispositivos novos após ser reinicializado, o que fecharia
+                # qualquer stream aberto: com algum aberto a varredura fica para a próxima vez
+                if self._initialized and not portaudio_streams.reinitialize():
+                    return
+                devices = enumerate_input_devices()
+            except Exception as e:
+                print(f"Erro ao listar dispositivos: {e}")  # Debug
+                self.enumeration_failed.emit(str(e))
+                return
+        
+        first = not self._initialized
+        self._initialized = True
+        
+        old = {device_key(device): device for device in self.devices}
+        new = {device_key(device): device for device in devices}
+        added = [device for key, device in new.items() if key not in old]
+        removed = [device for key, device in old.items() if key not in new]
+        moved = any(old[key]['index'] != device['index'] or old[key]['is_default'] != device['is_default']
+                    for key, device in new.items() if key in old)
+        
+        self.devices = devices
+        if first or added or removed or moved:
+            if added or removed:
+                metrics.increment('devices_hotplug_events')
+            self.devices_changed.emit(devices, added, removed)
+
+
+class WaveformIndexer(QObject):
+    """Gera em segundo plano a forma de onda dos arquivos que ainda não a têm"""
+    waveform_ready = Signal(str)
+
+    def __init__(self, gains_for=None):
+        super().__init__()
+        self.gains_for = gains_for
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def is_current(path):
+        """A forma de onda existe e é mais nova que o áudio"""
+        sidecar = waveform_path(path)
+        return os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(path)
+
+    def request(self, path):
+        """Enfileira um arquivo (pedidos repetidos são ignorados)"""
+        with self._lock:
+            if path in self._queue:
+                return
+            self._queue.append(path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self):
+        """Encerra o indexador"""
+        self._stop_event.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                path = self._queue.popleft() if self._queue else None
+            if path is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                if not self.is_current(path):
+                    build_waveform_file(path, self.gains_for(path) if self.gains_for else None)
+                self.waveform_ready.emit(path)
+            except Exception as e:
+                print(f"Erro ao gerar forma de onda de {path}: {e}")  # Debug
+
+
+class WaveformView(QFrame):
+    """Desenha a forma de onda a partir da pirâmide; a versão interativa tem zoom e arraste"""
+    MIN_SPAN_SECONDS = 0.5
+    # Clique sem arrastar: instante escolhido (segundos)
+    seek_requested = Signal(float)
+
+    def __init__(self, parent=None, interactive=False):
+        super().__init__(parent)
+        self.interactive = interactive
+        self.waveform = None
+        self.view_start = 0.0
+        self.view_end = 0.0
+        self.cursor_time = None
+        self._drag_x = None
+        self._dragged = False
+        self.setMinimumHeight(80 if interactive else 28)
+        self.setMinimumWidth(120)
+        
+    def set_waveform(self, waveform):
+        """Troca a forma de onda exibida e mostra o arquivo inteiro"""
+        self.waveform = waveform
+        self.view_start = 0.0
+        self.view_end = waveform.duration if waveform else 0.0
+        self.cursor_time = None
+        self.update()
+
+    def set_cursor(self, seconds):
+        """Posição de reprodução (None esconde o cursor)"""
+        if seconds != self.cursor_time:
+            self.cursor_time = seconds
+            self.update()
+
+    def time_at(self, x):
+        """Instante (em segundos) correspondente a uma coordenada horizontal"""
+        return self.view_start + (self.view_end - self.view_start) * x / max(1, self.width())
+
+    def set_view(self, start, end):
+        """Ajusta o trecho visível respeitando os limites do arquivo"""
+        duration = self.waveform.duration
+        span = min(max(end - start, min(self.MIN_SPAN_SECONDS, duration)), duration)
+        start = min(max(0.0, start), duration - span)
+        self.view_start, self.view_end = start, start + span
+        self.update()
+
+    def wheelEvent(self, event):
+        """Zoom centrado no cursor"""
+        if not self.interactive or not self.waveform:
+            return super().wheelEvent(event)
+        anchor = self.time_at(event.position().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        self.set_view(anchor - (anchor - self.view_start) * factor,
+                      anchor + (self.view_end - anchor) * factor)
+
+    def mousePressEvent(self, event):
+        if self.interactive:
+            self._drag_x = event.position().x()
+            self._dragged = False
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        """Arrastar desloca o trecho visível"""
+        if self.interactive and self.waveform and self._drag_x is not None:
+            x = event.position().x()
+            shift = (self.view_end - self.view_start) * (self._drag_x - x) / max(1, self.width())
+            self._drag_x = x
+            self._dragged = True
+            self.set_view(self.view_start + shift, self.view_end + shift)
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.interactive and self.waveform and self._drag_x is not None and not self._dragged:
+            self.seek_requested.emit(self.time_at(event.position().x()))
+        self._drag_x = None
+        super().mouseReleaseEvent(event)
+
+    def paintEvent(self, event):
+        """Desenha mínimo/máximo e a faixa de RMS de cada coluna"""
+        painter = QPainter(self)
+        rect = self.rect()
+        painter.fillRect(rect, QColor("#181818"))
+        if not self.waveform:
+            return
+        
+        width = rect.width()
+        middle = rect.height() / 2
+        scale = middle - 2
+        minimum, maximum, rms = self.waveform.envelope(self.view_start, self.view_end, width)
+        
+        painter.setPen(QPen(QColor("#00897b"), 1))
+        for x in range(len(minimum)):
+            painter.drawLine(x, int(middle - maximum[x] * scale), x, int(middle - minimum[x] * scale))
+        painter.setPen(QPen(QColor("#00d1b2"), 1))
+        for x in range(len(rms)):
+            painter.drawLine(x, int(middle - rms[x] * scale), x, int(middle + rms[x] * scale))
+        
+        if self.cursor_time is not None and self.view_start <= self.cursor_time <= self.view_end:
+            x = int((self.cursor_time - self.view_start) / (self.view_end - self.view_start) * width)
+            painter.setPen(QPen(QColor("#ffdd57"), 2))
+            painter.drawLine(x, 0, x, rect.height())
+
+
+class SegmentListModel(QAbstractListModel):
+    """Segmentos da transcrição para a lista virtualizada (só as linhas visíveis são desenhadas)"""
+    StartRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.segments = []
+        self._starts = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.segments)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        segment = self.segments[index.row()]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return segment_line(segment)
+        if role == self.StartRole:
+            return segment['start']
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self.segments = []
+        self._starts = []
+        self.endResetModel()
+
+    def add_segments(self, segments):
+        """Acrescenta segmentos mantendo a ordem temporal (canais chegam intercalados)"""
+        if not segments:
+            return
+        if not self._starts or segments[0]['start'] >= self._starts[-1]:
+            first = len(self.segments)
+            self.beginInsertRows(QModelIndex(), first, first + len(segments) - 1)
+            self.segments.extend(segments)
+            self._starts.extend(segment['start'] for segment in segments)
+            self.endInsertRows()
+            return
+        for segment in segments:
+            row = bisect.bisect_right(self._starts, segment['start'])
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.segments.insert(row, segment)
+            self._starts.insert(row, segment['start'])
+            self.endInsertRows()
+
+    def text(self, rows=None):
+        """Texto dos segmentos (todos ou só as linhas informadas)"""
+        if rows is None:
+            return transcript_text(self.segments)
+        return "\n".join(segment_line(self.segments[row]) for row in sorted(rows))
+
+
+class TranscriptionWorker(QThread):
+    """Transcreve fora da thread da interface e envia os segmentos conforme ficam prontos"""
+    status = Signal(str)
+    progress = Signal(float)
+    segments_ready = Signal(list)
+    completed = Signal(dict)
+    failed = Signal(str)
+
+    def __init__(self, core, path, model_key, library=None, parent=None):
+        super().__init__(parent)
+        self.core = core
+        self.path = path
+        self.model_key = model_key
+        self.library = library
+
+    def run(self):
+        try:
+            result = self.core.transcribe_file(self.path, self.model_key, self.library,
+                                               self.segments_ready.emit, self.progress.emit, self.status.emit)
+            self.completed.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class CalibrationWorker(QThread):
+    """Calibra os threads de inferência de um modelo fora da thread da interface"""
+    status = Signal(str)
+    # Threads por número de trabalhos simultâneos
+    completed = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, core, path, model_key, parent=None):
+        super().__init__(parent)
+        self.core = core
+        self.path = path
+        self.model_key = model_key
+
+    def run(self):
+        try:
+            clip = self.core.load_audio(self.path)
+            best, _ = self.core.calibrate_threads(clip, self.model_key, self.status.emit)
+            self.completed.emit(best)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class ModelImportWorker(QThread):
+    """Confere e converte um modelo para a loja local fora da thread da interface"""
+    status = Signal(str)
+    completed = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, store, model_key, source, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.model_key = model_key
+        self.source = source
+
+    def run(self):
+        try:
+            self.completed.emit(self.store.import_model(self.model_key, self.source, self.status.emit))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class LiveTranscriber(QObject):
+    """Transcrição durante a gravação em um processo separado (fora do GIL da interface e da captura)"""
+    segments_ready = Signal(list)
+    failed = Signal(str)
+    finished = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process = None
+        self.control = None
+        self.results = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self, ring, model_key, language):
+        """Inicia o processo anexado ao buffer compartilhado de uma captura"""
+        # spawn: um fork do processo com Qt e PortAudio abertos não é seguro
+        context = multiprocessing.get_context('spawn')
+        self.control = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=live_inference_process, daemon=True,
+                                       args=(ring.name, model_key, language, self.control, self.results))
+        self.process.start()
+        self.timer.start(200)
+
+    def attach(self, ring):
+        """Passa o processo para o buffer de outra captura (troca de microfone durante a gravação)"""
+        if self.control is not None:
+            self.control.put(('attach', ring.name))
+
+    def stop(self):
+        """Pede para o processo transcrever o que falta e encerrar"""
+        if self.control is not None:
+            self.control.put('stop')
+
+    def running(self):
+        return self.process is not None
+
+    def poll(self):
+        """Entrega as mensagens do processo na thread da interface"""
+        while True:
+            try:
+                kind, data = self.results.get_nowait()
+            except Empty:
+                break
+            if kind == 'segments':
+                self.segments_ready.emit(data)
+            elif kind == 'lost':
+                metrics.increment('live_lost_seconds', data)
+            elif kind == 'error':
+                self.failed.emit(data)
+            elif kind == 'stopped':
+                self._finish()
+                return
+        if self.process is not None and not self.process.is_alive():
+            self._finish()
+
+    def _finish(self):
+        self.timer.stop()
+        if self.process is not None:
+            self.process.join(1)
+            self.process = None
+        self.control = None
+        self.results = None
+        self.finished.emit()
+
+
+class TranscriptionQueue(QObject):
+    """Fila de transcrições automáticas com número limitado de trabalhos simultâneos"""
+    job_started = Signal(str)
+    job_finished = Signal(str, str)
+    job_failed = Signal(str, str)
+    # (aguardando, em andamento)
+    queue_changed = Signal(int, int)
+
+    def __init__(self, core, library, ledger, transcription_dir, model_key='base', max_concurrent=1):
+        super().__init__()
+        self.core = core
+        self.library = library
+        self.ledger = ledger
+        self.transcription_dir = transcription_dir
+        self.model_key = model_key
+        self.max_concurrent = max_concurrent
+        self._waiting = deque()
+        self._running = set()
+        # Instante de envio de cada arquivo (mede a espera na fila)
+        self._submitted = {}
+        # Coordenador dos nós de trabalho (None transcreve neste computador)
+        self.pool = None
+        self._threads = []
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def transcript_path(self, audio_path):
+        """Arquivo de texto gerado para um áudio"""
+        return os.path.join(self.transcription_dir, os.path.splitext(os.path.basename(audio_path))[0] + ".txt")
+
+    def submit(self, path):
+        """Enfileira um arquivo (ignorado se já estiver na fila ou em andamento)"""
+        with self._condition:
+            if path in self._waiting or path in self._running:
+                return
+            self._waiting.append(path)
+            self._submitted[path] = time.perf_counter()
+            if len(self._threads) < self.max_concurrent:
+                thread = threading.Thread(target=self._run, daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._condition.notify()
+        self._emit_state()
+
+    def pending(self):
+        with self._condition:
+            return len(self._waiting), len(self._running)
+
+    def stop(self):
+        """Descarta o que está aguardando (trabalhos em andamento terminam normalmente)"""
+        with self._condition:
+            self._stopped = True
+            self._waiting.clear()
+            self._condition.notify_all()
+
+    def _emit_state(self):
+        self.queue_changed.emit(*self.pending())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Threads ociosas se encerram; submit cria outras quando necessário
+                while not self._waiting and not self._stopped:
+                    if not self._condition.wait(30) and not self._waiting:
+                        break
+                if self._stopped or not self._waiting:
+                    self._threads.remove(threading.current_thread())
+                    return
+                path = self._waiting.popleft()
+                self._running.add(path)
+                submitted_at = self._submitted.pop(path, None)
+            self._emit_state()
+            self.job_started.emit(path)
+            try:
+                with metrics.span('queue.job'):
+                    self._transcribe(path, submitted_at)
+            except Exception as e:
+                print(f"Erro ao transcrever {path}: {e}")  # Debug
+                self.job_failed.emit(path, str(e))
+            finally:
+                with self._condition:
+                    self._running.discard(path)
+                self._emit_state()
+
+    def _transcribe(self, path, submitted_at=None):
+        # Trabalhos da fila cedem a vez às transcrições pedidas na interface
+        result = (self.pool or self.core).transcribe_file(path, self.model_key, self.library,
+                                                          priority='batch', submitted_at=submitted_at)
+        audio_seconds = result['duration'] * result['channels']
+        
+        output = self.transcript_path(path)
+        with open(output + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(result['text'])
+        os.replace(output + ".tmp", output)
+        # Com tempos por palavra, as legendas vão junto
+        if any(segment.get('words') for segment in result['segments']):
+            subtitles = os.path.splitext(output)[0] + ".srt"
+            with open(subtitles + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(srt_text(result['segments']))
+            os.replace(subtitles + ".tmp", subtitles)
+        
+        if self.ledger is not None:
+            self.ledger.record('whisper-local', result['model'], audio_seconds, result['wall_seconds'],
+                               transcription_cost(audio_seconds), file_hash=result['file_hash'],
+                               file_name=os.path.basename(path))
+        self.job_finished.emit(path, output)
+
+
+class Inotify:
+    """Acesso mínimo ao inotify do Linux via ctypes (sem dependências extras)"""
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_NONBLOCK = 0o4000
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify indisponível")
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._watches = {}
+
+    def add(self, path):
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(self._ctypes.get_errno(), f"Não foi possível monitorar {path}")
+        self._watches[wd] = path
+        return wd
+
+    def remove(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+        self._watches.pop(wd, None)
+
+    def read(self, timeout):
+        """Caminhos que tiveram eventos (espera até timeout segundos)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            wd, _, _, length = self.EVENT.unpack_from(data, offset)
+            name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b'\0')
+            offset += self.EVENT.size + length
+            if wd in self._watches and name:
+                paths.append(os.path.join(self._watches[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher(QObject):
+    """Monitora pastas (inotify com varredura periódica de reserva) e importa arquivos estáveis"""
+    # (arquivo de origem, caminho na biblioteca, 'importado' ou 'duplicado')
+    file_ingested = Signal(str, str, str)
+    ingest_failed = Signal(str, str)
+    TICK_SECONDS = 0.5
+
+    def __init__(self, importer, queue, stable_seconds=5.0, poll_seconds=10.0, max_ingest=2):
+        super().__init__()
+        self.importer = importer
+        self.queue = queue
+        self.folders = []
+        self.stable_seconds = stable_seconds
+        self.poll_seconds = poll_seconds
+        self.max_ingest = max_ingest
+        # Arquivos já processados: caminho -> (tamanho, mtime) na hora da importação
+        self._seen = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_ingest)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_folders(self, folders):
+        with self._lock:
+            self.folders = list(folders)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        try:
+            inotify = Inotify()
+        except OSError as e:
+            print(f"Monitoramento por varredura periódica: {e}")  # Debug
+            inotify = None
+        watches = {}
+        candidates = {}
+        next_poll = 0.0
+        
+        while not self._stop_event.is_set():
+            with self._lock:
+                folders = list(self.folders)
+            
+            # Mantém um watch por pasta configurada
+            if inotify:
+                for folder in set(watches) - set(folders):
+                    inotify.remove(watches.pop(folder))
+                for folder in set(folders) - set(watches):
+                    try:
+                        watches[folder] = inotify.add(folder)
+                    except OSError as e:
+                        print(f"Pasta sem inotify (só varredura): {e}")  # Debug
+                        watches[folder] = None
+            
+            now = time.monotonic()
+            # A varredura também cobre compartilhamentos de rede, onde o inotify não enxerga escritas remotas
+            if now >= next_poll:
+                next_poll = now + self.poll_seconds
+                for folder in folders:
+                    try:
+                        for entry in os.scandir(folder):
+                            if entry.is_file():
+                                self._consider(entry.path, candidates, now)
+                    except OSError as e:
+                        print(f"Erro ao varrer {folder}: {e}")  # Debug
+            
+            if inotify:
+                for path in inotify.read(self.TICK_SECONDS):
+                    self._consider(path, candidates, time.monotonic())
+            else:
+                self._stop_event.wait(self.TICK_SECONDS)
+            self._check_candidates(candidates, time.monotonic())
+        
+        if inotify:
+            inotify.close()
+
+    def _consider(self, path, candidates, now):
+        """Novo evento ou arquivo visto na varredura: reinicia a espera de estabilidade"""
+        name = os.path.basename(path)
+        if name.startswith('.') or not name.lower().endswith(AUDIO_EXTENSIONS):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if path in self._in_flight or self._seen.get(path) == key:
+                return
+        candidate = candidates.get(path)
+        if candidate is None or candidate[0] != key:
+            candidates[path] = (key, now)
+
+    def _check_candidates(self, candidates, now):
+        """Importa os arquivos que pararam de crescer, respeitando o limite de importações simultâneas"""
+        for path, (key, since) in list(candidates.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del candidates[path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != key:
+                candidates[path] = (current, now)
+                continue
+            if now - since < self.stable_seconds:
+                continue
+            with self._lock:
+                if len(self._in_flight) >= self.max_ingest:
+                    return
+                self._in_flight.add(path)
+            del candidates[path]
+            self._executor.submit(self._ingest, path, key)
+
+    def _ingest(self, path, key):
+        try:
+            library_path, status = self.importer.import_file(path)
+            metrics.increment('watch_files_ingested')
+            self.file_ingested.emit(path, library_path, status)
+            # Duplicados só voltam para a fila se ainda não tiverem transcrição
+            if status == 'importado' or not os.path.exists(self.queue.transcript_path(library_path)):
+                self.queue.submit(library_path)
+        except Exception as e:
+            print(f"Erro ao importar {path}: {e}")  # Debug
+            self.ingest_failed.emit(path, str(e))
+        finally:
+            with self._lock:
+                self._seen[path] = key
+                self._in_flight.discard(path)
+
+
+def load_watch_settings(config_dir):
+    """Configurações do monitoramento de pastas (com valores padrão)"""
+    settings = {
+        'enabled': False,
+        'folders': [],
+        'stable_seconds': 5.0,
+        'poll_seconds': 10.0,
+        'max_concurrent_jobs': 1
+    }
+    try:
+        with open(os.path.join(config_dir, 'watch.json'), 'r') as f:
+            settings.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return settings
+
 
 class VUMeter(QFrame):
     def __init__(self, parent=None):
@@ -104,16 +4890,79 @@ class AudioTranscriber(QMainWindow):
         # Carrega o valor economizado
         self.load_savings()
         
+        # Índice de metadados da biblioteca de áudio
+        self.library = LibraryIndex(os.path.join(self.config_dir, "library.db"))
+        
+        # Normalização: 'peak' (0 dBFS) ou 'r128' (-23 LUFS); o ganho pode ficar só nos metadados
+        self.normalization_mode = 'peak'
+        self.apply_gain_at_decode = False
+        
+        # Arquivo selecionado para transcrição
+        self.current_audio_file = None
+        
         # Configurações de gravação
         self.recording = False
-        self.audio_data = []
-        self.stream = None
+        self.captures = []
+        self.writer = None
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_vu_meter)
         
-        # Configuração dos dispositivos de áudio
-        self.input_devices = self.get_input_devices()
+        # Configuração dos dispositivos de áudio (preenchida pelo serviço em segundo plano)
+        self.input_devices = []
         self.selected_device = None
+        self.device_service = DeviceService()
+        self.device_service.devices_changed.connect(self.on_devices_changed)
+        self.device_service.enumeration_failed.connect(self.on_device_enumeration_failed)
+        # Gravação simultânea: índices em input_devices (vazio = só o microfone do combo)
+        self.multi_devices = []
+        self.multi_device_separate_files = False
+        
+        # Núcleo de transcrição com modelos residentes
+        self.core = TranscriptionCore(os.path.join(self.config_dir, "checkpoints"),
+                                      ResourceGovernor(os.path.join(self.config_dir, "resources.json")),
+                                      CpuTuning(os.path.join(self.config_dir, "cpu_tuning.json")),
+                                      os.path.join(self.config_dir, "transcripts"))
+        self.core.model_store = default_model_store()
+        
+        # Prévia do áudio selecionado
+        self.player = AudioPlayer()
+        self.player_timer = QTimer()
+        self.player_timer.timeout.connect(self.update_player_position)
+        # Transcrição em andamento e resumo da última concluída
+        self.transcription_worker = None
+        self.transcription_summary = ""
+        # Transcrição durante a gravação (processo separado lendo o buffer compartilhado)
+        self.live_transcriber = LiveTranscriber(self)
+        self.live_transcriber.failed.connect(
+            lambda message: QMessageBox.warning(self, "Aviso", f"Erro na transcrição ao vivo: {message}"))
+        self.live_transcriber.finished.connect(self.on_live_transcription_finished)
+        
+        # Importação em segundo plano com detecção de duplicatas
+        self.audio_importer = AudioImporter(self.audio_dir, self.library)
+        self.audio_importer.batch_finished.connect(self.on_import_finished)
+        
+        # Pastas monitoradas: importação e transcrição automáticas
+        self.watch_settings = load_watch_settings(self.config_dir)
+        self.transcription_queue = TranscriptionQueue(
+            self.core, self.library, self.usage_ledger, self.transcription_dir,
+            max_concurrent=self.watch_settings['max_concurrent_jobs']
+        )
+        cluster = load_cluster_settings(self.config_dir)
+        if cluster['workers']:
+            self.transcription_queue.pool = WorkerPool(cluster['workers'], self.core, cluster['chunk_seconds'])
+        self.transcription_queue.queue_changed.connect(self.on_queue_changed)
+        self.transcription_queue.job_finished.connect(self.on_queue_job_finished)
+        self.folder_watcher = FolderWatcher(self.audio_importer, self.transcription_queue,
+                                            self.watch_settings['stable_seconds'],
+                                            self.watch_settings['poll_seconds'])
+        self.folder_watcher.file_ingested.connect(self.on_file_ingested)
+        self.audio_list_timer = QTimer()
+        self.audio_list_timer.setSingleShot(True)
+        self.audio_list_timer.timeout.connect(self.update_audio_list)
+        
+        # Formas de onda dos arquivos que não foram gravados aqui
+        self.waveform_indexer = WaveformIndexer(self.waveform_gains)
+        self.waveform_indexer.waveform_ready.connect(self.on_waveform_ready)
         
         # Interface principal
         self.setup_ui()
@@ -123,87 +4972,100 @@ class AudioTranscriber(QMainWindow):
         
         # Carrega as configurações
         self.load_settings()
-
-    def test_device(self, device_info):
-        """Testa se um dispositivo de áudio está realmente disponível"""
-        try:
-            # Tenta apenas consultar o dispositivo sem abrir stream
-            sd.query_devices(device_info['index'])
-            return True
-        except Exception:
-            return False
-
-    def get_input_devices(self):
-        """Obtém lista de dispositivos de entrada disponíveis"""
-        devices = []
-        seen_names = set()  # Para evitar duplicatas
-        try:
-            device_list = sd.query_devices()
-            default_device = sd.query_devices(kind='input')
-            
-            for i, device in enumerate(device_list):
-                # Evita duplicatas pelo nome
-                if device['name'] in seen_names:
-                    continue
-                    
-                if device['max_input_channels'] > 0:
-                    seen_names.add(device['name'])
-                    
-                    # Usa taxa de amostragem padrão do dispositivo ou 44100 como fallback
-                    samplerate = device.get('default_samplerate', 44100)
-                    
-                    device_info = {
-                        'index': i,
-                        'name': device['name'],
-                        'channels': device['max_input_channels'],
-                        'samplerate': samplerate,
-                        'is_default': (i == default_device['index'] if default_device else False)
-                    }
-                    
-                    # Só adiciona se o dispositivo estiver realmente disponível
-                    if self.test_device(device_info):
-                        devices.append(device_info)
-                    else:
-                        print(f"Dispositivo ignorado (não disponível): {device['name']}")
-                        
-        except Exception as e:
-            QMessageBox.warning(self, "Aviso", f"Erro ao listar dispositivos: {str(e)}")
-            print(f"Detalhes do erro: {e}")  # Debug
-            print("Dispositivos disponíveis:", sd.query_devices())  # Debug
+        self.apply_watch_settings()
         
-        return devices
+        # Endpoint opcional de métricas
+        self.metrics_server = None
+        self.load_diagnostics_settings()
+
+    def closeEvent(self, event):
+        """Encerra os serviços em segundo plano e grava o registro de uso pendente"""
+        self.player.close()
+        self.waveform_indexer.stop()
+        self.device_service.stop()
+        self.folder_watcher.stop()
+        self.transcription_queue.stop()
+        self.audio_importer.shutdown()
+        self.usage_ledger.close()
+        super().closeEvent(event)
 
     def update_device_list(self):
-        """Atualiza a lista de dispositivos no combobox"""
+        """Pede uma nova varredura de dispositivos (o combo é atualizado ao receber o resultado)"""
+        self.device_service.refresh()
+
+    @Slot(list, list, list)
+    def on_devices_changed(self, devices, added, removed):
+        """Aplica ao combo apenas as mudanças na lista de dispositivos"""
         try:
-            self.device_combo.clear()
-            self.input_devices = self.get_input_devices()
+            current = None
+            if 0 <= self.device_combo.currentIndex() < len(self.input_devices):
+                current = device_key(self.input_devices[self.device_combo.currentIndex()])
+            multi_keys = [device_key(self.input_devices[i]) for i in self.multi_devices
+                          if i < len(self.input_devices)]
+            first_fill = not self.input_devices
+            
+            # Evita disparar a troca de microfone durante a atualização
+            self.device_combo.blockSignals(True)
+            if first_fill:
+                self.device_combo.clear()
+            
+            removed_keys = {device_key(device) for device in removed}
+            for row in reversed(range(len(self.input_devices))):
+                if device_key(self.input_devices[row]) in removed_keys:
+                    self.device_combo.removeItem(row)
+                    del self.input_devices[row]
+            
+            # Atualiza índices do PortAudio dos que continuam e acrescenta os novos
+            by_key = {device_key(device): device for device in devices}
+            for row, device in enumerate(self.input_devices):
+                device.update(by_key[device_key(device)])
+                self.device_combo.setItemText(row, self.device_label(device))
+            for device in added:
+                self.input_devices.append(dict(device))
+                self.device_combo.addItem(self.device_label(device))
+            
+            # Mantém a seleção atual; na primeira carga seleciona o padrão
+            keys = [device_key(device) for device in self.input_devices]
+            if current in keys:
+                self.device_combo.setCurrentIndex(keys.index(current))
+            else:
+                defaults = [row for row, device in enumerate(self.input_devices) if device['is_default']]
+                self.device_combo.setCurrentIndex(defaults[0] if defaults else 0)
+            self.multi_devices = [keys.index(key) for key in multi_keys if key in keys]
+            if len(self.multi_devices) < 2:
+                self.multi_devices = []
             
             if not self.input_devices:
+                self.device_combo.clear()
                 self.device_combo.addItem("Nenhum dispositivo encontrado")
-                if hasattr(self, 'record_button'):
-                    self.record_button.setEnabled(False)
-                return
-                
-            # Adiciona dispositivos ao combo
-            default_index = 0
-            for i, device in enumerate(self.input_devices):
-                device_name = device['name']
-                if device['is_default']:
-                    device_name += " (Padrão)"
-                    default_index = i
-                self.device_combo.addItem(f"{device_name} ({device['channels']} canais)")
+            self.device_combo.blockSignals(False)
             
-            # Seleciona o dispositivo padrão
-            self.device_combo.setCurrentIndex(default_index)
+            self.update_multi_device_button()
+            self.record_button.setEnabled(bool(self.input_devices) or self.recording)
             
-            if hasattr(self, 'record_button'):
-                self.record_button.setEnabled(True)
+            if removed and not first_fill:
+                print("Dispositivos removidos:", ", ".join(device['name'] for device in removed))  # Debug
+            if added and not first_fill:
+                print("Dispositivos conectados:", ", ".join(device['name'] for device in added))  # Debug
                 
         except Exception as e:
+            self.device_combo.blockSignals(False)
             print(f"Erro ao atualizar lista de dispositivos: {e}")  # Debug
             QMessageBox.warning(self, "Aviso", "Erro ao atualizar lista de dispositivos")
 
+    def device_label(self, device):
+        """Texto do dispositivo no combo"""
+        device_name = device['name']
+        if device['is_default']:
+            device_name += " (Padrão)"
+        return f"{device_name} ({device['channels']} canais)"
+
+    @Slot(str)
+    def on_device_enumeration_failed(self, error):
+        """Avisa sobre falha na enumeração apenas se ainda não há dispositivos"""
+        if not self.input_devices:
+            QMessageBox.warning(self, "Aviso", f"Erro ao listar dispositivos: {error}")
+
     def setup_ui(self):
         """Configura a interface principal"""
         # Configuração da janela principal
@@ -514,6 +5376,20 @@ class AudioTranscriber(QMainWindow):
             """)
             model_layout.addWidget(size_label)
             
+            # Situação na loja local de modelos: tamanho, tempo de carga e importação
+            store_row = QHBoxLayout()
+            store_label = QLabel("")
+            store_label.setStyleSheet("color: #AAAAAA; font-size: 12px;")
+            store_row.addWidget(store_label)
+            store_row.addStretch()
+            import_button = QPushButton(" Importar...")
+            import_button.setIcon(qta.icon('fa5s.file-import'))
+            import_button.setToolTip("Importa o arquivo .pt oficial do modelo para uso sem internet")
+            import_button.clicked.connect(lambda checked=False, key=model['key']: self.import_model(key))
+            store_row.addWidget(import_button)
+            model_layout.addLayout(store_row)
+            self.model_radios[model['key']]['store_label'] = store_label
+            
             # Adiciona uma linha separadora, exceto para o último item
             if model != self.models_info[-1]:
                 separator = QFrame()
@@ -525,10 +5401,124 @@ class AudioTranscriber(QMainWindow):
             
             models_layout.addWidget(model_container)
         
-        # Seleciona o modelo base por padrão
-        self.model_radios['base']['radio'].setChecked(True)
+        # Seleciona o modelo base por padrão
+        self.model_radios['base']['radio'].setChecked(True)
+        self.model_group.buttonClicked.connect(lambda button: self.update_calibration_label())
+        
+        # Modo cascata: rascunho com um modelo rápido, modelo escolhido só nos trechos duvidosos
+        cascade_row = QHBoxLayout()
+        cascade_label = QLabel("Modo cascata:")
+        cascade_label.setStyleSheet("color: #FFFFFF;")
+        cascade_row.addWidget(cascade_label)
+        self.cascade_combo = QComboBox()
+        self.cascade_combo.addItem("Desativado", None)
+        for key in ('tiny', 'base', 'small'):
+            self.cascade_combo.addItem(f"Rascunho com {key.capitalize()}", key)
+        self.cascade_combo.setToolTip("Transcreve primeiro com o modelo rápido e refaz com o modelo "
+                                      "selecionado apenas os trechos de baixa confiança")
+        cascade_row.addWidget(self.cascade_combo)
+        cascade_row.addStretch()
+        models_layout.addLayout(cascade_row)
+        
+        language_row = QHBoxLayout()
+        language_label = QLabel("Idioma:")
+        language_label.setStyleSheet("color: #FFFFFF;")
+        language_row.addWidget(language_label)
+        self.language_combo = QComboBox()
+        self.language_combo.addItem("Automático (detectar por arquivo)", 'auto')
+        for code, (name, _) in LANGUAGES.items():
+            self.language_combo.addItem(name, code)
+        self.language_combo.setCurrentIndex(self.language_combo.findData('pt'))
+        language_row.addWidget(self.language_combo)
+        language_row.addStretch()
+        models_layout.addLayout(language_row)
+        
+        self.batch_checkbox = QCheckBox("Decodificação em lote (várias janelas por passada do modelo)")
+        self.batch_checkbox.setStyleSheet("color: #FFFFFF;")
+        models_layout.addWidget(self.batch_checkbox)
+        
+        self.live_checkbox = QCheckBox("Transcrever ao vivo durante a gravação (processo separado)")
+        self.live_checkbox.setStyleSheet("color: #FFFFFF;")
+        models_layout.addWidget(self.live_checkbox)
+        
+        self.words_checkbox = QCheckBox("Tempos por palavra (legendas .SRT com cortes precisos)")
+        self.words_checkbox.setStyleSheet("color: #FFFFFF;")
+        self.words_checkbox.setToolTip("Alinha cada palavra depois da transcrição; o resultado fica em cache")
+        models_layout.addWidget(self.words_checkbox)
+        
+        # Calibração dos threads de inferência desta máquina
+        calibration_row = QHBoxLayout()
+        self.calibrate_button = QPushButton(" Calibrar CPU")
+        self.calibrate_button.setIcon(qta.icon('fa5s.tachometer-alt'))
+        self.calibrate_button.setToolTip("Mede a melhor quantidade de threads para o modelo selecionado "
+                                         "usando um trecho do áudio atual")
+        self.calibrate_button.clicked.connect(self.start_calibration)
+        calibration_row.addWidget(self.calibrate_button)
+        self.calibration_label = QLabel("")
+        self.calibration_label.setStyleSheet("color: #FFFFFF;")
+        calibration_row.addWidget(self.calibration_label)
+        calibration_row.addStretch()
+        models_layout.addLayout(calibration_row)
+        self.calibration_worker = None
+        self.model_import_worker = None
+        self.update_model_store_labels()
         
         settings_layout.addWidget(models_frame)
+        
+        # Normalização das gravações
+        normalization_frame = QFrame()
+        normalization_frame.setStyleSheet("""
+            QFrame {
+                background-color: #282828;
+                border-radius: 4px;
+            }
+            QLabel, QCheckBox {
+                color: #FFFFFF;
+            }
+        """)
+        normalization_layout = QVBoxLayout(normalization_frame)
+        
+        normalization_row = QHBoxLayout()
+        normalization_row.addWidget(QLabel("Normalização:"))
+        self.normalization_combo = QComboBox()
+        self.normalization_combo.addItem("Pico (0 dBFS)", 'peak')
+        self.normalization_combo.addItem("Loudness EBU R128 (-23 LUFS)", 'r128')
+        normalization_row.addWidget(self.normalization_combo)
+        normalization_row.addStretch()
+        normalization_layout.addLayout(normalization_row)
+        
+        self.decode_gain_checkbox = QCheckBox("Aplicar ganho na leitura (sem reprocessar o arquivo)")
+        normalization_layout.addWidget(self.decode_gain_checkbox)
+        
+        settings_layout.addWidget(normalization_frame)
+        
+        # Pastas monitoradas
+        watch_frame = QFrame()
+        watch_frame.setStyleSheet(normalization_frame.styleSheet())
+        watch_layout = QVBoxLayout(watch_frame)
+        self.watch_check = QCheckBox("Monitorar pastas: importar e transcrever automaticamente os arquivos novos")
+        self.watch_check.toggled.connect(self.on_watch_toggled)
+        watch_layout.addWidget(self.watch_check)
+        
+        self.watch_folders_list = QListWidget()
+        self.watch_folders_list.setMaximumHeight(90)
+        watch_layout.addWidget(self.watch_folders_list)
+        
+        watch_buttons = QHBoxLayout()
+        add_folder_button = QPushButton(" Adicionar pasta")
+        add_folder_button.setIcon(qta.icon('fa5s.folder-plus'))
+        add_folder_button.clicked.connect(self.add_watch_folder)
+        watch_buttons.addWidget(add_folder_button)
+        remove_folder_button = QPushButton(" Remover")
+        remove_folder_button.setIcon(qta.icon('fa5s.minus-circle'))
+        remove_folder_button.clicked.connect(self.remove_watch_folder)
+        watch_buttons.addWidget(remove_folder_button)
+        watch_buttons.addStretch()
+        self.queue_status_label = QLabel("Fila: 0 aguardando, 0 em andamento")
+        watch_buttons.addWidget(self.queue_status_label)
+        watch_layout.addLayout(watch_buttons)
+        
+        settings_layout.addWidget(watch_frame)
         settings_layout.addStretch()
         
         # Botão de salvar configurações
@@ -550,6 +5540,10 @@ class AudioTranscriber(QMainWindow):
         
         self.tabs.addTab(settings_tab, "Configurações")
         
+        # Tab de Diagnóstico
+        diagnostics_tab = self.setup_diagnostics_tab()
+        self.tabs.addTab(diagnostics_tab, "Diagnóstico")
+        
         self.load_settings()
     
     def setup_recording_tab(self):
@@ -596,6 +5590,13 @@ class AudioTranscriber(QMainWindow):
             }
         """)
         device_layout.addWidget(self.device_combo)
+        
+        # Gravação simultânea de vários microfones
+        self.multi_device_button = QPushButton(" Vários")
+        self.multi_device_button.setIcon(qta.icon('fa5s.users'))
+        self.multi_device_button.setToolTip("Gravar de vários microfones ao mesmo tempo")
+        self.multi_device_button.clicked.connect(self.select_multi_devices)
+        device_layout.addWidget(self.multi_device_button)
         recording_layout.addLayout(device_layout)
         
         # Botões de controle com ícones Font Awesome
@@ -629,8 +5630,10 @@ class AudioTranscriber(QMainWindow):
         """)
         control_layout.addWidget(self.record_button)
         
-        # Agora que o record_button foi criado, podemos atualizar a lista de dispositivos
-        self.update_device_list()
+        # A lista chega do serviço de dispositivos; até lá a gravação fica desabilitada
+        self.device_combo.addItem("Procurando dispositivos...")
+        self.record_button.setEnabled(False)
+        self.device_service.start()
         
         # Conecta o evento de mudança de dispositivo depois de popular a lista
         self.device_combo.currentIndexChanged.connect(self.on_device_changed)
@@ -655,6 +5658,15 @@ class AudioTranscriber(QMainWindow):
             }
         """)
         control_layout.addWidget(self.upload_button)
+        
+        self.import_folder_button = QPushButton(" Pasta")
+        self.import_folder_button.setIcon(qta.icon('fa5s.folder-open'))
+        self.import_folder_button.setIconSize(QSize(20, 20))
+        self.import_folder_button.setToolTip("Importar todos os áudios de uma pasta")
+        self.import_folder_button.clicked.connect(self.import_folder)
+        self.import_folder_button.setMinimumHeight(40)
+        self.import_folder_button.setStyleSheet(self.upload_button.styleSheet())
+        control_layout.addWidget(self.import_folder_button)
         control_layout.addStretch()
         
         recording_layout.addLayout(control_layout)
@@ -671,25 +5683,29 @@ class AudioTranscriber(QMainWindow):
         
         # Lista de arquivos de áudio
         self.audio_list = QTableWidget()
-        self.audio_list.setColumnCount(4)
+        self.audio_list.setColumnCount(5)
         
         # Cria os cabeçalhos com ícones
         file_header = QTableWidgetItem(qta.icon('fa5s.file-audio'), " Nome do Arquivo")
         date_header = QTableWidgetItem(qta.icon('fa5s.calendar'), " Data de Criação")
         duration_header = QTableWidgetItem(qta.icon('fa5s.clock'), " Duração")
+        waveform_header = QTableWidgetItem(qta.icon('fa5s.wave-square'), " Forma de Onda")
         delete_header = QTableWidgetItem(qta.icon('fa5s.trash-alt'), " Excluir")
         
         # Define os cabeçalhos
         self.audio_list.setHorizontalHeaderItem(0, file_header)
         self.audio_list.setHorizontalHeaderItem(1, date_header)
         self.audio_list.setHorizontalHeaderItem(2, duration_header)
-        self.audio_list.setHorizontalHeaderItem(3, delete_header)
+        self.audio_list.setHorizontalHeaderItem(3, waveform_header)
+        self.audio_list.setHorizontalHeaderItem(4, delete_header)
         
         # Configura o redimensionamento das colunas
         self.audio_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.audio_list.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.audio_list.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.audio_list.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.audio_list.horizontalHeader().setSectionResizeMode(3, QHeaderView.Interactive)
+        self.audio_list.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
+        self.audio_list.setColumnWidth(3, 160)
         
         self.audio_list.horizontalHeader().setStyleSheet("""
             QTableWidget {
@@ -732,8 +5748,76 @@ class AudioTranscriber(QMainWindow):
         
         return recording_tab
 
+    def select_multi_devices(self):
+        """Diálogo para escolher os microfones da gravação simultânea"""
+        if self.recording:
+            return
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Gravação com vários microfones")
+        dialog_layout = QVBoxLayout(dialog)
+        
+        dialog_layout.addWidget(QLabel("Selecione os microfones (o primeiro define o relógio da gravação):"))
+        device_list = QListWidget()
+        for i, device in enumerate(self.input_devices):
+            item = QListWidgetItem(f"{device['name']} ({device['channels']} canais)")
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if i in self.multi_devices else Qt.Unchecked)
+            device_list.addItem(item)
+        dialog_layout.addWidget(device_list)
+        
+        mode_combo = QComboBox()
+        mode_combo.addItem("Um arquivo multicanal (um canal por microfone)")
+        mode_combo.addItem("Um arquivo por microfone")
+        mode_combo.setCurrentIndex(1 if self.multi_device_separate_files else 0)
+        dialog_layout.addWidget(mode_combo)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        dialog_layout.addWidget(buttons)
+        
+        if dialog.exec() != QDialog.Accepted:
+            return
+        
+        selected = [i for i in range(device_list.count())
+                    if device_list.item(i).checkState() == Qt.Checked]
+        # Com um único microfone usa o fluxo normal do combo
+        self.multi_devices = selected if len(selected) > 1 else []
+        self.multi_device_separate_files = mode_combo.currentIndex() == 1
+        if len(selected) == 1:
+            self.device_combo.setCurrentIndex(selected[0])
+        self.update_multi_device_button()
+
+    def update_multi_device_button(self):
+        """Mostra quantos microfones estão selecionados para gravação simultânea"""
+        if not hasattr(self, 'multi_device_button'):
+            return
+        if self.multi_devices:
+            self.multi_device_button.setText(f" {len(self.multi_devices)} microfones")
+            self.device_combo.setEnabled(False)
+        else:
+            self.multi_device_button.setText(" Vários")
+            self.device_combo.setEnabled(True)
+
+    def create_capture(self, device, shared=False):
+        """Cria a captura de um dispositivo usando as informações já enumeradas"""
+        # Configurações otimizadas
+        CHANNELS = 1
+        
+        # Usa os dados em cache da enumeração (evita consultar o PortAudio de novo)
+        if device['channels'] < CHANNELS:
+            raise Exception(f"Dispositivo não suporta {CHANNELS} canais")
+        
+        # Usa a taxa de amostragem nativa do dispositivo se disponível
+        SAMPLE_RATE = int(device.get('samplerate') or 44100)
+        
+        # Começa com buffer pequeno (baixa latência); cresce se houver overflows
+        return CaptureStream(device['index'], SAMPLE_RATE, CHANNELS, shared=shared)
+
     def start_recording(self):
         """Inicia a gravação de áudio"""
+        start_time = time.perf_counter()
         try:
             if not self.input_devices:
                 raise Exception("Nenhum dispositivo de entrada disponível")
@@ -742,39 +5826,58 @@ class AudioTranscriber(QMainWindow):
             if device_index < 0 or device_index >= len(self.input_devices):
                 raise Exception("Dispositivo inválido selecionado")
                 
-            device = self.input_devices[device_index]
+            # Microfones selecionados para gravação simultânea ou apenas o do combo
+            if self.multi_devices:
+                devices = [self.input_devices[i] for i in self.multi_devices]
+            else:
+                devices = [self.input_devices[device_index]]
             
-            # Configurações otimizadas
-            SAMPLE_RATE = 44100
-            CHANNELS = 1
-            DTYPE = 'float32'
+            # Com transcrição ao vivo o primeiro microfone grava em memória compartilhada
+            live = (self.live_checkbox.isChecked() and self.transcription_worker is None
+                    and not self.live_transcriber.running())
+            captures = [self.create_capture(device, shared=live and index == 0)
+                        for index, device in enumerate(devices)]
             
-            # Verifica se o dispositivo suporta a taxa de amostragem
-            device_info = sd.query_devices(device['index'])
-            if device_info['max_input_channels'] < CHANNELS:
-                raise Exception(f"Dispositivo não suporta {CHANNELS} canais")
-                
-            # Usa a taxa de amostragem nativa do dispositivo se disponível
-            if 'default_samplerate' in device_info:
-                SAMPLE_RATE = int(device_info['default_samplerate'])
+            # Nenhuma reenumeração do PortAudio com streams abertos
+            self.device_service.pause()
             
-            self.audio_data = []
-            self.stream = sd.InputStream(
-                device=device['index'],
-                channels=CHANNELS,
-                samplerate=SAMPLE_RATE,
-                dtype=DTYPE,
-                callback=self.audio_callback,
-                blocksize=1024,  # Tamanho do buffer menor para menor latência
-                latency='low'    # Baixa latência
-            )
+            # O áudio vai direto para arquivos temporários em float
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            os.makedirs(self.audio_dir, exist_ok=True)
+            self.recording_filename = f"{self.audio_dir}/gravacao_{timestamp}.wav"
+            # Com o ganho aplicado na leitura o arquivo já nasce em PCM 16 e não é reprocessado
+            subtype = 'PCM_16' if self.apply_gain_at_decode else 'FLOAT'
+            self.writer = RecordingWriter(captures, self.recording_filename,
+                                          self.multi_device_separate_files, subtype)
             
-            # Armazena as configurações para uso posterior
-            self.current_sample_rate = SAMPLE_RATE
+            # Armazena as configurações para uso posterior (o primeiro microfone define a taxa)
+            self.current_sample_rate = captures[0].samplerate
             
-            self.stream.start()
+            self.writer.start()
+            try:
+                for capture in captures:
+                    capture.start()
+                    self.captures.append(capture)
+            except Exception:
+                for capture in self.captures:
+                    capture.stop()
+                self.captures = []
+                self.device_service.resume()
+                self.writer.stop()
+                for capture in captures:
+                    capture.release()
+                for path in self.writer.paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.writer = None
+                raise
             self.recording = True
+            # Um núcleo fica para a captura enquanto houver decodificação em paralelo
+            self.core.reserved_cpus = 1
+            if live:
+                self.start_live_transcription(captures[0])
             self.record_button.setText(" Parar")
+            metrics.observe('recording.start', time.perf_counter() - start_time)
             
         except Exception as e:
             error_msg = str(e)
@@ -784,36 +5887,79 @@ class AudioTranscriber(QMainWindow):
                 error_msg = "Erro de buffer do microfone. Tente diminuir a taxa de amostragem."
             
             print(f"Erro detalhado: {e}")  # Debug
+            metrics.increment('recording_start_errors')
             QMessageBox.warning(self, "Erro", f"Erro ao iniciar gravação: {error_msg}")
             self.recording = False
             self.record_button.setText(" Gravar")
 
     def stop_recording(self):
         """Para a gravação de áudio"""
-        if self.stream:
+        if self.captures:
             try:
-                self.stream.stop()
-                self.stream.close()
-                self.stream = None
+                with metrics.span('recording.stop.close_stream'):
+                    for capture in self.captures:
+                        capture.stop()
+                    self.writer.stop()
+                    # O processo ao vivo transcreve o que já leu; o segmento compartilhado pode sair
+                    self.live_transcriber.stop()
+                    for capture in self.captures:
+                        capture.release()
+                self.device_service.resume()
                 
-                if self.audio_data:
-                    # Concatena os dados do áudio
-                    audio_data = np.concatenate(self.audio_data, axis=0)
-                    
-                    # Normaliza o volume se necessário
-                    max_val = np.max(np.abs(audio_data))
-                    if max_val > 0:
-                        audio_data = audio_data / max_val
-                    
-                    # Salva o arquivo
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"{self.audio_dir}/gravacao_{timestamp}.wav"
+                captures, writer = self.captures, self.writer
+                self.captures = []
+                self.writer = None
+                
+                if writer.error:
+                    raise writer.error
+                
+                if writer.frames_written:
+                    for channel, (filename, path) in enumerate(zip(writer.filenames, writer.paths)):
+                        # Ganho de cada microfone a partir da medição feita durante a gravação
+                        meters = [writer.meters[channel]] if writer.separate_files else writer.meters
+                        gains = [meter.gain(self.normalization_mode)
+                                 for meter in meters for _ in range(meter.channels)]
+                        loudness = [meter.integrated_loudness() for meter in meters]
+                        
+                        if self.apply_gain_at_decode:
+                            # O ganho fica registrado e é aplicado na leitura
+                            os.replace(path, filename)
+                            stored_gains = gains
+                        else:
+                            # Passada única em blocos sobre o arquivo temporário
+                            with metrics.span('recording.stop.normalize'):
+                                apply_gain_to_file(path, filename, gains)
+                            os.remove(path)
+                            stored_gains = [1.0] * len(gains)
+                        
+                        # Forma de onda já calculada durante a gravação
+                        writer.waveforms[channel].save(waveform_path(filename), gains)
+                        
+                        self.library.update(
+                            os.path.basename(filename),
+                            gain=stored_gains,
+                            peak=[meter.peak for meter in meters],
+                            loudness_lufs=loudness,
+                            normalization=self.normalization_mode
+                        )
+                        # Vários microfones num só arquivo: a transcrição separa os canais
+                        if not writer.separate_files and len(captures) > 1:
+                            self.library.update(os.path.basename(filename), microphones=len(captures))
+                        
+                        # Registra onde houve perda de áudio para a transcrição
+                        if writer.separate_files:
+                            gap_markers = [gap for gap in writer.gap_markers if gap['channel'] == channel]
+                        else:
+                            gap_markers = writer.gap_markers
+                        if gap_markers:
+                            self.save_gap_markers(filename, gap_markers)
                     
-                    # Garante que o diretório existe
-                    os.makedirs(self.audio_dir, exist_ok=True)
+                    if writer.gap_markers:
+                        print(f"Lacunas na gravação: {len(writer.gap_markers)} "
+                              f"(overflows: {sum(c.overflows for c in captures)}, "
+                              f"adaptações: {sum(c.adaptations for c in captures)})")
                     
-                    # Salva com a taxa de amostragem correta
-                    sf.write(filename, audio_data, self.current_sample_rate, 'PCM_16')
+                    filename = writer.filenames[0]
                     
                     # Atualiza a interface
                     self.current_audio_file = filename
@@ -821,15 +5967,43 @@ class AudioTranscriber(QMainWindow):
                     self.transcribe_button.setEnabled(True)
                     self.update_audio_list()
                     
-                    QMessageBox.information(self, "Sucesso", f"Áudio salvo como {os.path.basename(filename)}")
+                    saved = ", ".join(os.path.basename(name) for name in writer.filenames)
+                    QMessageBox.information(self, "Sucesso", f"Áudio salvo como {saved}")
+                else:
+                    for path in writer.paths:
+                        if os.path.exists(path):
+                            os.remove(path)
             
             except Exception as e:
                 print(f"Erro ao salvar áudio: {e}")
                 QMessageBox.critical(self, "Erro", f"Erro ao salvar a gravação: {str(e)}")
         
         self.recording = False
+        self.core.reserved_cpus = 0
         self.record_button.setText(" Gravar")
 
+    def start_live_transcription(self, capture):
+        """Mostra a transcrição enquanto a gravação acontece"""
+        model_key, _ = self.get_selected_model()
+        self.segment_model.clear()
+        self.transcription_summary = ""
+        self.update_export_buttons(False)
+        self.transcribe_button.setEnabled(False)
+        self.live_transcriber.segments_ready.connect(self.segment_model.add_segments)
+        self.transcription_status.setText("Transcrição ao vivo...")
+        # O modelo rápido da cascata, se houver, acompanha melhor o tempo real; 'auto' detecta por janela
+        language = self.core.language if self.core.language != 'auto' else None
+        self.live_transcriber.start(capture.ring, self.core.cascade_model or model_key, language)
+        # Trabalhos em lote cedem a vez enquanto a inferência ao vivo estiver rodando
+        self.core.scheduler.register('live')
+
+    def on_live_transcription_finished(self):
+        self.core.scheduler.unregister('live')
+        self.live_transcriber.segments_ready.disconnect(self.segment_model.add_segments)
+        self.transcription_status.setText("Transcrição ao vivo concluída")
+        self.update_export_buttons(bool(self.segment_model.rowCount()))
+        self.transcribe_button.setEnabled(bool(self.current_audio_file))
+
     def toggle_recording(self):
         """Inicia ou para a gravação de áudio"""
         if not self.recording:
@@ -837,18 +6011,15 @@ class AudioTranscriber(QMainWindow):
         else:
             self.stop_recording()
 
-    def audio_callback(self, indata, frames, time, status):
-        """Callback para processar os dados de áudio"""
-        if status:
-            print(status)
-        self.audio_data.append(indata.copy())
-        self.update_vu_meter()
-
     def update_vu_meter(self):
         """Atualiza o VU meter"""
-        if self.recording and self.audio_data:
-            # Pega os últimos samples para calcular o volume
-            last_samples = self.audio_data[-1] if self.audio_data else np.zeros(1000)
+        if self.recording and self.captures:
+            # Pega os últimos samples do microfone mais alto (fora do callback)
+            blocks = [capture.ring.latest(1024) for capture in self.captures]
+            blocks = [block for block in blocks if len(block)]
+            if not blocks:
+                return
+            last_samples = max(blocks, key=lambda block: np.mean(block**2))
             
             # Calcula RMS do áudio
             rms = np.sqrt(np.mean(last_samples**2))
@@ -860,7 +6031,7 @@ class AudioTranscriber(QMainWindow):
         """Atualiza a lista de arquivos de áudio disponíveis"""
         self.audio_list.setRowCount(0)
         for file in os.listdir(self.audio_dir):
-            if file.endswith((".wav", ".mp3", ".m4a")):
+            if file.lower().endswith(AUDIO_EXTENSIONS):
                 file_path = os.path.join(self.audio_dir, file)
                 # Obtém a data de criação
                 creation_time = datetime.fromtimestamp(os.path.getctime(file_path))
@@ -888,6 +6059,10 @@ class AudioTranscriber(QMainWindow):
                 duration_item.setTextAlignment(Qt.AlignCenter)
                 self.audio_list.setItem(row, 2, duration_item)
                 
+                # Miniatura da forma de onda (gerada em segundo plano se ainda não existir)
+                self.audio_list.setCellWidget(row, 3, WaveformView())
+                self.load_waveform_thumbnail(row, file_path)
+                
                 # Adiciona o botão de exclusão
                 delete_button = QPushButton()
                 delete_button.setIcon(qta.icon('fa5s.trash-alt'))
@@ -903,7 +6078,38 @@ class AudioTranscriber(QMainWindow):
                     }
                 """)
                 delete_button.clicked.connect(lambda checked, f=file: self.confirm_delete_audio(f))
-                self.audio_list.setCellWidget(row, 3, delete_button)
+                self.audio_list.setCellWidget(row, 4, delete_button)
+
+    def load_waveform(self, file_path):
+        """Abre a forma de onda de um arquivo ou pede a geração ao indexador"""
+        if WaveformIndexer.is_current(file_path):
+            try:
+                return WaveformPyramid(waveform_path(file_path))
+            except Exception as e:
+                print(f"Erro ao ler forma de onda de {file_path}: {e}")  # Debug
+        self.waveform_indexer.request(file_path)
+        return None
+
+    def load_waveform_thumbnail(self, row, file_path):
+        """Mostra a miniatura na linha da lista"""
+        view = self.audio_list.cellWidget(row, 3)
+        if view is not None:
+            view.set_waveform(self.load_waveform(file_path))
+
+    def waveform_gains(self, file_path):
+        """Ganho guardado para o arquivo (aplicado na leitura), usado pelo indexador"""
+        gains = self.library.get(os.path.basename(file_path)).get('gain')
+        return gains if gains and any(gain != 1.0 for gain in gains) else None
+
+    @Slot(str)
+    def on_waveform_ready(self, file_path):
+        """Atualiza a miniatura e a visualização quando o indexador termina um arquivo"""
+        filename = os.path.basename(file_path)
+        for row in range(self.audio_list.rowCount()):
+            if self.audio_list.item(row, 0).text() == filename:
+                self.audio_list.cellWidget(row, 3).set_waveform(WaveformPyramid(waveform_path(file_path)))
+        if self.current_audio_file and os.path.abspath(self.current_audio_file) == os.path.abspath(file_path):
+            self.waveform_view.set_waveform(WaveformPyramid(waveform_path(file_path)))
 
     @Slot()
     def select_audio_file(self, item):
@@ -961,6 +6167,44 @@ class AudioTranscriber(QMainWindow):
         
         transcription_layout.addWidget(file_container)
         
+        # Forma de onda do arquivo (roda do mouse: zoom; arrastar: desloca)
+        self.waveform_view = WaveformView(interactive=True)
+        self.waveform_view.seek_requested.connect(self.seek_playback)
+        transcription_layout.addWidget(self.waveform_view)
+        
+        # Controles da prévia do áudio
+        player_container = QWidget()
+        player_layout = QHBoxLayout(player_container)
+        player_layout.setContentsMargins(0, 0, 0, 0)
+        player_button_style = """
+            QPushButton {
+                background-color: #282828;
+                border: none;
+                border-radius: 4px;
+                padding: 6px;
+            }
+            QPushButton:hover {
+                background-color: #404040;
+            }
+        """
+        self.play_button = QPushButton()
+        self.play_button.setIcon(qta.icon('fa5s.play', color='white'))
+        self.play_button.setStyleSheet(player_button_style)
+        self.play_button.clicked.connect(self.toggle_playback)
+        player_layout.addWidget(self.play_button)
+        
+        self.stop_playback_button = QPushButton()
+        self.stop_playback_button.setIcon(qta.icon('fa5s.stop', color='white'))
+        self.stop_playback_button.setStyleSheet(player_button_style)
+        self.stop_playback_button.clicked.connect(self.stop_playback)
+        player_layout.addWidget(self.stop_playback_button)
+        
+        self.player_time_label = QLabel("00:00 / 00:00")
+        self.player_time_label.setStyleSheet("QLabel { color: #FFFFFF; }")
+        player_layout.addWidget(self.player_time_label)
+        player_layout.addStretch()
+        transcription_layout.addWidget(player_container)
+        
         # Botão de transcrição com ícone
         self.transcribe_button = QPushButton(" Transcrever")
         self.transcribe_button.setIcon(qta.icon('fa5s.language'))
@@ -1011,11 +6255,31 @@ class AudioTranscriber(QMainWindow):
         
         transcription_layout.addWidget(buttons_container)
         
-        # Campo de texto para a transcrição
-        self.transcription_text = QTextEdit()
-        self.transcription_text.setReadOnly(True)
-        self.transcription_text.setStyleSheet("""
-            QTextEdit {
+        # Situação da transcrição e resumo ao final
+        self.transcription_status = QLabel()
+        self.transcription_status.setWordWrap(True)
+        self.transcription_status.setStyleSheet("QLabel { color: #FFFFFF; }")
+        transcription_layout.addWidget(self.transcription_status)
+        
+        # Lista de segmentos: só as linhas visíveis são desenhadas, o que mantém
+        # a rolagem fluida em transcrições de várias horas
+        self.segment_model = SegmentListModel(self)
+        self.segment_view = QListView()
+        self.segment_view.setModel(self.segment_model)
+        # Linhas de altura fixa: inserir segmentos não obriga a medir a lista inteira
+        self.segment_view.setUniformItemSizes(True)
+        self.segment_view.setTextElideMode(Qt.ElideRight)
+        self.segment_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.segment_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # Clicar em um segmento posiciona a prévia no início dele
+        self.segment_view.clicked.connect(self.on_segment_clicked)
+        copy_action = QAction(self.segment_view)
+        copy_action.setShortcut(QKeySequence.Copy)
+        copy_action.setShortcutContext(Qt.WidgetShortcut)
+        copy_action.triggered.connect(self.copy_selected_segments)
+        self.segment_view.addAction(copy_action)
+        self.segment_view.setStyleSheet("""
+            QListView {
                 background-color: #FFFFFF;
                 color: #000000;
                 border: none;
@@ -1023,8 +6287,11 @@ class AudioTranscriber(QMainWindow):
                 padding: 10px;
                 font-size: 14px;
             }
+            QListView::item {
+                padding: 2px 0px;
+            }
         """)
-        transcription_layout.addWidget(self.transcription_text)
+        transcription_layout.addWidget(self.segment_view)
         
         # Container para os botões de exportação
         export_container = QWidget()
@@ -1066,6 +6333,13 @@ class AudioTranscriber(QMainWindow):
         self.docx_button.setEnabled(False)
         export_layout.addWidget(self.docx_button)
         
+        # Botão SRT (legendas; cortes por palavra quando houver tempos por palavra)
+        self.srt_button = QPushButton(".SRT")
+        self.srt_button.setStyleSheet(button_style)
+        self.srt_button.clicked.connect(self.export_srt)
+        self.srt_button.setEnabled(False)
+        export_layout.addWidget(self.srt_button)
+        
         # Botão Copiar
         self.copy_button = QPushButton(" Copiar")
         self.copy_button.setIcon(qta.icon('fa5s.copy'))
@@ -1079,84 +6353,451 @@ class AudioTranscriber(QMainWindow):
         
         return transcription_tab
 
+    def setup_diagnostics_tab(self):
+        """Configura a aba de diagnóstico (tempos e contadores)"""
+        diagnostics_tab = QWidget()
+        diagnostics_layout = QVBoxLayout(diagnostics_tab)
+        diagnostics_layout.setContentsMargins(20, 20, 20, 20)
+        diagnostics_layout.setSpacing(10)
+        
+        title_label = QLabel("Tempos das operações")
+        title_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        diagnostics_layout.addWidget(title_label)
+        
+        # Tabela de spans
+        self.timings_table = QTableWidget()
+        self.timings_table.setColumnCount(5)
+        self.timings_table.setHorizontalHeaderLabels(
+            ["Operação", "Chamadas", "Média (ms)", "Máx (ms)", "Última (ms)"]
+        )
+        self.timings_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.timings_table.verticalHeader().hide()
+        self.timings_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        diagnostics_layout.addWidget(self.timings_table)
+        
+        counters_label = QLabel("Contadores e medidores")
+        counters_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        diagnostics_layout.addWidget(counters_label)
+        
+        # Memória controlada pelo governador de recursos
+        self.memory_label = QLabel("")
+        diagnostics_layout.addWidget(self.memory_label)
+        
+        # Tabela de contadores
+        self.counters_table = QTableWidget()
+        self.counters_table.setColumnCount(2)
+        self.counters_table.setHorizontalHeaderLabels(["Nome", "Valor"])
+        self.counters_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.counters_table.verticalHeader().hide()
+        self.counters_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        diagnostics_layout.addWidget(self.counters_table)
+        
+        usage_label = QLabel("Uso e custos por modelo")
+        usage_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        diagnostics_layout.addWidget(usage_label)
+        
+        # Totais do registro de uso (já agregados, nada é recalculado aqui)
+        self.usage_table = QTableWidget()
+        self.usage_table.setColumnCount(6)
+        self.usage_table.setHorizontalHeaderLabels(
+            ["Modelo", "Trabalhos", "Áudio (h)", "Processamento (h)", "Tempo real (x)", "Custo estimado ($)"]
+        )
+        self.usage_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.usage_table.verticalHeader().hide()
+        self.usage_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        diagnostics_layout.addWidget(self.usage_table)
+        
+        # Endpoint HTTP opcional
+        endpoint_layout = QHBoxLayout()
+        self.metrics_http_check = QCheckBox("Expor métricas via HTTP (/metrics e /metrics.json) na porta")
+        endpoint_layout.addWidget(self.metrics_http_check)
+        self.metrics_port_spin = QSpinBox()
+        self.metrics_port_spin.setRange(1024, 65535)
+        self.metrics_port_spin.setValue(9464)
+        endpoint_layout.addWidget(self.metrics_port_spin)
+        endpoint_layout.addStretch()
+        self.metrics_http_check.toggled.connect(self.on_metrics_http_toggled)
+        diagnostics_layout.addLayout(endpoint_layout)
+        
+        # Botões
+        buttons_layout = QHBoxLayout()
+        reset_button = QPushButton(" Zerar")
+        reset_button.setIcon(qta.icon('fa5s.undo'))
+        reset_button.clicked.connect(self.reset_metrics)
+        buttons_layout.addWidget(reset_button)
+        
+        copy_metrics_button = QPushButton(" Copiar JSON")
+        copy_metrics_button.setIcon(qta.icon('fa5s.copy'))
+        copy_metrics_button.clicked.connect(
+            lambda: QApplication.clipboard().setText(metrics.to_json())
+        )
+        buttons_layout.addWidget(copy_metrics_button)
+        buttons_layout.addStretch()
+        diagnostics_layout.addLayout(buttons_layout)
+        
+        # Atualiza o painel apenas quando ele está visível
+        self.diagnostics_timer = QTimer()
+        self.diagnostics_timer.timeout.connect(self.refresh_diagnostics)
+        self.diagnostics_timer.start(1000)
+        
+        return diagnostics_tab
+
+    def refresh_diagnostics(self):
+        """Atualiza as tabelas do painel de diagnóstico"""
+        if not self.timings_table.isVisible():
+            return
+        
+        snapshot = metrics.snapshot()
+        
+        timings = sorted(snapshot['timings'].items())
+        self.timings_table.setRowCount(len(timings))
+        for row, (name, stat) in enumerate(timings):
+            values = [
+                name,
+                str(stat['count']),
+                f"{stat['mean_seconds'] * 1000:.2f}",
+                f"{stat['max_seconds'] * 1000:.2f}",
+                f"{stat['last_seconds'] * 1000:.2f}"
+            ]
+            for column, value in enumerate(values):
+                self.timings_table.setItem(row, column, QTableWidgetItem(value))
+        
+        state = self.core.governor.utilization()
+        models = ", ".join(f"{key} x{count}" for key, count in sorted(state['models'].items()) if count) or "nenhum"
+        limit = f"{state['limit_bytes'] / 2**30:.1f} GB" if state['limit_bytes'] is not None else "sem limite medido"
+        self.memory_label.setText(
+            f"Memória: {state['used_bytes'] / 2**30:.2f} GB de {limit} | Modelos carregados: {models} | "
+            f"Trabalhos: {state['jobs']} em andamento, {state['waiting']} aguardando memória"
+        )
+        
+        values = sorted(snapshot['counters'].items()) + sorted(snapshot['gauges'].items())
+        self.counters_table.setRowCount(len(values))
+        for row, (name, value) in enumerate(values):
+            self.counters_table.setItem(row, 0, QTableWidgetItem(name))
+            self.counters_table.setItem(row, 1, QTableWidgetItem(str(value)))
+        
+        totals = sorted(self.usage_ledger.totals().items())
+        self.usage_table.setRowCount(len(totals))
+        for row, ((backend, model), total) in enumerate(totals):
+            wall = total['wall_seconds']
+            values = [
+                f"{backend} / {model}",
+                str(total['jobs']),
+                f"{total['audio_seconds'] / 3600:.2f}",
+                f"{wall / 3600:.2f}",
+                f"{total['audio_seconds'] / wall:.1f}" if wall > 0 else "-",
+                f"{total['cost']:.3f}"
+            ]
+            for column, value in enumerate(values):
+                self.usage_table.setItem(row, column, QTableWidgetItem(value))
+
+    def reset_metrics(self):
+        """Zera as métricas e atualiza o painel"""
+        metrics.reset()
+        self.refresh_diagnostics()
+
+    def apply_watch_settings(self):
+        """Preenche os controles das pastas monitoradas e liga o monitoramento se habilitado"""
+        self.transcription_queue.model_key = self.get_selected_model()[0]
+        self.watch_folders_list.clear()
+        for folder in self.watch_settings['folders']:
+            self.watch_folders_list.addItem(folder)
+        self.folder_watcher.set_folders(self.watch_settings['folders'])
+        # Dispara on_watch_toggled quando habilitado
+        self.watch_check.setChecked(self.watch_settings['enabled'])
+
+    def save_watch_settings(self):
+        """Salva as configurações do monitoramento de pastas"""
+        self.watch_settings['enabled'] = self.watch_check.isChecked()
+        self.watch_settings['folders'] = [self.watch_folders_list.item(row).text()
+                                          for row in range(self.watch_folders_list.count())]
+        with open(f'{self.config_dir}/watch.json', 'w') as f:
+            json.dump(self.watch_settings, f, indent=2)
+
+    def on_watch_toggled(self, enabled):
+        if enabled:
+            self.folder_watcher.start()
+        else:
+            self.folder_watcher.stop()
+        self.save_watch_settings()
+
+    def add_watch_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Selecionar Pasta para Monitorar")
+        if not folder:
+            return
+        if os.path.abspath(folder) == os.path.abspath(self.audio_dir):
+            QMessageBox.warning(self, "Aviso", "A pasta da biblioteca não pode ser monitorada.")
+            return
+        if not self.watch_folders_list.findItems(folder, Qt.MatchExactly):
+            self.watch_folders_list.addItem(folder)
+            self.save_watch_settings()
+            self.folder_watcher.set_folders(self.watch_settings['folders'])
+
+    def remove_watch_folder(self):
+        for item in self.watch_folders_list.selectedItems():
+            self.watch_folders_list.takeItem(self.watch_folders_list.row(item))
+        self.save_watch_settings()
+        self.folder_watcher.set_folders(self.watch_settings['folders'])
+
+    @Slot(str, str, str)
+    def on_file_ingested(self, source, path, status):
+        # Muitos arquivos de uma vez: a lista é atualizada uma única vez
+        self.audio_list_timer.start(500)
+
+    @Slot(int, int)
+    def on_queue_changed(self, waiting, running):
+        self.queue_status_label.setText(f"Fila: {waiting} aguardando, {running} em andamento")
+
+    @Slot(str, str)
+    def on_queue_job_finished(self, path, transcript):
+        print(f"Transcrição automática concluída: {transcript}")  # Debug
+        self.update_savings_display()
+
+    def load_diagnostics_settings(self):
+        """Carrega as configurações de diagnóstico e inicia o endpoint se habilitado"""
+        try:
+            with open(f'{self.config_dir}/diagnostics.json', 'r') as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            settings = {}
+        
+        self.metrics_port_spin.setValue(settings.get('metrics_http_port', 9464))
+        # Dispara on_metrics_http_toggled quando habilitado
+        self.metrics_http_check.setChecked(settings.get('metrics_http_enabled', False))
+
+    def save_diagnostics_settings(self):
+        """Salva as configurações de diagnóstico"""
+        settings = {
+            'metrics_http_enabled': self.metrics_http_check.isChecked(),
+            'metrics_http_port': self.metrics_port_spin.value()
+        }
+        with open(f'{self.config_dir}/diagnostics.json', 'w') as f:
+            json.dump(settings, f)
+
+    def on_metrics_http_toggled(self, enabled):
+        """Liga ou desliga o endpoint HTTP de métricas"""
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        
+        if enabled:
+            try:
+                self.metrics_server = MetricsServer(port=self.metrics_port_spin.value())
+                self.metrics_server.start()
+            except OSError as e:
+                print(f"Erro ao iniciar endpoint de métricas: {e}")
+                QMessageBox.warning(self, "Aviso", f"Não foi possível abrir a porta de métricas: {str(e)}")
+                self.metrics_server = None
+                # Reentra neste método com enabled=False
+                self.metrics_http_check.setChecked(False)
+                return
+        
+        self.metrics_port_spin.setEnabled(not enabled)
+        self.save_diagnostics_settings()
+
     @Slot()
     def start_transcription(self):
-        """Inicia o processo de transcrição"""
+        """Inicia a transcrição em segundo plano"""
         if not self.current_audio_file:
             QMessageBox.warning(self, "Aviso", "Selecione um arquivo de áudio primeiro!")
             return
+        if self.transcription_worker is not None or self.live_transcriber.running():
+            return
+        
+        # Usa o modelo selecionado nas configurações
+        model_key, model_name = self.get_selected_model()
         
+        self.segment_model.clear()
+        self.transcription_summary = ""
+        self.update_export_buttons(False)
+        self.transcribe_button.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         
+        worker = TranscriptionWorker(self.core, self.current_audio_file, model_key, self.library, self)
+        worker.status.connect(self.transcription_status.setText)
+        worker.progress.connect(lambda value: self.progress_bar.setValue(int(10 + 90 * value)))
+        worker.segments_ready.connect(self.segment_model.add_segments)
+        worker.completed.connect(lambda result: self.on_transcription_completed(result, model_name))
+        worker.failed.connect(self.on_transcription_failed)
+        worker.finished.connect(self.on_transcription_finished)
+        self.transcription_worker = worker
+        self.progress_bar.setValue(10)
+        worker.start()
+
+    def on_transcription_completed(self, result, model_name):
+        """Mostra o resumo e contabiliza a economia"""
         try:
-            import whisper
-            import soundfile as sf
-            
-            # Atualiza o status
-            self.progress_bar.setValue(10)
-            self.transcription_text.setText("Carregando modelo Whisper...")
-            
-            # Usa o modelo selecionado nas configurações
-            model_key, model_name = self.get_selected_model()
-            
-            # Carrega o modelo selecionado
-            model = whisper.load_model(model_key)
-            
-            self.progress_bar.setValue(30)
-            self.transcription_text.setText("Transcrevendo áudio...\nIsso pode levar alguns segundos.")
-            
             # Obtém a duração real do arquivo de áudio
-            audio_info = sf.info(self.current_audio_file)
+            audio_info = sf.info(self.transcription_worker.path)
             duration_seconds = audio_info.duration
+            channels = result['channels']
             
             # Calcula o custo estimado
-            estimated_cost = self.calculate_transcription_cost(duration_seconds)
+            estimated_cost = self.calculate_transcription_cost(duration_seconds * channels)
             
-            # Atualiza o total economizado
-            self.total_savings += estimated_cost
-            self.save_savings()
+            # Registra o trabalho (o total economizado vem dos totais do registro)
+            self.usage_ledger.record(
+                'whisper-local', result['model'],
+                duration_seconds * channels, result['wall_seconds'], estimated_cost,
+                file_hash=result['file_hash'], file_name=os.path.basename(self.transcription_worker.path)
+            )
             self.update_savings_display()
             
-            # Configurações otimizadas para PT-BR
-            result = model.transcribe(
-                self.current_audio_file,
-                language="pt",
-                task="transcribe",
-                initial_prompt="Transcrição em português brasileiro:",
-                temperature=0.2,  # Menor temperatura para maior precisão
-                best_of=2,        # Tenta 2 vezes e pega o melhor resultado
-            )
+            if result['decode_seconds'] > 0:
+                metrics.set_gauge('last_realtime_factor', round(duration_seconds / result['decode_seconds'], 3))
             
-            # Formata o texto para melhor legibilidade
-            transcribed_text = result["text"].strip()
-            formatted_text = f"""Transcrição concluída:
-
-{transcribed_text}
-
----
-Modelo utilizado: {model_name}
-Idioma: Português (Brasil)
+            if result.get('requested_model'):
+                model_name = (f"{self.model_radios[result['model_key']]['name']} (memória insuficiente para "
+                              f"{self.model_radios[result['requested_model']]['name']})")
+            if result['escalated_fraction'] is not None:
+                model_name = (f"{self.cascade_combo.currentText()} + {model_name} "
+                              f"({result['escalated_fraction']:.1%} do áudio reprocessado)")
+            
+            language = language_name(result['language'])
+            if result['language_probability'] is not None:
+                language += f" (detectado, {result['language_probability']:.0%})"
+            
+            summary = f"""Modelo utilizado: {model_name}
+Canais transcritos: {channels}
+Idioma: {language}
 Duração do áudio: {duration_seconds:.2f} segundos
 Preço estimado da transcrição: ${estimated_cost:.3f}"""
             
-            # Mostra o resultado
+            # Tempos por palavra chegam depois dos segmentos: a lista passa a usar os segmentos completos
+            if result.get('words_aligned') is not None:
+                self.segment_model.clear()
+                self.segment_model.add_segments(result['segments'])
+                summary += (f"\nTempos por palavra: {result['words_aligned']} segmento(s) alinhado(s), "
+                            f"{result['words_cached']} do cache")
+            
+            # Retranscrição incremental: parte do texto veio da transcrição anterior do arquivo
+            if result['reused_seconds']:
+                audio_seconds = result['duration'] * channels
+                summary += (f"\nReaproveitado da transcrição anterior: {result['reused_seconds']:.0f} s "
+                            f"({result['reused_seconds'] / audio_seconds:.0%} do áudio)")
+            
+            # Janelas em que o Whisper entrou em laço
+            guard = result['guard']
+            if guard['retries'] or guard['skipped_windows']:
+                summary += (f"\nJanelas refeitas: {guard['retries']}; processamento descartado: "
+                            f"{guard['wasted_seconds']:.1f} s")
+            if guard['skipped_windows']:
+                skipped_list = ", ".join(format_timestamp(offset) for offset in guard['skipped_at'][:10])
+                summary += (f"\nTrechos sem transcrição (decodificação em laço): {guard['skipped_windows']}, "
+                            f"{guard['skipped_seconds']:.0f} s ({skipped_list})")
+            
+            # Informa os trechos em que a gravação perdeu áudio
+            gap_markers = self.load_gap_markers(self.transcription_worker.path)
+            if gap_markers:
+                gap_list = ", ".join(
+                    f"{int(gap['time'] // 60)}:{gap['time'] % 60:04.1f}" for gap in gap_markers[:10]
+                )
+                lost_seconds = sum(gap['lost_seconds'] for gap in gap_markers)
+                summary += (f"\nÁudio perdido na gravação: {len(gap_markers)} trecho(s), "
+                            f"{lost_seconds:.2f} s ({gap_list})")
+            
+            self.transcription_summary = summary
+            self.transcription_status.setText(summary)
             self.progress_bar.setValue(100)
-            self.transcription_text.setText(formatted_text)
             
             # Atualiza os botões de exportação
             self.update_export_buttons(True)
             
             QMessageBox.information(self, "Sucesso", "Transcrição concluída com sucesso!")
-            
         except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao transcrever: {str(e)}")
-            self.progress_bar.setVisible(False)
+            self.on_transcription_failed(str(e))
+
+    def on_transcription_failed(self, message):
+        QMessageBox.critical(self, "Erro", f"Erro ao transcrever: {message}")
+        self.transcription_status.setText("")
+        self.progress_bar.setVisible(False)
+
+    def on_transcription_finished(self):
+        """Libera o worker e o botão ao fim da transcrição (com ou sem erro)"""
+        self.transcription_worker.deleteLater()
+        self.transcription_worker = None
+        self.transcribe_button.setEnabled(bool(self.current_audio_file))
+        self.update_model_store_labels()
+
+    def transcript_document(self):
+        """Documento completo, montado só para exportar"""
+        return f"Transcrição concluída:\n\n{self.segment_model.text()}\n\n---\n{self.transcription_summary}"
+
+    @Slot(QModelIndex)
+    def on_segment_clicked(self, index):
+        """Posiciona a prévia no início do segmento clicado"""
+        self.seek_playback(index.data(SegmentListModel.StartRole))
+
+    @Slot()
+    def copy_selected_segments(self):
+        """Copia as linhas selecionadas (Ctrl+A seleciona todas)"""
+        rows = [index.row() for index in self.segment_view.selectionModel().selectedIndexes()]
+        if rows:
+            QApplication.clipboard().setText(self.segment_model.text(rows))
+
+    def ensure_player(self):
+        """Abre o arquivo selecionado no player, se ainda não estiver aberto"""
+        if not self.current_audio_file:
+            return False
+        if self.player.path != self.current_audio_file:
+            try:
+                gains = self.library.get(os.path.basename(self.current_audio_file)).get('gain')
+                self.player.open(self.current_audio_file, gains)
+            except Exception as e:
+                QMessageBox.critical(self, "Erro", f"Erro ao abrir o áudio: {str(e)}")
+                return False
+        return True
+
+    @Slot()
+    def toggle_playback(self):
+        """Toca ou pausa a prévia do arquivo selecionado"""
+        if self.player.playing:
+            self.player.pause()
+        elif self.ensure_player():
+            try:
+                self.player.play()
+            except Exception as e:
+                QMessageBox.critical(self, "Erro", f"Erro ao reproduzir: {str(e)}")
+                return
+            self.player_timer.start(50)
+        self.update_player_position()
+
+    @Slot()
+    def stop_playback(self):
+        """Para a prévia e volta ao início"""
+        if self.player.source is not None:
+            self.player.pause()
+            self.player.seek(0.0)
+        self.player_timer.stop()
+        self.update_player_position()
+
+    @Slot(float)
+    def seek_playback(self, seconds):
+        """Posiciona a prévia (continua tocando se já estava)"""
+        if self.ensure_player():
+            self.player.seek(seconds)
+            self.update_player_position()
+
+    @Slot()
+    def update_player_position(self):
+        """Atualiza o tempo, o cursor na forma de onda e o botão de reprodução"""
+        if self.player.source is not None and self.player.finished and self.player.playing:
+            self.player.pause()
+        if not self.player.playing:
+            self.player_timer.stop()
+        
+        icon = 'fa5s.pause' if self.player.playing else 'fa5s.play'
+        self.play_button.setIcon(qta.icon(icon, color='white'))
+        position = self.player.position()
+        self.player_time_label.setText(
+            f"{format_timestamp(position)} / {format_timestamp(self.player.duration)}")
+        self.waveform_view.set_cursor(position if self.player.source is not None else None)
 
     @Slot()
     def export_txt(self):
         """Exporta a transcrição como arquivo TXT"""
-        if not self.transcription_text.toPlainText():
+        if not self.segment_model.rowCount():
             return
             
         filename = QFileDialog.getSaveFileName(
@@ -1168,16 +6809,39 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(self.transcription_text.toPlainText())
+                with metrics.span('export.txt'):
+                    with open(filename, 'w', encoding='utf-8') as f:
+                        f.write(self.transcript_document())
                 QMessageBox.information(self, "Sucesso", "Arquivo TXT exportado com sucesso!")
             except Exception as e:
                 QMessageBox.critical(self, "Erro", f"Erro ao exportar arquivo: {str(e)}")
 
+    @Slot()
+    def export_srt(self):
+        """Exporta a transcrição como legendas SRT"""
+        if not self.segment_model.rowCount():
+            return
+        
+        filename = QFileDialog.getSaveFileName(
+            self,
+            "Exportar como SRT",
+            os.path.splitext(self.current_audio_file)[0] + ".srt",
+            "Legendas SRT (*.srt)"
+        )[0]
+        
+        if filename:
+            try:
+                with metrics.span('export.srt'):
+                    with open(filename, 'w', encoding='utf-8') as f:
+                        f.write(srt_text(self.segment_model.segments))
+                QMessageBox.information(self, "Sucesso", "Arquivo SRT exportado com sucesso!")
+            except Exception as e:
+                QMessageBox.critical(self, "Erro", f"Erro ao exportar arquivo: {str(e)}")
+
     @Slot()
     def export_docx(self):
         """Exporta a transcrição como arquivo DOCX"""
-        if not self.transcription_text.toPlainText():
+        if not self.segment_model.rowCount():
             return
             
         filename = QFileDialog.getSaveFileName(
@@ -1189,10 +6853,11 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
         
         if filename:
             try:
-                from docx import Document
-                doc = Document()
-                doc.add_paragraph(self.transcription_text.toPlainText())
-                doc.save(filename)
+                with metrics.span('export.docx'):
+                    from docx import Document
+                    doc = Document()
+                    doc.add_paragraph(self.transcript_document())
+                    doc.save(filename)
                 QMessageBox.information(self, "Sucesso", "Arquivo DOCX exportado com sucesso!")
             except Exception as e:
                 QMessageBox.critical(self, "Erro", f"Erro ao exportar arquivo: {str(e)}")
@@ -1200,17 +6865,10 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
     @Slot()
     def copy_transcription(self):
         """Copia a transcrição para a área de transferência"""
-        if self.transcription_text.toPlainText():
-            # Extrai apenas o texto transcrito (remove o cabeçalho e as informações do modelo)
-            text = self.transcription_text.toPlainText()
-            transcribed_text = text.split("---")[0].strip()
-            
-            # Remove "Transcrição concluída:" e espaços extras
-            if transcribed_text.startswith("Transcrição concluída:"):
-                transcribed_text = transcribed_text.replace("Transcrição concluída:", "").strip()
-            
+        if self.segment_model.rowCount():
+            # Apenas o texto transcrito (sem o resumo do modelo)
             clipboard = QApplication.clipboard()
-            clipboard.setText(transcribed_text)
+            clipboard.setText(self.segment_model.text())
             
             # Feedback visual temporário
             original_text = self.copy_button.text()
@@ -1221,13 +6879,29 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
         """Atualiza o estado dos botões de exportação"""
         self.txt_button.setEnabled(enable)
         self.docx_button.setEnabled(enable)
+        self.srt_button.setEnabled(enable)
         self.copy_button.setEnabled(enable)
 
     def save_settings(self):
         """Salva as configurações em um arquivo JSON"""
         model_key, _ = self.get_selected_model()
+        self.normalization_mode = self.normalization_combo.currentData()
+        self.apply_gain_at_decode = self.decode_gain_checkbox.isChecked()
+        self.transcription_queue.model_key = model_key
+        self.update_calibration_label()
+        self.core.cascade_model = self.cascade_combo.currentData()
+        self.core.batch_decoding = self.batch_checkbox.isChecked()
+        self.core.word_timestamps = self.words_checkbox.isChecked()
+        self.core.language = self.language_combo.currentData()
         settings = {
-            'selected_model': model_key
+            'selected_model': model_key,
+            'language': self.core.language,
+            'cascade_model': self.core.cascade_model,
+            'batch_decoding': self.core.batch_decoding,
+            'live_transcription': self.live_checkbox.isChecked(),
+            'word_timestamps': self.core.word_timestamps,
+            'normalization': self.normalization_mode,
+            'apply_gain_at_decode': self.apply_gain_at_decode
         }
         
         with open(f'{self.config_dir}/whisper_settings.json', 'w') as f:
@@ -1245,9 +6919,110 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
                 # Marca o radio do modelo salvo
                 if selected_model in self.model_radios:
                     self.model_radios[selected_model]['radio'].setChecked(True)
+                
+                self.normalization_mode = settings.get('normalization', 'peak')
+                self.apply_gain_at_decode = settings.get('apply_gain_at_decode', False)
+                index = self.normalization_combo.findData(self.normalization_mode)
+                if index >= 0:
+                    self.normalization_combo.setCurrentIndex(index)
+                self.decode_gain_checkbox.setChecked(self.apply_gain_at_decode)
+                
+                self.core.cascade_model = settings.get('cascade_model')
+                index = self.cascade_combo.findData(self.core.cascade_model)
+                self.cascade_combo.setCurrentIndex(max(0, index))
+                self.core.batch_decoding = settings.get('batch_decoding', False)
+                self.batch_checkbox.setChecked(self.core.batch_decoding)
+                self.live_checkbox.setChecked(settings.get('live_transcription', False))
+                self.core.word_timestamps = settings.get('word_timestamps', False)
+                self.words_checkbox.setChecked(self.core.word_timestamps)
+                self.core.language = settings.get('language', 'pt')
+                index = self.language_combo.findData(self.core.language)
+                if index >= 0:
+                    self.language_combo.setCurrentIndex(index)
         except FileNotFoundError:
             # Se não houver arquivo de configuração, usa o modelo base
             self.model_radios['base']['radio'].setChecked(True)
+        self.update_calibration_label()
+
+    def update_calibration_label(self):
+        """Mostra os threads calibrados do modelo selecionado nesta máquina"""
+        model_key, model_name = self.get_selected_model()
+        calibrated = self.core.tuning.models().get(model_key, {}).get('threads_by_jobs')
+        if calibrated:
+            layouts = ", ".join(f"{threads} thread(s) com {jobs} trabalho(s)" for jobs, threads in calibrated.items())
+            self.calibration_label.setText(f"{model_name}: {layouts}")
+        else:
+            self.calibration_label.setText(f"{model_name}: não calibrado ({usable_cpus()} CPUs, "
+                                           f"{physical_cores()} núcleos físicos)")
+
+    def start_calibration(self):
+        """Calibra os threads do modelo selecionado com o áudio atual (ou o mais recente da biblioteca)"""
+        if self.calibration_worker is not None:
+            return
+        if self.transcription_worker is not None or sum(self.transcription_queue.pending()):
+            QMessageBox.warning(self, "Aviso", "Aguarde o fim das transcrições para calibrar.")
+            return
+        path = self.current_audio_file
+        if not path:
+            files = [os.path.join(self.audio_dir, name) for name in os.listdir(self.audio_dir)
+                     if name.lower().endswith(AUDIO_EXTENSIONS)]
+            path = max(files, key=os.path.getmtime) if files else None
+        if not path:
+            QMessageBox.warning(self, "Aviso", "Grave ou importe um áudio para usar na calibração!")
+            return
+        
+        model_key, _ = self.get_selected_model()
+        worker = CalibrationWorker(self.core, path, model_key, self)
+        worker.status.connect(self.calibration_label.setText)
+        worker.completed.connect(lambda best: self.update_calibration_label())
+        worker.failed.connect(lambda message: QMessageBox.critical(self, "Erro", f"Erro na calibração: {message}"))
+        worker.finished.connect(self.on_calibration_finished)
+        self.calibration_worker = worker
+        self.calibrate_button.setEnabled(False)
+        worker.start()
+
+    def update_model_store_labels(self):
+        """Tamanho e último tempo de carga de cada modelo da loja local"""
+        for key, entry in self.model_radios.items():
+            manifest = self.core.model_store.manifest(key) if self.core.model_store.has(key) else None
+            if manifest is None:
+                text = "Não importado (baixado pelo whisper no primeiro uso)"
+            else:
+                text = f"Loja local: {manifest['size'] / 1e6:.0f} MB"
+                if not manifest['official']:
+                    text += " (checksum não oficial)"
+                if key in self.core.model_store.load_seconds:
+                    text += f", carregado em {self.core.model_store.load_seconds[key]:.2f} s"
+            entry['store_label'].setText(text)
+
+    def import_model(self, model_key):
+        """Importa o checkpoint de um modelo para a loja local em segundo plano"""
+        if self.model_import_worker is not None:
+            return
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "whisper")
+        source = QFileDialog.getOpenFileName(
+            self, f"Importar modelo {self.model_radios[model_key]['name']}",
+            cache_dir if os.path.isdir(cache_dir) else "", "Modelo do Whisper (*.pt)")[0]
+        if not source:
+            return
+        worker = ModelImportWorker(self.core.model_store, model_key, source, self)
+        worker.status.connect(self.model_radios[model_key]['store_label'].setText)
+        worker.completed.connect(
+            lambda manifest: QMessageBox.information(self, "Sucesso", f"Modelo {model_key} importado!"))
+        worker.failed.connect(lambda message: QMessageBox.critical(self, "Erro", f"Erro ao importar: {message}"))
+        worker.finished.connect(self.on_model_import_finished)
+        self.model_import_worker = worker
+        worker.start()
+
+    def on_model_import_finished(self):
+        self.model_import_worker.deleteLater()
+        self.model_import_worker = None
+        self.update_model_store_labels()
+
+    def on_calibration_finished(self):
+        self.calibration_worker.deleteLater()
+        self.calibration_worker = None
+        self.calibrate_button.setEnabled(True)
 
     def get_selected_model(self):
         """Retorna a chave e o nome do modelo selecionado"""
@@ -1257,18 +7032,20 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
         return 'base', 'Base'  # Modelo padrão se nenhum estiver selecionado
 
     def load_savings(self):
-        """Carrega o valor total economizado"""
-        try:
-            with open(f'{self.config_dir}/savings.json', 'r') as f:
-                data = json.load(f)
-                self.total_savings = data.get('total_savings', 0.0)
-        except FileNotFoundError:
-            self.total_savings = 0.0
+        """Abre o registro de uso; o total antigo do savings.json entra como um lançamento único"""
+        self.usage_ledger = UsageLedger(os.path.join(self.config_dir, "usage.db"))
+        if self.usage_ledger.is_empty():
+            try:
+                with open(f'{self.config_dir}/savings.json', 'r') as f:
+                    total_savings = json.load(f).get('total_savings', 0.0)
+            except (FileNotFoundError, ValueError):
+                total_savings = 0.0
+            if total_savings:
+                self.usage_ledger.record('importado', 'savings.json', 0.0, 0.0, total_savings)
 
-    def save_savings(self):
-        """Salva o valor total economizado"""
-        with open(f'{self.config_dir}/savings.json', 'w') as f:
-            json.dump({'total_savings': self.total_savings}, f)
+    @property
+    def total_savings(self):
+        return self.usage_ledger.total_cost()
 
     def update_savings_display(self):
         """Atualiza o display de economia"""
@@ -1276,41 +7053,106 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
 
     def calculate_transcription_cost(self, duration_seconds):
         """Calcula o custo estimado da transcrição"""
-        # Converte segundos para minutos e multiplica pelo custo por minuto
-        cost = (duration_seconds / 60) * 0.006
-        return cost
+        return transcription_cost(duration_seconds)
 
     def upload_audio(self):
-        file_name, _ = QFileDialog.getOpenFileName(
+        """Importa um ou mais arquivos de áudio"""
+        file_names, _ = QFileDialog.getOpenFileNames(
             self,
-            "Selecionar Arquivo de Áudio",
+            "Selecionar Arquivos de Áudio",
             "",
             "Arquivos de Áudio (*.wav *.mp3 *.m4a)"
         )
-        if file_name:
-            dest_path = f"{self.audio_dir}/{os.path.basename(file_name)}"
-            import shutil
-            shutil.copy2(file_name, dest_path)
-            QMessageBox.information(self, "Sucesso", f"Arquivo importado: {os.path.basename(dest_path)}")
-            self.update_audio_list()
-            
-            # Seleciona automaticamente o arquivo importado
-            self.current_audio_file = dest_path
-            self.update_selected_file_label(dest_path)
+        if file_names:
+            self.audio_importer.import_paths(file_names)
+
+    def import_folder(self):
+        """Importa todos os áudios de uma pasta (incluindo subpastas)"""
+        folder = QFileDialog.getExistingDirectory(self, "Selecionar Pasta de Áudios")
+        if folder and not self.audio_importer.import_paths([folder]):
+            QMessageBox.warning(self, "Aviso", "Nenhum arquivo de áudio encontrado na pasta.")
+
+    @Slot(dict)
+    def on_import_finished(self, batch):
+        """Atualiza a lista e resume o lote importado"""
+        self.update_audio_list()
+        imported, duplicates, errors = batch['imported'], batch['duplicates'], batch['errors']
+        
+        # Arquivo único: seleciona automaticamente (o já existente, se for duplicado)
+        if len(imported) + len(duplicates) == 1 and not errors:
+            path = (imported or duplicates)[0][1]
+            self.current_audio_file = path
+            self.update_selected_file_label(path)
             self.transcribe_button.setEnabled(True)
+        
+        lines = [f"Arquivos importados: {len(imported)}"]
+        if duplicates:
+            lines.append(f"Já estavam na biblioteca: {len(duplicates)}")
+            lines.extend(f"  {os.path.basename(source)} = {os.path.basename(path)}"
+                         for source, path in duplicates[:10])
+        if errors:
+            lines.append(f"Erros: {len(errors)}")
+            lines.extend(f"  {os.path.basename(source)}: {error}" for source, error in errors[:10])
+        if errors:
+            QMessageBox.warning(self, "Importação", "\n".join(lines))
+        else:
+            QMessageBox.information(self, "Sucesso", "\n".join(lines))
 
-    def on_device_changed(self, text):
+    def on_device_changed(self, index):
         """Chamado quando o usuário muda o dispositivo de entrada"""
-        if self.recording:
-            self.stop_recording()
-            self.start_recording()
+        if self.recording and not self.multi_devices:
+            self.hot_swap_device(index)
+
+    def hot_swap_device(self, index):
+        """Troca o microfone sem interromper a gravação em andamento"""
+        start_time = time.perf_counter()
+        if index < 0 or index >= len(self.input_devices) or not self.writer:
+            return
+        
+        capture = None
+        try:
+            # Abre o novo stream antes de fechar o antigo; o writer faz o crossfade e libera o antigo
+            # Com transcrição ao vivo o novo microfone também grava em memória compartilhada
+            live = self.live_transcriber.running()
+            capture = self.create_capture(self.input_devices[index], shared=live)
+            capture.start()
+            self.writer.swap_capture(0, capture)
+            self.captures[0] = capture
+            if live:
+                self.live_transcriber.attach(capture.ring)
+            metrics.observe('recording.hot_swap', time.perf_counter() - start_time)
+        except Exception as e:
+            if capture is not None and capture not in self.captures:
+                capture.stop()
+                capture.release()
+            print(f"Erro ao trocar dispositivo: {e}")  # Debug
+            metrics.increment('recording_hot_swap_errors')
+            QMessageBox.warning(self, "Aviso",
+                                f"Não foi possível trocar o microfone; a gravação continua no anterior: {str(e)}")
+
+    def save_gap_markers(self, filename, gap_markers):
+        """Salva os marcadores de lacunas ao lado do arquivo de áudio"""
+        with open(filename + ".gaps.json", 'w') as f:
+            json.dump(gap_markers, f)
+
+    def load_gap_markers(self, filename):
+        """Carrega os marcadores de lacunas de uma gravação, se existirem"""
+        try:
+            with open(filename + ".gaps.json", 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
 
     def update_selected_file_label(self, filename):
         """Atualiza o label do arquivo selecionado"""
+        self.stop_playback()
+        self.player.close()
         if filename:
             self.filename_label.setText(os.path.basename(filename))
+            self.waveform_view.set_waveform(self.load_waveform(filename))
         else:
             self.filename_label.setText("")
+            self.waveform_view.set_waveform(None)
 
     def confirm_delete_audio(self, filename):
         """Mostra um diálogo de confirmação antes de excluir o arquivo"""
@@ -1347,7 +7189,17 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
         
         if msg.exec_() == QMessageBox.Yes:
             try:
-                os.remove(os.path.join(self.audio_dir, filename))
+                # Uma gravação de vários microfones sai inteira, com os arquivos de cada microfone
+                path = os.path.join(self.audio_dir, filename)
+                names = [os.path.basename(sibling) for _, sibling in mic_siblings(path)] or [filename]
+                for name in names:
+                    os.remove(os.path.join(self.audio_dir, name))
+                    self.library.remove(name)
+                    self.core.drop_caches(name)
+                    for sidecar in (name + ".gaps.json", waveform_path(name)):
+                        sidecar_path = os.path.join(self.audio_dir, sidecar)
+                        if os.path.exists(sidecar_path):
+                            os.remove(sidecar_path)
                 self.update_audio_list()
             except Exception as e:
                 error_msg = QMessageBox()
@@ -1374,7 +7226,226 @@ Preço estimado da transcrição: ${estimated_cost:.3f}"""
                 """)
                 error_msg.exec_()
 
+def run_watch_daemon(folders):
+    """Modo sem interface: monitora as pastas, importa e transcreve até receber Ctrl+C"""
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication(sys.argv)
+    
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    audio_dir = os.path.join(base_dir, "audio")
+    transcription_dir = os.path.join(base_dir, "transcricoes")
+    config_dir = os.path.join(base_dir, "config")
+    for directory in (audio_dir, transcription_dir, config_dir):
+        os.makedirs(directory, exist_ok=True)
+    
+    settings = load_watch_settings(config_dir)
+    folders = folders or settings['folders']
+    if not folders:
+        print("Nenhuma pasta para monitorar (informe na linha de comando ou em config/watch.json)")
+        return 1
+    try:
+        with open(os.path.join(config_dir, 'whisper_settings.json'), 'r') as f:
+            whisper_settings = json.load(f)
+    except FileNotFoundError:
+        whisper_settings = {}
+    model_key = whisper_settings.get('selected_model', 'base')
+    
+    library = LibraryIndex(os.path.join(config_dir, "library.db"))
+    ledger = UsageLedger(os.path.join(config_dir, "usage.db"))
+    core = TranscriptionCore(os.path.join(config_dir, "checkpoints"),
+                             ResourceGovernor(os.path.join(config_dir, "resources.json")),
+                             CpuTuning(os.path.join(config_dir, "cpu_tuning.json")),
+                             os.path.join(config_dir, "transcripts"))
+    core.model_store = default_model_store()
+    core.cascade_model = whisper_settings.get('cascade_model')
+    core.batch_decoding = whisper_settings.get('batch_decoding', False)
+    core.word_timestamps = whisper_settings.get('word_timestamps', False)
+    core.language = whisper_settings.get('language', 'pt')
+    queue = TranscriptionQueue(core, library, ledger, transcription_dir,
+                               model_key, settings['max_concurrent_jobs'])
+    cluster = load_cluster_settings(config_dir)
+    if cluster['workers']:
+        queue.pool = WorkerPool(cluster['workers'], core, cluster['chunk_seconds'])
+        print(f"Transcrição distribuída em {len(cluster['workers'])} nó(s)")
+    watcher = FolderWatcher(AudioImporter(audio_dir, library), queue,
+                            settings['stable_seconds'], settings['poll_seconds'])
+    watcher.set_folders(folders)
+    
+    watcher.file_ingested.connect(lambda source, path, status: print(f"{status}: {source} -> {path}"))
+    watcher.ingest_failed.connect(lambda source, error: print(f"Erro ao importar {source}: {error}"))
+    queue.job_finished.connect(lambda path, transcript: print(f"Transcrito: {path} -> {transcript}"))
+    queue.job_failed.connect(lambda path, error: print(f"Erro ao transcrever {path}: {error}"))
+    
+    # Ctrl+C encerra o laço do Qt (o timer devolve o controle ao Python periodicamente)
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    keepalive = QTimer()
+    keepalive.timeout.connect(lambda: None)
+    keepalive.start(200)
+    
+    print(f"Monitorando: {', '.join(folders)} (modelo {core.model_label(model_key)})")
+    watcher.start()
+    code = app.exec()
+    watcher.stop()
+    queue.stop()
+    ledger.close()
+    return code
+
+
+def run_batch_benchmark(path, model_key='base'):
+    """Compara janelas por segundo do caminho sequencial e do lote nas primeiras janelas do arquivo"""
+    core = TranscriptionCore()
+    core.model_store = default_model_store()
+    core.load_model(model_key)
+    audio = core.load_audio(path)
+    options = core.window_options("")
+    
+    pieces = []
+    start = 0
+    while start < len(audio) and len(pieces) < core.MAX_BATCH:
+        end = core.window_end(audio, start)
+        pieces.append(audio[start:end])
+        start = end
+    with core.model(model_key) as model:
+        size = core.batch_size(model)
+    
+    sequential_start = time.perf_counter()
+    for piece in pieces:
+        core._decode(piece, model_key, options)
+    sequential = time.perf_counter() - sequential_start
+    
+    batch_start = time.perf_counter()
+    core._decode_batch(pieces, model_key, options)
+    batched = time.perf_counter() - batch_start
+    
+    print(f"Modelo {model_key}, {len(pieces)} janelas, lote de até {size}")
+    print(f"Sequencial: {len(pieces) / sequential:.2f} janelas/s")
+    print(f"Em lote:    {len(pieces) / batched:.2f} janelas/s ({sequential / batched:.2f}x)")
+    return 0
+
+
+def run_calibration(path, *model_keys):
+    """Calibra os threads de inferência dos modelos informados (base por padrão) com um trecho do arquivo"""
+    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+    os.makedirs(config_dir, exist_ok=True)
+    core = TranscriptionCore(governor=ResourceGovernor(os.path.join(config_dir, "resources.json")),
+                             tuning=CpuTuning(os.path.join(config_dir, "cpu_tuning.json")))
+    core.model_store = default_model_store()
+    clip = core.load_audio(path)
+    quota = cpu_quota()
+    print(f"{usable_cpus()} CPUs utilizáveis, {physical_cores()} núcleos físicos"
+          + (f", cota do cgroup {quota:.2f}" if quota else ""))
+    for model_key in model_keys or ('base',):
+        best, throughput = core.calibrate_threads(clip, model_key, print)
+        for jobs in sorted(best):
+            print(f"{model_key}: {jobs} trabalho(s) -> {best[jobs]} thread(s), "
+                  f"{throughput[jobs]:.2f} s de áudio/s")
+    return 0
+
+
+def run_worker_node(address='8765', *model_keys):
+    """Nó de trabalho sem interface: [HOST:]PORTA e os modelos mantidos em memória"""
+    host, _, port = address.rpartition(':')
+    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+    os.makedirs(config_dir, exist_ok=True)
+    try:
+        with open(os.path.join(config_dir, 'whisper_settings.json'), 'r') as f:
+            whisper_settings = json.load(f)
+    except FileNotFoundError:
+        whisper_settings = {}
+    core = TranscriptionCore(governor=ResourceGovernor(os.path.join(config_dir, "resources.json")),
+                             tuning=CpuTuning(os.path.join(config_dir, "cpu_tuning.json")))
+    core.model_store = default_model_store()
+    core.batch_decoding = whisper_settings.get('batch_decoding', False)
+    model_keys = model_keys or (whisper_settings.get('selected_model', 'base'),)
+    # Um trabalho por conjunto de threads calibrado para o primeiro modelo
+    jobs = max(1, usable_cpus() // core.tuning.threads_for(model_keys[0]))
+    node = WorkerNode(core, host or '127.0.0.1', int(port), model_keys, jobs)
+    node.start()
+    print(f"Nó de trabalho em {node.host}:{node.port} (modelos {', '.join(model_keys)}, {jobs} vaga(s))")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    node.stop()
+    return 0
+
+
+def run_dispatch(*paths):
+    """Transcreve arquivos nos nós de config/cluster.json e salva os textos em transcricoes/"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    config_dir = os.path.join(base_dir, "config")
+    transcription_dir = os.path.join(base_dir, "transcricoes")
+    os.makedirs(transcription_dir, exist_ok=True)
+    cluster = load_cluster_settings(config_dir)
+    if not cluster['workers']:
+        print("Nenhum nó de trabalho em config/cluster.json")
+        return 1
+    try:
+        with open(os.path.join(config_dir, 'whisper_settings.json'), 'r') as f:
+            whisper_settings = json.load(f)
+    except FileNotFoundError:
+        whisper_settings = {}
+    core = TranscriptionCore()
+    core.language = whisper_settings.get('language', 'pt')
+    pool = WorkerPool(cluster['workers'], core, cluster['chunk_seconds'])
+    model_key = whisper_settings.get('selected_model', 'base')
+    for path in paths:
+        result = pool.transcribe_file(path, model_key, on_status=print)
+        output = os.path.join(transcription_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(result['text'])
+        print(f"{path} -> {output}: {result['chunks']} trecho(s), {result['nodes']} nó(s), "
+              f"{result['wall_seconds']:.1f} s")
+    return 0
+
+
+def run_import_model(model_key, path):
+    """Importa o checkpoint .pt de um modelo para a loja local"""
+    store = default_model_store()
+    manifest = store.import_model(model_key, path, print)
+    print(f"{model_key}: {manifest['size'] / 1e6:.0f} MB em {manifest['format']}"
+          + ("" if manifest['official'] else " (checksum não oficial)"))
+    return 0
+
+
+def run_verify_models():
+    """Confere os pesos de todos os modelos da loja local"""
+    store = default_model_store()
+    keys = sorted(os.listdir(store.directory)) if os.path.isdir(store.directory) else []
+    failed = 0
+    for model_key in keys:
+        if not store.has(model_key):
+            continue
+        valid = store.verify(model_key)
+        failed += not valid
+        print(f"{model_key}: {'ok' if valid else 'CORROMPIDO (importe novamente)'}")
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
+    # python main.py --watch [PASTA ...]: monitoramento sem interface gráfica
+    if "--watch" in sys.argv:
+        sys.exit(run_watch_daemon(sys.argv[sys.argv.index("--watch") + 1:]))
+    # python main.py --calibrate ARQUIVO [MODELO ...]: threads de inferência desta máquina
+    if "--calibrate" in sys.argv:
+        sys.exit(run_calibration(*sys.argv[sys.argv.index("--calibrate") + 1:]))
+    # python main.py --worker [HOST:]PORTA [MODELO ...]: nó de trabalho para a transcrição distribuída
+    if "--worker" in sys.argv:
+        sys.exit(run_worker_node(*sys.argv[sys.argv.index("--worker") + 1:]))
+    # python main.py --dispatch ARQUIVO ...: transcreve nos nós de config/cluster.json
+    if "--dispatch" in sys.argv:
+        sys.exit(run_dispatch(*sys.argv[sys.argv.index("--dispatch") + 1:]))
+    # python main.py --import-model MODELO ARQUIVO.pt: loja local de modelos (uso sem internet)
+    if "--import-model" in sys.argv:
+        sys.exit(run_import_model(*sys.argv[sys.argv.index("--import-model") + 1:][:2]))
+    # python main.py --verify-models: confere os checksums da loja local
+    if "--verify-models" in sys.argv:
+        sys.exit(run_verify_models())
+    # python main.py --benchmark ARQUIVO [MODELO]: ganho da decodificação em lote
+    if "--benchmark" in sys.argv:
+        sys.exit(run_batch_benchmark(*sys.argv[sys.argv.index("--benchmark") + 1:][:2]))
+    
     app = QApplication(sys.argv)
     
     # Aplicar estilo moderno